@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de árboles de decisión en arreglos.
+
+Los nodos (decisión, azar, terminal) se guardan en un almacén compacto de
+arreglos: tipo, etiqueta, pago terminal y el rango de sus aristas; cada arista
+guarda el hijo, la probabilidad (en nodos de azar) y el pago inmediato al
+recorrerla. Los subárboles idénticos se comparten (hash-consing): crear un
+nodo con el mismo tipo, etiqueta y aristas que uno existente retorna el
+mismo id. Así el árbol de n actividades secuenciales tiene O(n) nodos aunque
+represente Π(1 + escenarios) caminos lógicos.
+
+`rollback` evalúa el árbol por inducción hacia atrás sin recorrer caminos:
+los nodos se procesan por altura (todos los hijos antes que el padre) con
+operaciones vectorizadas sobre las aristas. Retorna el valor esperado de cada
+nodo y la arista óptima de cada nodo de decisión (la política).
+
+networkx es opcional: solo se usa en `DecisionTree.to_networkx`.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from tabla_actividades import activity_table
+
+DECISION, CHANCE, TERMINAL = 0, 1, 2
+KIND_NAMES = {DECISION: 'decision', CHANCE: 'azar', TERMINAL: 'terminal'}
+
+
+class DecisionTree:
+    """
+    Almacén de nodos con hash-consing
+
+    Los nodos se crean de las hojas a la raíz (un nodo solo puede apuntar a
+    nodos ya creados), así los ids quedan en orden topológico.
+    """
+
+    def __init__(self):
+        self.kinds: List[int] = []
+        self.labels: List[str] = []
+        self.payoffs: List[float] = []
+        self.heights: List[int] = []
+        self.edge_start: List[int] = []
+        self.edge_count: List[int] = []
+        self.edge_child: List[int] = []
+        self.edge_prob: List[float] = []
+        self.edge_value: List[float] = []
+        self.edge_labels: List[str] = []
+        self.root: int = -1
+        self._interned: Dict[tuple, int] = {}
+        self._arrays = None
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.edge_child)
+
+    def _intern(self, kind: int, label: str, payoff: float, edges: Sequence[Tuple[int, float, float, str]]) -> int:
+        key = (kind, label, payoff, tuple(edges))
+        node = self._interned.get(key)
+        if node is not None:
+            return node
+        node = len(self.kinds)
+        self.kinds.append(kind)
+        self.labels.append(label)
+        self.payoffs.append(payoff)
+        self.edge_start.append(len(self.edge_child))
+        self.edge_count.append(len(edges))
+        height = 0
+        for child, prob, value, edge_label in edges:
+            if not 0 <= child < node:
+                raise ValueError(f"Hijo inválido {child}: los nodos se crean de las hojas a la raíz")
+            self.edge_child.append(child)
+            self.edge_prob.append(prob)
+            self.edge_value.append(value)
+            self.edge_labels.append(edge_label)
+            height = max(height, self.heights[child] + 1)
+        self.heights.append(height)
+        self._interned[key] = node
+        self._arrays = None
+        return node
+
+    def terminal(self, payoff: float = 0.0, label: str = '') -> int:
+        return self._intern(TERMINAL, label, float(payoff), ())
+
+    def chance(self, branches: Sequence[Tuple[float, float, int, str]], label: str = '') -> int:
+        """Nodo de azar; branches = [(probabilidad, pago inmediato, hijo, etiqueta)]"""
+        if not branches:
+            raise ValueError("Un nodo de azar necesita al menos una rama")
+        return self._intern(CHANCE, label, 0.0,
+                            [(child, float(prob), float(value), edge_label)
+                             for prob, value, child, edge_label in branches])
+
+    def decision(self, options: Sequence[Tuple[float, int, str]], label: str = '') -> int:
+        """Nodo de decisión; options = [(pago inmediato, hijo, etiqueta)]"""
+        if not options:
+            raise ValueError("Un nodo de decisión necesita al menos una opción")
+        return self._intern(DECISION, label, 0.0,
+                            [(child, 1.0, float(value), edge_label) for value, child, edge_label in options])
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Vista en arreglos numpy del almacén (se recalcula solo si se agregaron nodos)"""
+        if self._arrays is None:
+            counts = np.array(self.edge_count, dtype=np.int64)
+            self._arrays = {
+                'kind': np.array(self.kinds, dtype=np.int8),
+                'payoff': np.array(self.payoffs, dtype=np.float64),
+                'height': np.array(self.heights, dtype=np.int64),
+                'edge_parent': np.repeat(np.arange(len(self.kinds), dtype=np.int64), counts),
+                'edge_child': np.array(self.edge_child, dtype=np.int64),
+                'edge_prob': np.array(self.edge_prob, dtype=np.float64),
+                'edge_value': np.array(self.edge_value, dtype=np.float64),
+            }
+        return self._arrays
+
+    def path_counts(self) -> List[int]:
+        """Caminos lógicos bajo cada nodo (enteros de Python: no se desbordan)"""
+        paths = [0] * len(self)
+        for i in range(len(self)):
+            start, count = self.edge_start[i], self.edge_count[i]
+            paths[i] = 1 if count == 0 else sum(paths[c] for c in self.edge_child[start:start + count])
+        return paths
+
+    def path_count(self, node: int = None) -> int:
+        """Caminos lógicos (raíz a hoja) representados, sin materializarlos"""
+        return self.path_counts()[self.root if node is None else node]
+
+    def to_networkx(self):
+        """Exporta los nodos únicos (no los caminos) a un networkx.DiGraph"""
+        import networkx as nx
+
+        G = nx.DiGraph()
+        for node in range(len(self)):
+            G.add_node(node, kind=KIND_NAMES[self.kinds[node]], label=self.labels[node])
+            start = self.edge_start[node]
+            for e in range(start, start + self.edge_count[node]):
+                label = self.edge_labels[e]
+                if self.kinds[node] == CHANCE:
+                    label = f"{label} (p={self.edge_prob[e]:.2f})"
+                G.add_edge(node, self.edge_child[e], label=label,
+                           prob=self.edge_prob[e], value=self.edge_value[e])
+        return G
+
+
+@dataclass
+class Rollback:
+    tree: DecisionTree
+    values: np.ndarray     # valor esperado de cada nodo (desde ese nodo hacia abajo)
+    best_edge: np.ndarray  # arista elegida en cada nodo de decisión (-1 en los demás)
+
+    @property
+    def value(self) -> float:
+        """Valor esperado óptimo en la raíz"""
+        return float(self.values[self.tree.root])
+
+    def policy(self) -> List[Dict]:
+        """
+        Decisiones óptimas de los nodos alcanzables siguiendo la política
+        (cada nodo compartido aparece una sola vez)
+        """
+        tree = self.tree
+        rows, seen, stack = [], set(), [tree.root]
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            start, count = tree.edge_start[node], tree.edge_count[node]
+            if tree.kinds[node] == DECISION:
+                e = int(self.best_edge[node])
+                rows.append({'nodo': node, 'decision': tree.labels[node], 'opcion': tree.edge_labels[e],
+                             'valor_esperado': float(self.values[node])})
+                stack.append(tree.edge_child[e])
+            else:
+                stack.extend(tree.edge_child[start:start + count])
+        rows.sort(key=lambda row: -tree.heights[row['nodo']])
+        return rows
+
+
+def rollback(tree: DecisionTree) -> Rollback:
+    """
+    Inducción hacia atrás vectorizada por altura
+
+    Azar: Σ p·(pago + valor del hijo). Decisión: máximo de (pago + valor del
+    hijo); ante empate gana la primera opción.
+    """
+    arr = tree.arrays()
+    kind, height = arr['kind'], arr['height']
+    parent, child = arr['edge_parent'], arr['edge_child']
+    n = len(kind)
+    values = np.where(kind == TERMINAL, arr['payoff'], 0.0)
+    best_edge = np.full(n, -1, dtype=np.int64)
+
+    # Aristas agrupadas por la altura del padre (orden estable: se conserva el orden de las opciones)
+    order = np.argsort(height[parent], kind='stable')
+    bounds = np.searchsorted(height[parent][order], np.arange(int(height.max(initial=0)) + 2))
+    for h in range(1, len(bounds) - 1):
+        edges = order[bounds[h]:bounds[h + 1]]
+        if len(edges) == 0:
+            continue
+        contrib = arr['edge_value'][edges] + values[child[edges]]
+        is_chance = kind[parent[edges]] == CHANCE
+
+        chance_edges = edges[is_chance]
+        if len(chance_edges):
+            np.add.at(values, parent[chance_edges], arr['edge_prob'][chance_edges] * contrib[is_chance])
+
+        decision_edges = edges[~is_chance]
+        if len(decision_edges):
+            dec_contrib = contrib[~is_chance]
+            dec_parent = parent[decision_edges]
+            # Por padre: primero el mayor aporte; lexsort es estable ante empates
+            ranked = np.lexsort((-dec_contrib, dec_parent))
+            first = np.ones(len(ranked), dtype=bool)
+            first[1:] = dec_parent[ranked][1:] != dec_parent[ranked][:-1]
+            winners = ranked[first]
+            values[dec_parent[winners]] = dec_contrib[winners]
+            best_edge[dec_parent[winners]] = decision_edges[winners]
+    return Rollback(tree, values, best_edge)
+
+
+def activity_tree(activities, discount_rate: float = 0.12) -> DecisionTree:
+    """
+    Árbol secuencial de las actividades: en cada una se decide NO / SÍ y, si
+    SÍ, un nodo de azar reparte sus escenarios con el flujo descontado como
+    pago. El resto del árbol es el mismo subárbol compartido por todas las
+    ramas.
+    """
+    table = activity_table(activities, discount_rate)
+    tree = DecisionTree()
+    following = tree.terminal(0.0, 'Fin')
+    for i in reversed(range(len(table))):
+        k = int(table.n_outcomes[i])
+        branches = [(p, v, following, label) for p, v, label in
+                    zip(table.probs[i, :k].tolist(), table.discounted[i, :k].tolist(), table.labels[i])]
+        chance = tree.chance(branches, table.names[i])
+        following = tree.decision([(0.0, following, 'NO'), (0.0, chance, 'SÍ')], table.names[i])
+    tree.root = following
+    return tree
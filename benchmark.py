@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de las etapas del análisis con escenarios sintéticos.
+
+Genera módulos de parámetros sintéticos (n actividades, m escenarios por
+actividad, horizontes aleatorios y probabilidades que suman 1) y mide cada
+etapa para n = 8 … 30: tiempo (mejor de varias repeticiones) y memoria pico
+(tracemalloc, en una ejecución aparte para no contaminar el tiempo). Las
+etapas exponenciales tienen un n máximo (STAGE_LIMITS): sobre él se
+registran como omitidas en vez de agotar la memoria.
+
+Los resultados se escriben en JSON (una fila por etapa y n, más metadatos
+del entorno y la versión del código), así se pueden comparar corridas:
+
+    python benchmark.py --n 8 30 --salida benchmark.json
+    python benchmark.py --comparar antes.json despues.json
+"""
+from typing import Callable, Dict, List, Sequence
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import numpy as np
+
+# Máximo de actividades por etapa (None = sin límite)
+STAGE_LIMITS: Dict[str, int] = {
+    'enumerate_combinations': 20,
+    'evaluate_combinations': 24,
+    'exportar_csv': 20,
+    'analyze_scenario': 18,
+    'build_decision_tree_graph': None,
+    'render_tree': None,
+}
+
+DEFAULT_SIZES = list(range(8, 31, 2))
+DEFAULT_OUTCOMES = 3
+DEFAULT_REPEATS = 3
+DEFAULT_SEED = 12345
+DEFAULT_OUTPUT = 'benchmark_resultados.json'
+
+
+def synthetic_activities(n: int, m: int = DEFAULT_OUTCOMES, seed: int = DEFAULT_SEED) -> List[Dict]:
+    """Definiciones de actividades (mismo formato que los módulos de parámetros)"""
+    rng = random.Random(seed * 1_000_003 + n * 101 + m)
+    activities = []
+    for i in range(n):
+        weights = [rng.random() + 0.05 for _ in range(m)]
+        total = sum(weights)
+        probs = [round(w / total, 6) for w in weights]
+        probs[-1] = round(1.0 - sum(probs[:-1]), 6)  # Suma exacta de 1
+        activities.append({
+            'name': f'Actividad {i + 1}',
+            'decision_key': f'act_{i + 1}',
+            'horizon_years': rng.randint(1, 5),
+            'outcomes': [{'label': f'Escenario {j + 1}', 'prob': p, 'npv': round(rng.uniform(-60e6, 90e6), 2)}
+                         for j, p in enumerate(probs)],
+        })
+    return activities
+
+
+def synthetic_parameters(n: int, m: int = DEFAULT_OUTCOMES, seed: int = DEFAULT_SEED,
+                         discount_rate: float = 0.06) -> types.ModuleType:
+    """Módulo de parámetros sintético en memoria (usable donde se usa parametros_concesion)"""
+    module = types.ModuleType(f'parametros_sintetico_{n}_{m}')
+    module.discount_rate = discount_rate
+    module.activities = synthetic_activities(n, m, seed)
+    module.decision_order = [a['decision_key'] for a in module.activities]
+    return module
+
+
+def write_parameters_module(path: str, n: int, m: int = DEFAULT_OUTCOMES, seed: int = DEFAULT_SEED,
+                            discount_rate: float = 0.06):
+    """Escribe el módulo sintético como archivo .py con el formato de parametros_concesion.py"""
+    module = synthetic_parameters(n, m, seed, discount_rate)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('# -*- coding: utf-8 -*-\n')
+        f.write(f'"""\nParámetros sintéticos para benchmark: {n} actividades, {m} escenarios cada una '
+                f'(semilla {seed}).\n"""\n\n')
+        f.write(f'discount_rate = {discount_rate!r}\n\n')
+        f.write(f'activities = {json.dumps(module.activities, ensure_ascii=False, indent=4)}\n\n')
+        f.write('decision_order = [a["decision_key"] for a in activities]\n')
+
+
+@contextlib.contextmanager
+def _working_directory(path: str):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _stages(parametros, workdir: str) -> Dict[str, Callable[[], object]]:
+    """Etapas a medir para un módulo de parámetros (cada una es una función sin argumentos)"""
+    import main
+    from arbol import activity_tree, rollback
+    from combinaciones import combinations_frame, evaluate_combinations, keyed_ev_vector
+    from diagrama_arbol import render_tree
+    from escenarios import compile_activities
+    from formatos import write_table
+    from optimizador import PortfolioConstraints, PortfolioProblem, optimize_portfolios
+    from tabla_actividades import ActivityTable
+
+    activities = compile_activities(parametros)
+    rate = parametros.discount_rate
+    keys = parametros.decision_order
+    table = ActivityTable(activities, rate)
+    ev_by_key = dict(zip(table.decision_keys, table.ev.tolist()))
+    tree = activity_tree(table, rate)
+
+    def export_csv():
+        bits, ev_total = evaluate_combinations(keys, keyed_ev_vector(keys, ev_by_key))
+        write_table(combinations_frame(keys, bits, ev_total), os.path.join(workdir, 'combinaciones_ev'), 'csv')
+
+    def full_scenario():
+        with _working_directory(workdir), contextlib.redirect_stdout(io.StringIO()):
+            main.analyze_scenario(parametros, 'benchmark', 'resultados', use_cache=False, compute_only=True)
+
+    return {
+        'activity_table': lambda: ActivityTable(activities, rate),
+        'enumerate_combinations': lambda: main.enumerate_combinations(keys),
+        'evaluate_combinations': lambda: evaluate_combinations(keys, keyed_ev_vector(keys, ev_by_key)),
+        'top_k_combinations': lambda: main.top_k_combinations(activities, main.TOP_K, rate, keys),
+        'optimize_portfolios': lambda: optimize_portfolios(
+            PortfolioProblem(activities, PortfolioConstraints(max_activities=len(activities) // 2), rate), main.TOP_K),
+        'activity_tree_rollback': lambda: rollback(activity_tree(table, rate)),
+        'build_decision_tree_graph': lambda: main.build_decision_tree_graph(activities, rate),
+        'render_tree': lambda: render_tree(tree, os.path.join(workdir, 'arbol_decision.svg'), rollback(tree)),
+        'exportar_csv': export_csv,
+        'analyze_scenario': full_scenario,
+    }
+
+
+def _measure(fn: Callable[[], object], repeats: int) -> Dict:
+    """Mejor tiempo de `repeats` ejecuciones y memoria pico de una ejecución extra"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'seconds_all': times, 'peak_bytes': peak}
+
+
+def run_benchmark(sizes: Sequence[int] = DEFAULT_SIZES, outcomes: int = DEFAULT_OUTCOMES,
+                  repeats: int = DEFAULT_REPEATS, seed: int = DEFAULT_SEED,
+                  stages: Sequence[str] = None, progress: bool = True) -> Dict:
+    """
+    Mide las etapas para cada n de `sizes`
+    Retorna el documento de resultados (metadatos + filas)
+    """
+    from cache_resultados import code_version
+
+    rows = []
+    for n in sizes:
+        parametros = synthetic_parameters(n, outcomes, seed)
+        with tempfile.TemporaryDirectory(prefix='benchmark_') as workdir:
+            for stage, fn in _stages(parametros, workdir).items():
+                if stages and stage not in stages:
+                    continue
+                row = {'stage': stage, 'n_activities': n, 'n_outcomes': outcomes}
+                limit = STAGE_LIMITS.get(stage)
+                if limit is not None and n > limit:
+                    row.update({'skipped': True, 'reason': f'n > {limit}'})
+                else:
+                    row.update(_measure(fn, repeats))
+                    if progress:
+                        print(f"   ⏱️ n={n:>2} {stage:<28} {row['seconds']:>9.4f} s "
+                              f"{row['peak_bytes'] / 2**20:>9.1f} MiB")
+                rows.append(row)
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'code_version': code_version(),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'seed': seed,
+        'repeats': repeats,
+        'rows': rows,
+    }
+
+
+def save_results(results: Dict, path: str = DEFAULT_OUTPUT):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+
+
+def compare_runs(before_path: str, after_path: str) -> List[Dict]:
+    """Razón de tiempo y memoria (después / antes) por etapa y n presentes en ambas corridas"""
+    with open(before_path, 'r', encoding='utf-8') as f:
+        before = json.load(f)
+    with open(after_path, 'r', encoding='utf-8') as f:
+        after = json.load(f)
+    measured = lambda doc: {(r['stage'], r['n_activities'], r['n_outcomes']): r
+                            for r in doc['rows'] if not r.get('skipped')}
+    old, new = measured(before), measured(after)
+    rows = []
+    for key in sorted(old.keys() & new.keys(), key=lambda k: (k[0], k[1], k[2])):
+        rows.append({'stage': key[0], 'n_activities': key[1], 'n_outcomes': key[2],
+                     'time_ratio': new[key]['seconds'] / old[key]['seconds'] if old[key]['seconds'] else None,
+                     'memory_ratio': new[key]['peak_bytes'] / old[key]['peak_bytes'] if old[key]['peak_bytes'] else None})
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark de las etapas del análisis con escenarios sintéticos')
+    parser.add_argument('--n', type=int, nargs=2, default=[8, 30], metavar=('MIN', 'MAX'),
+                        help='rango de actividades (inclusive)')
+    parser.add_argument('--paso', type=int, default=2, help='incremento de n')
+    parser.add_argument('--escenarios', type=int, default=DEFAULT_OUTCOMES, help='escenarios por actividad')
+    parser.add_argument('--repeticiones', type=int, default=DEFAULT_REPEATS, help='repeticiones por medición')
+    parser.add_argument('--semilla', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--etapas', nargs='*', help='solo estas etapas')
+    parser.add_argument('--salida', default=DEFAULT_OUTPUT, help='archivo JSON de resultados')
+    parser.add_argument('--generar', metavar='RUTA', help='solo escribe el módulo de parámetros sintético de n=MIN')
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DESPUES'), help='compara dos archivos de resultados')
+    args = parser.parse_args()
+
+    if args.comparar:
+        for row in compare_runs(*args.comparar):
+            time_ratio = f"{row['time_ratio']:.2f}x" if row['time_ratio'] is not None else '-'
+            memory_ratio = f"{row['memory_ratio']:.2f}x" if row['memory_ratio'] is not None else '-'
+            print(f"{row['stage']:<28} n={row['n_activities']:>2} tiempo {time_ratio:>8} memoria {memory_ratio:>8}")
+    elif args.generar:
+        write_parameters_module(args.generar, args.n[0], args.escenarios, args.semilla)
+        print(f"💾 Módulo sintético guardado en: {args.generar}")
+    else:
+        print("🏁 Ejecutando benchmark...")
+        results = run_benchmark(range(args.n[0], args.n[1] + 1, args.paso), args.escenarios,
+                                args.repeticiones, args.semilla, args.etapas)
+        save_results(results, args.salida)
+        print(f"💾 Resultados guardados en: {args.salida}")
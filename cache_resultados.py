@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Caché persistente de resultados direccionada por contenido.
+
+Cada artefacto (un grupo de archivos generados: CSV, PNG, tablas binarias,
+Excel) se registra en un manifiesto JSON dentro de la carpeta de resultados
+(`<carpeta>/.cache/<espacio>.json`) junto con la clave de sus entradas:
+
+    clave = sha256(versión del código, nombre del artefacto, entradas...)
+
+donde las entradas son las definiciones de actividades (o el hash de
+contenido de su ActivityTable, que incluye la tasa de descuento) y cualquier
+opción que cambie la salida. En la siguiente ejecución un artefacto cuya
+clave no cambió y cuyos archivos siguen en disco se reutiliza sin
+recalcularlo ni redibujarlo.
+
+Además hay un almacén por actividad: valores derivados de una sola actividad
+(EV, perturbaciones del tornado) se guardan con la clave de esa actividad,
+así al cambiar un parámetro solo se recalcula la fila de la actividad
+modificada.
+
+La versión del código es el hash de los módulos del análisis (todos los .py
+de esta carpeta salvo los módulos de parámetros, que son entradas), de modo
+que cualquier cambio en el código invalida la caché.
+"""
+from functools import lru_cache
+from typing import Callable, Dict, Sequence
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from tabla_actividades import ActivityTable, activity_table
+
+CACHE_DIRNAME = '.cache'
+# Se incrementa para invalidar a mano todas las cachés existentes
+CACHE_FORMAT_VERSION = 1
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """Hash del código fuente del análisis (sin los módulos de parámetros)"""
+    digest = hashlib.sha256(str(CACHE_FORMAT_VERSION).encode('utf-8'))
+    base = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(base, '*.py'))):
+        if os.path.basename(path).startswith('parametros'):
+            continue
+        with open(path, 'rb') as f:
+            digest.update(os.path.basename(path).encode('utf-8'))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def cache_key(name: str, *inputs) -> str:
+    """
+    Clave de un artefacto a partir de sus entradas
+
+    Las ActivityTable aportan su hash de contenido (actividades + tasa); el
+    resto de las entradas se incorpora por su repr (dataclasses, listas,
+    números, strings), que es determinista.
+    """
+    digest = hashlib.sha256(code_version().encode('utf-8'))
+    digest.update(name.encode('utf-8'))
+    for item in inputs:
+        text = item.content_hash if isinstance(item, ActivityTable) else repr(item)
+        digest.update(b'\0' + text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Manifiesto de artefactos de una carpeta de resultados
+
+    namespace separa manifiestos de procesos distintos que escriben en la
+    misma carpeta (p. ej. el escenario de concesión y la comparación final).
+    """
+
+    def __init__(self, directory: str, namespace: str = 'resultados', enabled: bool = True):
+        self.directory = directory
+        self.enabled = enabled
+        self.path = os.path.join(directory, CACHE_DIRNAME, f'{namespace}.json')
+        self.hits = 0
+        self.misses = 0
+        self._manifest = {'artifacts': {}, 'activities': {}}
+        self._used_activity_keys: Dict[str, set] = {}
+        if enabled and os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('code_version') == code_version():
+                    self._manifest = manifest
+            except (OSError, ValueError):
+                pass  # Manifiesto corrupto: se parte de cero
+
+    def fresh(self, name: str, key: str, files: Sequence[str]) -> bool:
+        """True si el artefacto se puede reutilizar (misma clave y archivos presentes)"""
+        entry = self._manifest['artifacts'].get(name)
+        ok = (self.enabled and entry is not None and entry['key'] == key
+              and entry['files'] == list(files) and all(os.path.exists(p) for p in files))
+        if ok:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return ok
+
+    def record(self, name: str, key: str, files: Sequence[str]):
+        """Registra un artefacto recién generado"""
+        self._manifest['artifacts'][name] = {'key': key, 'files': list(files)}
+
+    def activity_values(self, name: str, activities, discount_rate: float,
+                        compute: Callable[[ActivityTable], np.ndarray], variant: Sequence = ()) -> np.ndarray:
+        """
+        Valores por actividad (primer eje = actividades) con caché por actividad
+
+        Solo las actividades cuya definición (o la tasa, o el código) cambió se
+        pasan a compute(), como una ActivityTable con ese subconjunto.
+        variant: parámetros que cambian la fila de una actividad sin ser parte
+        de ella (p. ej. el ancho al que se rellenan las filas); entran en la
+        clave, así una fila de otra forma nunca se reutiliza.
+        """
+        table = activity_table(activities, discount_rate)
+        store = self._manifest['activities'].setdefault(name, {})
+        keys = [cache_key(name, item, discount_rate, *variant) for item in table.activity_hashes]
+        self._used_activity_keys.setdefault(name, set()).update(keys)
+
+        missing = [i for i, key in enumerate(keys) if not self.enabled or key not in store]
+        if missing:
+            # Subconjunto sin registrar: es de un solo uso y ya trae sus hashes
+            fresh = compute(ActivityTable([table.activities[i] for i in missing], discount_rate,
+                                          activity_hashes=[table.activity_hashes[i] for i in missing]))
+            for i, values in zip(missing, np.asarray(fresh, dtype=np.float64)):
+                store[keys[i]] = values.tolist()
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        return np.array([store[key] for key in keys], dtype=np.float64)
+
+    def save(self):
+        """Escribe el manifiesto (descarta valores por actividad que ya no se usan)"""
+        if not self.enabled:
+            return
+        for name, used in self._used_activity_keys.items():
+            store = self._manifest['activities'][name]
+            for key in [k for k in store if k not in used]:
+                del store[key]
+        self._manifest['code_version'] = code_version()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    def report(self) -> str:
+        return f"{self.hits} reutilizados, {self.misses} recalculados"
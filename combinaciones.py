@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""
+Motor vectorizado para evaluar combinaciones de decisiones binarias.
+
+Cada combinación se representa como una máscara entera: el bit más
+significativo corresponde a la primera clave de `decision_order`, de modo que
+recorrer las máscaras 0, 1, 2, ... reproduce exactamente el orden de
+`itertools.product([0, 1], repeat=n)` usado por `enumerate_combinations`.
+"""
+from typing import Dict, Iterator, List, Sequence, Tuple
+import contextlib
+import heapq
+import json
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from formatos import TableStreamWriter
+
+# Cantidad de combinaciones evaluadas por bloque (acota la memoria de trabajo)
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+# Máximo de corridas ordenadas que se combinan a la vez en el merge externo
+MAX_MERGE_FANIN = 64
+
+# Límite duro: las máscaras se guardan en enteros de 64 bits
+MAX_DECISION_KEYS = 63
+
+
+def iter_mask_blocks(n_keys: int, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Genera las máscaras 0 .. 2^n - 1 en bloques consecutivos de tamaño fijo
+    """
+    if n_keys > MAX_DECISION_KEYS:
+        raise ValueError(f"Demasiadas decisiones para enumerar: {n_keys} (máximo {MAX_DECISION_KEYS})")
+    total = 1 << n_keys
+    for start in range(0, total, block_size):
+        stop = min(start + block_size, total)
+        yield np.arange(start, stop, dtype=np.uint64)
+
+
+def masks_to_bits(masks: np.ndarray, n_keys: int) -> np.ndarray:
+    """
+    Decodifica máscaras en una matriz de bits (filas = combinaciones, columnas = decisiones)
+    La columna 0 es el bit más significativo, igual que en itertools.product
+    """
+    shifts = np.arange(n_keys - 1, -1, -1, dtype=np.uint64)
+    return ((masks[:, None] >> shifts) & np.uint64(1)).astype(np.int8)
+
+
+def evaluate_bits(bits: np.ndarray, ev_vector: np.ndarray) -> np.ndarray:
+    """
+    Calcula EV_total = bits · ev_vector para un bloque de combinaciones
+
+    Se acumula columna por columna (en el orden de las decisiones) para
+    obtener exactamente los mismos flotantes que la suma secuencial en Python;
+    así los empates se ordenan igual que antes.
+    """
+    total = np.zeros(bits.shape[0], dtype=np.float64)
+    for j in range(bits.shape[1]):
+        if ev_vector[j] != 0.0:
+            total += bits[:, j] * ev_vector[j]
+    return total
+
+
+def evaluate_combinations(decision_order: Sequence[str], ev_vector: Sequence[float],
+                          block_size: int = DEFAULT_BLOCK_SIZE,
+                          progress=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Evalúa las 2^n combinaciones por bloques
+
+    Retorna (bits, ev_total): matriz int8 de decisiones y vector de EV total,
+    en el mismo orden que `enumerate_combinations`.
+    """
+    n_keys = len(decision_order)
+    ev = np.asarray(ev_vector, dtype=np.float64)
+    if ev.shape != (n_keys,):
+        raise ValueError(f"El vector de EV tiene {ev.shape[0]} elementos y hay {n_keys} decisiones")
+
+    total = 1 << n_keys
+    bits = np.empty((total, n_keys), dtype=np.int8)
+    ev_total = np.empty(total, dtype=np.float64)
+    for masks in iter_mask_blocks(n_keys, block_size):
+        start = int(masks[0])
+        stop = start + len(masks)
+        block_bits = masks_to_bits(masks, n_keys)
+        bits[start:stop] = block_bits
+        ev_total[start:stop] = evaluate_bits(block_bits, ev)
+        if progress is not None:
+            progress(stop, total)
+    return bits, ev_total
+
+
+def combinations_frame(decision_order: Sequence[str], bits: np.ndarray, ev_total: np.ndarray):
+    """
+    Arma el DataFrame de combinaciones (una columna por decisión + EV_total)
+    """
+    import pandas as pd
+
+    columns: Dict[str, np.ndarray] = {key: bits[:, j] for j, key in enumerate(decision_order)}
+    columns['EV_total'] = ev_total
+    return pd.DataFrame(columns)
+
+
+def keyed_ev_vector(decision_order: Sequence[str], ev_by_key: Dict[str, float]) -> np.ndarray:
+    """
+    Vector de EV alineado por clave con `decision_order`
+
+    La decisión j usa la actividad cuya decision_key es decision_order[j];
+    las decisiones sin actividad (p. ej. `concesionar_todo` en parametros.py)
+    no aportan EV. Antes se emparejaba por posición (`zip(bits, activities)`),
+    lo que corría todas las actividades un lugar cuando había claves extra.
+    """
+    return np.array([ev_by_key.get(key, 0.0) for key in decision_order], dtype=np.float64)
+
+
+def k_best_deviations(ev_vector: Sequence[float], k: int, worst: bool = False) -> np.ndarray:
+    """
+    Obtiene las k mejores (o peores) combinaciones sin enumerar las 2^n
+
+    Como el EV es aditivo, la mejor combinación activa toda decisión con EV > 0
+    y cualquier otra se obtiene desviándose de ella: cambiar la decisión j
+    cuesta |EV_j|. Una búsqueda best-first con cola de prioridad sobre los
+    costos ordenados entrega las desviaciones en orden creciente de costo,
+    en O(n log n + k log k). Con `worst=True` se parte de la peor combinación.
+
+    Retorna la matriz de bits (k filas, en orden de búsqueda).
+    """
+    ev = np.asarray(ev_vector, dtype=np.float64)
+    n_keys = len(ev)
+    base = (ev < 0) if worst else (ev > 0)
+    base_bits = base.astype(np.int8)
+    k = min(k, 2 ** n_keys)
+    if k <= 0:
+        return np.empty((0, n_keys), dtype=np.int8)
+
+    order = np.argsort(np.abs(ev), kind='stable')
+    costs = np.abs(ev)[order].tolist()
+
+    # Cada entrada: (costo acumulado, índice del último cambio, cambios como bits sobre `order`)
+    deviations = [0]
+    heap = [(costs[0], 0, 1)] if n_keys > 0 else []
+    while heap and len(deviations) < k:
+        cost, i, flips = heapq.heappop(heap)
+        deviations.append(flips)
+        if i + 1 < n_keys:
+            nxt = 1 << (i + 1)
+            heapq.heappush(heap, (cost + costs[i + 1], i + 1, flips | nxt))
+            heapq.heappush(heap, (cost - costs[i] + costs[i + 1], i + 1, (flips ^ (1 << i)) | nxt))
+
+    bits = np.repeat(base_bits[None, :], len(deviations), axis=0)
+    for row, flips in enumerate(deviations):
+        pos = 0
+        while flips:
+            if flips & 1:
+                j = order[pos]
+                bits[row, j] = 1 - bits[row, j]
+            flips >>= 1
+            pos += 1
+    return bits
+
+
+def iter_evaluated_blocks(decision_order: Sequence[str], ev_vector: Sequence[float],
+                          block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Versión generadora de `evaluate_combinations`: entrega (bits, ev_total) por bloque
+    sin retener las 2^n filas en memoria
+    """
+    n_keys = len(decision_order)
+    ev = np.asarray(ev_vector, dtype=np.float64)
+    for masks in iter_mask_blocks(n_keys, block_size):
+        bits = masks_to_bits(masks, n_keys)
+        yield bits, evaluate_bits(bits, ev)
+
+
+class StreamSummary:
+    """
+    Estado acotado de una evaluación en streaming: k mejores, k peores y estadísticas
+    """
+
+    def __init__(self, n_keys: int, k: int = 10):
+        self.k = k
+        self.count = 0
+        self.ev_sum = 0.0
+        self.ev_min = math.inf
+        self.ev_max = -math.inf
+        self._top_bits = np.empty((0, n_keys), dtype=np.int8)
+        self._top_ev = np.empty(0, dtype=np.float64)
+        self._worst_bits = np.empty((0, n_keys), dtype=np.int8)
+        self._worst_ev = np.empty(0, dtype=np.float64)
+
+    @staticmethod
+    def _keep(bits: np.ndarray, ev: np.ndarray, k: int, largest: bool) -> Tuple[np.ndarray, np.ndarray]:
+        if len(ev) <= k:
+            return bits, ev
+        key = -ev if largest else ev
+        idx = np.argpartition(key, k - 1)[:k]
+        idx.sort()
+        return bits[idx], ev[idx]
+
+    def update(self, bits: np.ndarray, ev_total: np.ndarray):
+        """Incorpora un bloque evaluado"""
+        if len(ev_total) == 0:
+            return
+        self.count += len(ev_total)
+        self.ev_sum += float(ev_total.sum())
+        self.ev_min = min(self.ev_min, float(ev_total.min()))
+        self.ev_max = max(self.ev_max, float(ev_total.max()))
+        self._top_bits, self._top_ev = self._keep(
+            np.concatenate([self._top_bits, bits]), np.concatenate([self._top_ev, ev_total]), self.k, True)
+        self._worst_bits, self._worst_ev = self._keep(
+            np.concatenate([self._worst_bits, bits]), np.concatenate([self._worst_ev, ev_total]), self.k, False)
+
+    @property
+    def ev_mean(self) -> float:
+        return self.ev_sum / self.count if self.count else math.nan
+
+    def extremes(self) -> Tuple[Tuple[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]:
+        """
+        Retorna ((bits, ev) de las k mejores, (bits, ev) de las k peores), ambas
+        ordenadas de mayor a menor EV como df_sorted.head(k) / df_sorted.tail(k)
+        """
+        top = np.argsort(-self._top_ev, kind='stable')
+        worst = np.argsort(-self._worst_ev, kind='stable')
+        return (self._top_bits[top], self._top_ev[top]), (self._worst_bits[worst], self._worst_ev[worst])
+
+
+def stream_combinations_csv(path: str, decision_order: Sequence[str], ev_vector: Sequence[float],
+                            k: int = 10, block_size: int = DEFAULT_BLOCK_SIZE,
+                            sort: bool = False, progress=None,
+                            table_dir: str = None, fmt: str = 'csv') -> StreamSummary:
+    """
+    Evalúa las combinaciones por bloques y las agrega incrementalmente a un CSV
+
+    Solo se mantiene en memoria un bloque y el resumen acotado (`StreamSummary`).
+    Con `sort=True` cada bloque se escribe ordenado como una corrida temporal
+    y luego se combinan con un merge externo, dejando el archivo completo
+    ordenado por EV_total descendente (los empates quedan en orden de máscara).
+    Con `table_dir` además se escribe la tabla compacta (máscaras + EV, sin ordenar).
+    Con `fmt` parquet/feather los bloques se agregan a un archivo columnar
+    (la extensión de `path` se reemplaza); el merge externo es solo para CSV.
+    """
+    if sort and fmt != 'csv':
+        raise ValueError("El orden externo del archivo solo está disponible en formato CSV")
+
+    n_keys = len(decision_order)
+    total = 1 << n_keys
+    summary = StreamSummary(n_keys, k)
+    header = ','.join(list(decision_order) + ['EV_total']) + '\n'
+
+    run_paths = []
+    writer = CombinationTableWriter(table_dir, decision_order) if table_dir is not None else None
+    stream = TableStreamWriter(os.path.splitext(path)[0], fmt, bool_columns=decision_order) if fmt != 'csv' else None
+    run_dir = tempfile.mkdtemp(prefix='corridas_', dir=os.path.dirname(os.path.abspath(path))) if sort else None
+    try:
+        with open(path, 'w', encoding='utf-8', newline='') if stream is None else contextlib.nullcontext() as out:
+            if not sort and stream is None:
+                out.write(header)
+            done = 0
+            for bits, ev_total in iter_evaluated_blocks(decision_order, ev_vector, block_size):
+                summary.update(bits, ev_total)
+                if writer is not None:
+                    writer.append(np.arange(done, done + len(ev_total), dtype=np.uint64), ev_total)
+                df = combinations_frame(decision_order, bits, ev_total)
+                if stream is not None:
+                    stream.write(df)
+                elif sort:
+                    df = df.sort_values('EV_total', ascending=False, kind='stable')
+                    run_path = os.path.join(run_dir, f'corrida_{len(run_paths):05d}.csv')
+                    df.to_csv(run_path, index=False, header=False)
+                    run_paths.append(run_path)
+                else:
+                    df.to_csv(out, index=False, header=False)
+                done += len(ev_total)
+                if progress is not None:
+                    progress(done, total)
+
+            if sort:
+                out.write(header)
+                _merge_sorted_runs(run_paths, out)
+    finally:
+        if writer is not None:
+            writer.close()
+        if stream is not None:
+            stream.close()
+        if run_dir is not None:
+            shutil.rmtree(run_dir, ignore_errors=True)
+    return summary
+
+
+def _merge_sorted_runs(run_paths: List[str], out):
+    """
+    Merge externo de corridas CSV ordenadas por EV_total (última columna) descendente
+    Si hay más de MAX_MERGE_FANIN corridas se combinan por etapas
+    """
+    run_paths = list(run_paths)
+    stage = 0
+    while len(run_paths) > MAX_MERGE_FANIN:
+        merged = []
+        for i in range(0, len(run_paths), MAX_MERGE_FANIN):
+            group = run_paths[i:i + MAX_MERGE_FANIN]
+            merged_path = f'{group[0]}.etapa{stage}'
+            with open(merged_path, 'w', encoding='utf-8', newline='') as f:
+                _merge_runs_into(group, f)
+            for p in group:
+                os.remove(p)
+            merged.append(merged_path)
+        run_paths = merged
+        stage += 1
+    _merge_runs_into(run_paths, out)
+
+
+def _merge_runs_into(run_paths: List[str], out):
+    files = [open(p, 'r', encoding='utf-8') for p in run_paths]
+    try:
+        def keyed(f):
+            for line in f:
+                yield -float(line.rsplit(',', 1)[1]), line
+        for _, line in heapq.merge(*(keyed(f) for f in files), key=lambda item: item[0]):
+            out.write(line)
+    finally:
+        for f in files:
+            f.close()
+
+
+# Archivos de la tabla compacta de combinaciones (junto a combinaciones_ev.csv)
+TABLE_MASKS_FILE = 'combinaciones_mascaras.u64'
+TABLE_EV_FILE = 'combinaciones_ev.f64'
+TABLE_META_FILE = 'combinaciones_tabla.json'
+
+
+def bits_to_masks(bits: np.ndarray) -> np.ndarray:
+    """Inverso de `masks_to_bits`: empaqueta cada fila de bits en un uint64"""
+    n_keys = bits.shape[1]
+    shifts = np.arange(n_keys - 1, -1, -1, dtype=np.uint64)
+    return (bits.astype(np.uint64) << shifts).sum(axis=1, dtype=np.uint64)
+
+
+class CombinationTable:
+    """
+    Tabla compacta de combinaciones: una máscara uint64 y un EV float64 por fila
+
+    Ocupa 16 bytes por combinación (en vez de 8 bytes por decisión en el
+    DataFrame). Las columnas de decisión se decodifican solo cuando se piden.
+    """
+
+    def __init__(self, decision_order: Sequence[str], masks: np.ndarray, ev_total: np.ndarray,
+                 is_sorted: bool = True):
+        if len(decision_order) > MAX_DECISION_KEYS:
+            raise ValueError(f"Demasiadas decisiones para una máscara de 64 bits: {len(decision_order)}")
+        self.decision_order = list(decision_order)
+        self.masks = masks
+        self.ev_total = ev_total
+        self.is_sorted = is_sorted
+
+    def __len__(self) -> int:
+        return len(self.ev_total)
+
+    @property
+    def nbytes(self) -> int:
+        return self.masks.nbytes + self.ev_total.nbytes
+
+    def decode(self, rows=None):
+        """DataFrame (decisiones + EV_total) de las filas pedidas (slice, índices o todas)"""
+        if rows is None:
+            rows = slice(None)
+        masks = np.asarray(self.masks[rows], dtype=np.uint64)
+        bits = masks_to_bits(np.atleast_1d(masks), len(self.decision_order))
+        return combinations_frame(self.decision_order, bits, np.atleast_1d(np.asarray(self.ev_total[rows])))
+
+    def column(self, key: str) -> np.ndarray:
+        """Decodifica una sola columna de decisión para todas las filas"""
+        j = self.decision_order.index(key)
+        shift = np.uint64(len(self.decision_order) - 1 - j)
+        return ((np.asarray(self.masks) >> shift) & np.uint64(1)).astype(np.int8)
+
+    def _ranked(self, k: int, largest: bool) -> np.ndarray:
+        k = min(k, len(self))
+        if self.is_sorted:
+            return np.arange(k) if largest else np.arange(len(self) - k, len(self))
+        ev = np.asarray(self.ev_total)
+        key = -ev if largest else ev
+        idx = np.argpartition(key, k - 1)[:k] if 0 < k < len(self) else np.arange(len(self))[:k]
+        return idx[np.argsort(-ev[idx], kind='stable')]
+
+    def head(self, k: int = 10):
+        """Las k combinaciones de mayor EV (como df_sorted.head(k))"""
+        return self.decode(self._ranked(k, largest=True)).reset_index(drop=True)
+
+    def tail(self, k: int = 10):
+        """Las k combinaciones de menor EV, de mayor a menor (como df_sorted.tail(k))"""
+        return self.decode(self._ranked(k, largest=False)).reset_index(drop=True)
+
+    def save(self, directory: str):
+        """Persiste la tabla como archivos binarios crudos + metadatos JSON"""
+        np.asarray(self.masks, dtype=np.uint64).tofile(os.path.join(directory, TABLE_MASKS_FILE))
+        np.asarray(self.ev_total, dtype=np.float64).tofile(os.path.join(directory, TABLE_EV_FILE))
+        _write_table_meta(directory, self.decision_order, len(self), self.is_sorted)
+
+
+class CombinationTableWriter:
+    """Escritura incremental de la tabla (modo streaming): agrega bloques a los archivos crudos"""
+
+    def __init__(self, directory: str, decision_order: Sequence[str]):
+        self.directory = directory
+        self.decision_order = list(decision_order)
+        self.count = 0
+        self._masks = open(os.path.join(directory, TABLE_MASKS_FILE), 'wb')
+        self._ev = open(os.path.join(directory, TABLE_EV_FILE), 'wb')
+
+    def append(self, masks: np.ndarray, ev_total: np.ndarray):
+        np.asarray(masks, dtype=np.uint64).tofile(self._masks)
+        np.asarray(ev_total, dtype=np.float64).tofile(self._ev)
+        self.count += len(ev_total)
+
+    def close(self):
+        self._masks.close()
+        self._ev.close()
+        _write_table_meta(self.directory, self.decision_order, self.count, is_sorted=False)
+
+
+def _write_table_meta(directory: str, decision_order: Sequence[str], count: int, is_sorted: bool):
+    meta = {
+        'decision_order': list(decision_order),
+        'count': int(count),
+        'sorted': bool(is_sorted),
+        'masks_file': TABLE_MASKS_FILE,
+        'ev_file': TABLE_EV_FILE,
+    }
+    with open(os.path.join(directory, TABLE_META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def open_combination_table(directory: str, decision_order: Sequence[str] = None) -> CombinationTable:
+    """
+    Abre una tabla guardada con memoria mapeada (sin copiar ni re-parsear CSV)
+
+    Los metadatos se validan contra los archivos crudos (tamaño = count * 8
+    bytes) y, si se indica `decision_order`, contra las decisiones esperadas;
+    una tabla corrupta o de otro escenario se rechaza con ValueError en vez
+    de mapear basura.
+    """
+    with open(os.path.join(directory, TABLE_META_FILE), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    try:
+        count, order, is_sorted = meta['count'], meta['decision_order'], meta['sorted']
+        masks_file, ev_file = meta['masks_file'], meta['ev_file']
+    except (KeyError, TypeError) as exc:
+        raise ValueError(f"Metadatos de tabla incompletos en {directory}: {exc}") from exc
+    if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+        raise ValueError(f"Cantidad de filas inválida en los metadatos: {count!r}")
+    if not isinstance(order, list) or not all(isinstance(key, str) for key in order):
+        raise ValueError(f"Orden de decisiones inválido en los metadatos: {order!r}")
+    if decision_order is not None and order != list(decision_order):
+        raise ValueError(f"La tabla guardada tiene otras decisiones: {order} (se esperaba {list(decision_order)})")
+    for name, dtype in ((masks_file, np.uint64), (ev_file, np.float64)):
+        size = os.path.getsize(os.path.join(directory, name))
+        if size != count * np.dtype(dtype).itemsize:
+            raise ValueError(f"{name} tiene {size} bytes y los metadatos indican {count} filas")
+
+    def mapped(name, dtype):
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(directory, name), dtype=dtype, mode='r', shape=(count,))
+
+    return CombinationTable(order, mapped(masks_file, np.uint64), mapped(ev_file, np.float64),
+                            is_sorted=is_sorted)
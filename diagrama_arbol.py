@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Layout jerárquico determinista y dibujo vectorial de árboles de decisión.
+
+El árbol de `arbol.DecisionTree` comparte subárboles; para dibujarlo se
+expande como árbol, pero solo hasta una profundidad máxima o mientras la
+masa de probabilidad del camino (producto de las probabilidades de azar)
+no baje de un umbral. Lo que queda debajo se colapsa en un único nodo que
+indica cuántos caminos lógicos resume y su valor esperado.
+
+Layout en O(nodos dibujados): recorrido en profundidad que asigna a cada
+hoja la siguiente columna y centra cada padre sobre sus hijos; la fila es la
+profundidad. No hay aleatoriedad, así el mismo árbol produce siempre la
+misma imagen. La salida se elige por la extensión (SVG o PDF recomendados).
+"""
+from dataclasses import dataclass
+from typing import List
+import os
+
+import numpy as np
+
+from arbol import CHANCE, DECISION, TERMINAL, DecisionTree, Rollback
+
+DEFAULT_MAX_DEPTH = 6
+DEFAULT_MIN_MASS = 0.0
+# Tamaño máximo de la figura en pulgadas (los árboles muy anchos se comprimen)
+MAX_FIGURE_WIDTH = 200.0
+
+
+@dataclass
+class TreeLayout:
+    node: np.ndarray       # id del nodo en el DecisionTree
+    parent: np.ndarray     # posición del padre en el layout (-1 en la raíz)
+    edge: np.ndarray       # arista del DecisionTree que llega al nodo (-1 en la raíz)
+    depth: np.ndarray
+    mass: np.ndarray       # probabilidad del camino desde la raíz
+    collapsed: np.ndarray  # subárbol resumido en este nodo
+    x: np.ndarray
+    y: np.ndarray
+    n_leaves: int
+
+    def __len__(self) -> int:
+        return len(self.node)
+
+
+def layout_tree(tree: DecisionTree, max_depth: int = DEFAULT_MAX_DEPTH,
+                min_mass: float = DEFAULT_MIN_MASS) -> TreeLayout:
+    """
+    Expande el árbol desde la raíz colapsando los subárboles que quedan bajo
+    max_depth o bajo min_mass, y calcula posiciones jerárquicas
+    """
+    node, parent, edge, depth, mass, collapsed = [], [], [], [], [], []
+    stack = [(tree.root, -1, -1, 0, 1.0)]
+    while stack:
+        n, p, e, d, m = stack.pop()
+        pos = len(node)
+        node.append(n)
+        parent.append(p)
+        edge.append(e)
+        depth.append(d)
+        mass.append(m)
+        count = tree.edge_count[n]
+        stop = count > 0 and (d >= max_depth or m < min_mass)
+        collapsed.append(stop)
+        if count == 0 or stop:
+            continue
+        start = tree.edge_start[n]
+        is_chance = tree.kinds[n] == CHANCE
+        # En orden inverso para que el primer hijo se visite primero (preorden)
+        for c in range(start + count - 1, start - 1, -1):
+            child_mass = m * tree.edge_prob[c] if is_chance else m
+            stack.append((tree.edge_child[c], pos, c, d + 1, child_mass))
+
+    parent_arr = np.array(parent, dtype=np.int64)
+    n_nodes = len(node)
+    x = np.zeros(n_nodes)
+    lo = np.full(n_nodes, np.inf)
+    hi = np.full(n_nodes, -np.inf)
+    is_leaf = np.ones(n_nodes, dtype=bool)
+    is_leaf[parent_arr[parent_arr >= 0]] = False
+    # En preorden las hojas aparecen de izquierda a derecha
+    x[is_leaf] = np.arange(int(is_leaf.sum()))
+    # Posiciones de los padres: de abajo hacia arriba (en preorden inverso los hijos van antes)
+    for i in range(n_nodes - 1, -1, -1):
+        if is_leaf[i]:
+            lo[i] = hi[i] = x[i]
+        else:
+            x[i] = (lo[i] + hi[i]) / 2
+        p = parent_arr[i]
+        if p >= 0:
+            lo[p] = min(lo[p], x[i])
+            hi[p] = max(hi[p], x[i])
+    depth_arr = np.array(depth, dtype=np.int64)
+    return TreeLayout(np.array(node, dtype=np.int64), parent_arr, np.array(edge, dtype=np.int64), depth_arr,
+                      np.array(mass), np.array(collapsed, dtype=bool), x, -depth_arr.astype(np.float64),
+                      int(is_leaf.sum()))
+
+
+def _node_text(tree: DecisionTree, layout: TreeLayout, i: int, paths: List[int], result: Rollback) -> str:
+    n = int(layout.node[i])
+    if layout.collapsed[i]:
+        text = f"… {paths[n]:,} caminos"
+        if result is not None:
+            text += f"\nEV {result.values[n] / 1e6:,.1f}M"
+        return text
+    text = tree.labels[n]
+    if result is not None and tree.kinds[n] != TERMINAL:
+        text += f"\nEV {result.values[n] / 1e6:,.1f}M"
+    return text
+
+
+def _edge_text(tree: DecisionTree, e: int, from_chance: bool) -> str:
+    label = tree.edge_labels[e]
+    return f"{label}\np={tree.edge_prob[e]:.2f}" if from_chance else label
+
+
+def render_tree(tree: DecisionTree, outfile: str, result: Rollback = None, title: str = '',
+                max_depth: int = DEFAULT_MAX_DEPTH, min_mass: float = DEFAULT_MIN_MASS) -> TreeLayout:
+    """
+    Dibuja el árbol con layout jerárquico; el formato sale de la extensión de
+    outfile (.svg, .pdf o .png). Con `result` (de arbol.rollback) se marca la
+    política óptima y se anota el EV de cada nodo.
+    Retorna el layout usado.
+    """
+    import matplotlib
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    layout = layout_tree(tree, max_depth, min_mass)
+    paths = tree.path_counts()
+    kinds = np.array(tree.kinds, dtype=np.int8)[layout.node]
+
+    n_leaves = layout.n_leaves
+    width = min(max(8.0, n_leaves * 1.1), MAX_FIGURE_WIDTH)
+    height = max(4.0, (int(layout.depth.max(initial=0)) + 1) * 1.4)
+    font = 7 if n_leaves * 1.1 <= MAX_FIGURE_WIDTH else 4
+
+    child = np.nonzero(layout.parent >= 0)[0]
+    segments = np.stack([np.column_stack([layout.x[layout.parent[child]], layout.y[layout.parent[child]]]),
+                         np.column_stack([layout.x[child], layout.y[child]])], axis=1)
+    on_policy = np.zeros(len(child), dtype=bool)
+    if result is not None:
+        on_policy = result.best_edge[layout.node[layout.parent[child]]] == layout.edge[child]
+
+    # Metadatos sin fecha y sal fija de ids SVG: la misma entrada produce el mismo archivo
+    ext = os.path.splitext(outfile)[1].lower()
+    metadata = {'.svg': {'Date': None}, '.pdf': {'CreationDate': None}}.get(ext)
+    with matplotlib.rc_context({'svg.hashsalt': 'arbol-decision'}):
+        fig, ax = plt.subplots(figsize=(width, height))
+        ax.add_collection(LineCollection(segments[~on_policy], colors='#95A5A6', linewidths=0.8, zorder=1))
+        ax.add_collection(LineCollection(segments[on_policy], colors='#27AE60', linewidths=2.0, zorder=1))
+        styles = ((DECISION, 's', '#3498DB', 'Decisión'), (CHANCE, 'o', '#F39C12', 'Azar'),
+                  (TERMINAL, '^', '#7F8C8D', 'Fin'))
+        for kind, marker, color, name in styles:
+            mask = (kinds == kind) & ~layout.collapsed
+            ax.scatter(layout.x[mask], layout.y[mask], marker=marker, s=120, c=color, zorder=2, label=name)
+        ax.scatter(layout.x[layout.collapsed], layout.y[layout.collapsed], marker='D', s=90, c='#BDC3C7',
+                   edgecolors='#7F8C8D', zorder=2, label='Subárbol colapsado')
+        for i in range(len(layout)):
+            ax.text(layout.x[i], layout.y[i] - 0.18, _node_text(tree, layout, i, paths, result),
+                    ha='center', va='top', fontsize=font, zorder=3)
+        for i in child:
+            p = layout.parent[i]
+            text = _edge_text(tree, int(layout.edge[i]), kinds[p] == CHANCE)
+            if text:
+                ax.text((layout.x[i] + layout.x[p]) / 2, (layout.y[i] + layout.y[p]) / 2, text,
+                        ha='center', va='center', fontsize=font - 1, color='#555555', zorder=3,
+                        bbox={'boxstyle': 'round,pad=0.1', 'fc': 'white', 'ec': 'none', 'alpha': 0.8})
+        ax.set_xlim(layout.x.min() - 1, layout.x.max() + 1)
+        ax.set_ylim(layout.y.min() - 1, 0.5)
+        ax.axis('off')
+        ax.legend(loc='upper right', fontsize=8)
+        if title:
+            ax.set_title(title)
+        fig.savefig(outfile, metadata=metadata, bbox_inches='tight')
+        plt.close(fig)
+    return layout
@@ -0,0 +1,466 @@
+# -*- coding: utf-8 -*-
+"""
+Carga de escenarios desde archivos de datos (JSON, YAML, CSV, Excel).
+
+Un escenario es lo mismo que un módulo de parámetros: tasa de descuento,
+lista de actividades (dicts con name, decision_key, horizon_years, outcomes
+y opcionalmente cost y resources), decision_order y las restricciones y
+grupos opcionales (budget, capacity, max_activities, required_activities,
+choice_groups). `Scenario` expone esos mismos atributos, así se usa en
+cualquier lugar donde se usa `parametros_concesion`, sin ejecutar Python.
+
+Formatos:
+
+- JSON / YAML: un escenario (objeto con "activities") o varios bajo
+  "escenarios" (objeto nombre -> escenario). YAML requiere PyYAML.
+- CSV: una fila por outcome con las columnas de la hoja que escribe
+  `create_parameters_excel` (escenario, actividad, decision_key, caso, label,
+  prob, npv, horizon_years, discount_rate). escenario, decision_key y
+  discount_rate son opcionales (sin decision_key se deriva del nombre, sin
+  discount_rate se usa DEFAULT_DISCOUNT_RATE); también se leen cost,
+  concesionado y recurso_<nombre>.
+- Excel (.xlsx): la hoja Todos_Parametros si existe, si no cada hoja es un
+  escenario. Requiere openpyxl.
+
+La validación es en lote: se revisan todas las actividades de todos los
+escenarios (probabilidades que suman 1, decision_key únicas, horizontes
+enteros > 0, campos faltantes, decision_order consistente) y se informa la
+lista completa de errores en un solo `ScenarioError`.
+
+Los escenarios validados y compilados (con sus `Activity`) se guardan en
+forma binaria junto al archivo (`.cache/escenarios/<archivo>.pickle`); la
+siguiente carga de un archivo sin cambios no vuelve a parsear ni validar.
+
+    python escenarios.py parques/*.yaml              # valida en lote
+    python escenarios.py --exportar parametros_concesion concesion.json
+"""
+from typing import Dict, List, Sequence
+import csv
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import re
+import unicodedata
+
+import numpy as np
+
+from cache_resultados import CACHE_DIRNAME, code_version
+from instrumentacion import count, span
+from tabla_actividades import Activity, ActivityOutcome
+
+# Tasa cuando el archivo no la define (la misma que usa analyze_scenario)
+DEFAULT_DISCOUNT_RATE = 0.12
+# Tolerancia de la suma de probabilidades (la de verify_probabilities)
+PROB_TOLERANCE = 0.001
+
+SCENARIO_FORMATS = {'.json': 'json', '.yaml': 'yaml', '.yml': 'yaml', '.csv': 'csv', '.xlsx': 'excel'}
+# Hoja con todos los escenarios en el Excel de create_parameters_excel
+EXCEL_ALL_SHEET = 'Todos_Parametros'
+CACHE_SUBDIR = 'escenarios'
+
+# Atributos opcionales de un módulo de parámetros que se copian tal cual
+OPTIONAL_FIELDS = ('budget', 'capacity', 'max_activities', 'required_activities', 'choice_groups')
+RESOURCE_PREFIX = 'recurso_'
+
+
+class ScenarioError(ValueError):
+    """Errores de validación de uno o más escenarios (lista completa en `errors`)"""
+
+    def __init__(self, errors: List[str]):
+        self.errors = list(errors)
+        shown = '\n'.join(f'  - {e}' for e in self.errors[:50])
+        more = f'\n  ... y {len(self.errors) - 50} más' if len(self.errors) > 50 else ''
+        super().__init__(f"{len(self.errors)} errores en los escenarios:\n{shown}{more}")
+
+
+class Scenario:
+    """Escenario cargado: mismos atributos que un módulo de parámetros"""
+
+    def __init__(self, name: str, activities: List[Dict], discount_rate: float = DEFAULT_DISCOUNT_RATE,
+                 decision_order: List[str] = None, source: str = None, **options):
+        self.name = name
+        self.source = source
+        self.discount_rate = discount_rate
+        self.activities = activities
+        if not decision_order:
+            decision_order = [a['decision_key'] for a in activities or []
+                              if isinstance(a, dict) and 'decision_key' in a]
+        self.decision_order = list(decision_order)
+        for field_name in OPTIONAL_FIELDS:
+            if options.get(field_name) is not None:
+                setattr(self, field_name, options[field_name])
+        # Representación interna (se llena al validar)
+        self.compiled: List[Activity] = []
+
+    def __repr__(self) -> str:
+        return f"Scenario({self.name!r}, {len(self.activities)} actividades, tasa {self.discount_rate})"
+
+
+def slugify(text: str) -> str:
+    """decision_key derivada de un nombre: 'Alojamiento (Lodge)' -> 'alojamiento_lodge'"""
+    ascii_text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '_', ascii_text.lower()).strip('_')
+
+
+def _number(value, kind=float):
+    if isinstance(value, str):
+        value = value.strip().replace(',', '') if kind is float else value.strip()
+    return kind(value)
+
+
+# ---------------------------------------------------------------------------
+# Lectura por formato: todos producen {nombre: dict de escenario}
+# ---------------------------------------------------------------------------
+
+def _from_document(doc, default_name: str) -> Dict[str, Dict]:
+    if not isinstance(doc, dict):
+        raise ScenarioError([f"{default_name}: se esperaba un objeto con 'activities' o 'escenarios'"])
+    if 'escenarios' in doc:
+        return {str(name): dict(body) for name, body in doc['escenarios'].items()}
+    return {str(doc.get('name', default_name)): doc}
+
+
+def _from_rows(rows: Sequence[Dict], default_name: str, errors: List[str]) -> Dict[str, Dict]:
+    """Filas (una por outcome) de la hoja de parámetros -> escenarios, en orden de aparición"""
+    scenarios: Dict[str, Dict] = {}
+    for line, row in enumerate(rows, start=2):
+        row = {str(k).strip(): v for k, v in row.items() if k is not None}
+        where = f"{default_name}:{line}"
+        name = row.get('actividad') or row.get('name')
+        if not name:
+            errors.append(f"{where}: falta la columna 'actividad'")
+            continue
+        scenario_name = str(row.get('escenario') or default_name)
+        scenario = scenarios.setdefault(scenario_name, {'activities': [], '_by_name': {}})
+        try:
+            if row.get('discount_rate') not in (None, ''):
+                scenario['discount_rate'] = _number(row['discount_rate'])
+            outcome = {'label': str(row.get('label', '')), 'prob': _number(row['prob']), 'npv': _number(row['npv'])}
+            definition = {'name': str(name),
+                          'decision_key': str(row.get('decision_key') or slugify(str(name))),
+                          'horizon_years': _number(row['horizon_years'])}  # entero: lo revisa la validación
+        except (KeyError, TypeError, ValueError) as exc:
+            errors.append(f"{where}: valor faltante o inválido ({exc})")
+            continue
+        if row.get('cost') not in (None, ''):
+            definition['cost'] = _number(row['cost'])
+        resources = {k[len(RESOURCE_PREFIX):]: _number(v) for k, v in row.items()
+                     if k.startswith(RESOURCE_PREFIX) and v not in (None, '')}
+        if resources:
+            definition['resources'] = resources
+        if row.get('concesionado') not in (None, ''):
+            definition['concesionado'] = str(row['concesionado']).strip().lower() in ('1', 'true', 'si', 'sí')
+
+        activity = scenario['_by_name'].get(definition['name'])
+        if activity is None:
+            activity = dict(definition, outcomes=[])
+            scenario['_by_name'][definition['name']] = activity
+            scenario['activities'].append(activity)
+        elif any(activity.get(k) != v for k, v in definition.items()):
+            errors.append(f"{where}: '{name}' tiene valores distintos a los de sus filas anteriores")
+        activity['outcomes'].append(outcome)
+    for scenario in scenarios.values():
+        del scenario['_by_name']
+    return scenarios
+
+
+def _read_csv(path: str, errors: List[str]) -> Dict[str, Dict]:
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return _from_rows(list(csv.DictReader(f)), os.path.splitext(os.path.basename(path))[0], errors)
+
+
+def _read_excel(path: str, errors: List[str]) -> Dict[str, Dict]:
+    import pandas as pd
+
+    sheets = pd.read_excel(path, sheet_name=None)
+    if EXCEL_ALL_SHEET in sheets:
+        sheets = {EXCEL_ALL_SHEET: sheets[EXCEL_ALL_SHEET]}
+    scenarios = {}
+    for sheet, df in sheets.items():
+        records = df.astype(object).where(df.notna(), None).to_dict('records')
+        scenarios.update(_from_rows(records, sheet, errors))
+    return scenarios
+
+
+def _read_yaml(path: str):
+    try:
+        import yaml
+    except ImportError as exc:
+        raise ImportError("Los escenarios YAML requieren 'PyYAML' (pip install pyyaml)") from exc
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            return yaml.safe_load(f)
+        except yaml.YAMLError as exc:
+            raise ValueError(f"YAML inválido: {exc}") from exc
+
+
+def _read(path: str, errors: List[str]) -> Dict[str, Dict]:
+    fmt = SCENARIO_FORMATS.get(os.path.splitext(path)[1].lower())
+    name = os.path.splitext(os.path.basename(path))[0]
+    if fmt == 'json':
+        with open(path, 'r', encoding='utf-8') as f:
+            return _from_document(json.load(f), name)
+    if fmt == 'yaml':
+        return _from_document(_read_yaml(path), name)
+    if fmt == 'csv':
+        return _read_csv(path, errors)
+    if fmt == 'excel':
+        return _read_excel(path, errors)
+    raise ValueError(f"Formato de escenario desconocido: {path!r} (opciones: {', '.join(SCENARIO_FORMATS)})")
+
+
+# ---------------------------------------------------------------------------
+# Validación en lote y compilación
+# ---------------------------------------------------------------------------
+
+def validate_scenarios(scenarios: Sequence[Scenario]) -> List[str]:
+    """
+    Revisa todos los escenarios de una vez y retorna la lista de errores
+
+    La estructura se revisa actividad por actividad; las sumas de
+    probabilidades y los horizontes se revisan con arreglos sobre todas las
+    actividades de todos los escenarios juntas.
+    """
+    errors: List[str] = []
+    where: List[str] = []
+    sums_probs: List[float] = []
+    starts: List[int] = []
+    horizons: List[float] = []
+    for scenario in scenarios:
+        prefix = f"{scenario.source or ''}[{scenario.name}]"
+        if not isinstance(scenario.activities, list) or not scenario.activities:
+            errors.append(f"{prefix}: sin actividades")
+            continue
+        if not isinstance(scenario.discount_rate, (int, float)) or scenario.discount_rate <= -1:
+            errors.append(f"{prefix}: discount_rate inválida ({scenario.discount_rate!r})")
+        keys = []
+        for i, a in enumerate(scenario.activities):
+            label = f"{prefix} actividad {i + 1} ({a.get('name', '?') if isinstance(a, dict) else '?'})"
+            missing = [k for k in ('name', 'decision_key', 'horizon_years', 'outcomes')
+                       if not isinstance(a, dict) or k not in a]
+            if missing:
+                errors.append(f"{label}: faltan {', '.join(missing)}")
+                continue
+            outcomes = a['outcomes']
+            if not isinstance(outcomes, list) or not outcomes:
+                errors.append(f"{label}: sin outcomes")
+                continue
+            try:
+                values = [(float(o['prob']), float(o['npv'])) for o in outcomes]
+                horizon = float(a['horizon_years'])
+            except (KeyError, TypeError, ValueError):
+                errors.append(f"{label}: outcomes con prob/npv faltante o no numérico")
+                continue
+            keys.append(a['decision_key'])
+            where.append(label)
+            starts.append(len(sums_probs))
+            sums_probs.extend(p for p, _ in values)
+            horizons.append(horizon)
+        duplicated = sorted({k for k in keys if keys.count(k) > 1})
+        if duplicated:
+            errors.append(f"{prefix}: decision_key repetidas: {duplicated}")
+        # decision_order puede tener decisiones sin actividad (p. ej. concesionar_todo), pero no omitir ninguna
+        order = scenario.decision_order
+        missing = [k for k in keys if k not in order]
+        if missing:
+            errors.append(f"{prefix}: decision_order no incluye {missing}")
+        if len(set(order)) != len(order):
+            errors.append(f"{prefix}: decision_order tiene decisiones repetidas")
+
+    if where:
+        probs = np.array(sums_probs, dtype=np.float64)
+        totals = np.add.reduceat(probs, np.array(starts, dtype=np.int64))
+        negative = np.minimum.reduceat(probs, np.array(starts, dtype=np.int64)) < 0
+        for i in np.nonzero(np.abs(totals - 1.0) >= PROB_TOLERANCE)[0]:
+            errors.append(f"{where[i]}: las probabilidades suman {totals[i]:.4f} (deben sumar 1)")
+        for i in np.nonzero(negative)[0]:
+            errors.append(f"{where[i]}: probabilidades negativas")
+        horizon_array = np.array(horizons)
+        for i in np.nonzero(horizon_array <= 0)[0]:
+            errors.append(f"{where[i]}: horizon_years debe ser > 0 (es {horizons[i]:g})")
+        for i in np.nonzero(horizon_array != np.floor(horizon_array))[0]:
+            errors.append(f"{where[i]}: horizon_years debe ser un número entero de años (es {horizons[i]:g})")
+    return errors
+
+
+def compile_activity(definition: Dict) -> Activity:
+    """Una definición de actividad (dict de los módulos de parámetros) como `Activity`"""
+    return Activity(definition['name'], definition['decision_key'], definition['horizon_years'],
+                    [ActivityOutcome(o['label'], o['prob'], o['npv']) for o in definition['outcomes']],
+                    definition.get('cost', 0.0), dict(definition.get('resources', {})))
+
+
+def compile_activities(parametros) -> List[Activity]:
+    """
+    Actividades internas (`Activity`) de un escenario o módulo de parámetros
+    Los escenarios cargados ya traen su compilación; los módulos se compilan aquí.
+    """
+    compiled = getattr(parametros, 'compiled', None)
+    if compiled:
+        return compiled
+    return [compile_activity(a) for a in parametros.activities]
+
+
+def _normalized(scenario: Scenario) -> Scenario:
+    """Tipos canónicos (float / int) en las definiciones y compilación a Activity"""
+    for a in scenario.activities:
+        a['horizon_years'] = int(a['horizon_years'])
+        for o in a['outcomes']:
+            o['label'] = str(o.get('label', ''))
+            o['prob'] = float(o['prob'])
+            o['npv'] = float(o['npv'])
+    scenario.discount_rate = float(scenario.discount_rate)
+    scenario.compiled = compile_activities(scenario)
+    return scenario
+
+
+# ---------------------------------------------------------------------------
+# Carga con caché binaria
+# ---------------------------------------------------------------------------
+
+def _cache_path(path: str) -> str:
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIRNAME, CACHE_SUBDIR, f'{name}.pickle')
+
+
+def _digest(path: str, discount_rate) -> str:
+    digest = hashlib.sha256(code_version().encode('utf-8'))
+    digest.update(repr(discount_rate).encode('utf-8'))
+    with open(path, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _load_cached(path: str, digest: str):
+    try:
+        with open(_cache_path(path), 'rb') as f:
+            stored = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    return stored['scenarios'] if stored.get('digest') == digest else None
+
+
+def _store_cached(path: str, digest: str, scenarios: List[Scenario]):
+    target = _cache_path(path)
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Escritura atómica: varios procesos pueden cargar el mismo archivo a la vez
+        tmp = f'{target}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump({'digest': digest, 'scenarios': scenarios}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, target)
+    except OSError:
+        pass  # Sin permisos de escritura: se carga igual, sin caché
+
+
+def _parse(path: str, discount_rate: float, errors: List[str]) -> List[Scenario]:
+    scenarios = []
+    for name, body in _read(path, errors).items():
+        options = {k: body.get(k) for k in OPTIONAL_FIELDS}
+        rate = body.get('discount_rate', discount_rate if discount_rate is not None else DEFAULT_DISCOUNT_RATE)
+        scenarios.append(Scenario(name, body.get('activities'), rate, body.get('decision_order'),
+                                  source=path, **options))
+    return scenarios
+
+
+def load_scenarios(paths, discount_rate: float = None, use_cache: bool = True) -> List[Scenario]:
+    """
+    Carga, valida y compila los escenarios de uno o varios archivos
+
+    discount_rate: tasa para los escenarios que no la definen (por defecto
+    DEFAULT_DISCOUNT_RATE). Los errores de todos los archivos se juntan y
+    se informan en un único ScenarioError.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    loaded, errors, pending = [], [], []
+    with span('cargar_escenarios', archivos=len(paths)):
+        for path in paths:
+            digest = _digest(path, discount_rate)
+            scenarios = _load_cached(path, digest) if use_cache else None
+            if scenarios is not None:
+                count('escenarios_desde_cache', len(scenarios))
+                for scenario in scenarios:
+                    scenario.source = path  # La caché pudo escribirse con otra ruta al mismo archivo
+            else:
+                try:
+                    scenarios = _parse(path, discount_rate, errors)
+                except ScenarioError as exc:
+                    errors.extend(exc.errors)
+                    continue
+                except (OSError, ValueError) as exc:
+                    # Archivo ilegible o mal formado: se informa junto con los demás errores
+                    errors.append(f"{path}: {exc}")
+                    continue
+                pending.append((path, digest, scenarios))
+            loaded.extend(scenarios)
+        errors.extend(validate_scenarios([s for _, _, group in pending for s in group]))
+        if errors:
+            raise ScenarioError(errors)
+        for path, digest, scenarios in pending:
+            for scenario in scenarios:
+                _normalized(scenario)
+            if use_cache:
+                _store_cached(path, digest, scenarios)
+    return loaded
+
+
+def load_scenario(path: str, name: str = None, discount_rate: float = None, use_cache: bool = True) -> Scenario:
+    """Un escenario de un archivo (el único que contiene, o el de nombre `name`)"""
+    scenarios = load_scenarios(path, discount_rate, use_cache)
+    if name is None:
+        if len(scenarios) != 1:
+            raise ValueError(f"{path} contiene {len(scenarios)} escenarios: indica cuál con name "
+                             f"({', '.join(s.name for s in scenarios)})")
+        return scenarios[0]
+    for scenario in scenarios:
+        if scenario.name == name:
+            return scenario
+    raise ValueError(f"Escenario {name!r} no encontrado en {path}")
+
+
+def save_scenario(parametros, path: str):
+    """Escribe un módulo de parámetros (o escenario) como JSON o YAML, según la extensión"""
+    doc = {'discount_rate': getattr(parametros, 'discount_rate', DEFAULT_DISCOUNT_RATE),
+           'activities': parametros.activities,
+           'decision_order': list(parametros.decision_order)}
+    for field_name in OPTIONAL_FIELDS:
+        if getattr(parametros, field_name, None) is not None:
+            doc[field_name] = getattr(parametros, field_name)
+    fmt = SCENARIO_FORMATS.get(os.path.splitext(path)[1].lower())
+    with open(path, 'w', encoding='utf-8') as f:
+        if fmt == 'yaml':
+            import yaml
+            yaml.safe_dump(doc, f, allow_unicode=True, sort_keys=False)
+        elif fmt == 'json':
+            json.dump(doc, f, ensure_ascii=False, indent=2)
+        else:
+            raise ValueError(f"Solo se exporta a JSON o YAML: {path!r}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Valida escenarios (JSON, YAML, CSV, Excel) en lote')
+    parser.add_argument('archivos', nargs='*', help='archivos de escenarios')
+    parser.add_argument('--tasa', type=float, help='tasa de descuento si el archivo no la define')
+    parser.add_argument('--sin-cache', action='store_true', help='no usa ni escribe la forma binaria')
+    parser.add_argument('--exportar', nargs=2, metavar=('MODULO', 'ARCHIVO'),
+                        help='escribe un módulo de parámetros como JSON/YAML')
+    args = parser.parse_args()
+
+    if args.exportar:
+        save_scenario(importlib.import_module(args.exportar[0]), args.exportar[1])
+        print(f"💾 Escenario exportado a: {args.exportar[1]}")
+    else:
+        try:
+            scenarios = load_scenarios(args.archivos, args.tasa, use_cache=not args.sin_cache)
+        except ScenarioError as exc:
+            print(f"❌ {exc}")
+            raise SystemExit(1)
+        for scenario in scenarios:
+            print(f"✅ {scenario.source} [{scenario.name}]: {len(scenario.activities)} actividades, "
+                  f"tasa {scenario.discount_rate * 100:.1f}%")
+        print(f"🎉 {len(scenarios)} escenarios válidos")
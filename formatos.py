@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Capa de formatos de salida para las tablas del análisis.
+
+Las tablas se escriben como CSV (por defecto) o en formatos columnares
+comprimidos (Parquet, Arrow/Feather), donde las columnas de decisión 0/1 se
+guardan como booleanos. `read_table` lee cualquiera de ellos permitiendo
+seleccionar columnas y rangos de filas sin cargar el archivo completo.
+
+Parquet y Feather requieren `pyarrow` (dependencia opcional). pandas se
+importa solo al leer: escribir recibe DataFrames ya construidos.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, Sequence
+import os
+
+from instrumentacion import count, span
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'feather')
+FORMAT_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
+# Tamaño de grupo de filas en Parquet: permite leer rangos sin recorrer todo el archivo
+PARQUET_ROW_GROUP_SIZE = 1 << 16
+COMPRESSION = 'zstd'
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as exc:
+        raise ImportError("Los formatos parquet/feather requieren 'pyarrow' (pip install pyarrow)") from exc
+
+
+def _check_format(fmt: str):
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Formato de salida desconocido: {fmt!r} (opciones: {', '.join(OUTPUT_FORMATS)})")
+
+
+def output_path(path_base: str, fmt: str = 'csv') -> str:
+    """Ruta final de una salida: ruta base sin extensión + extensión del formato"""
+    _check_format(fmt)
+    return path_base + FORMAT_EXTENSIONS[fmt]
+
+
+def format_from_path(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    for fmt, fmt_ext in FORMAT_EXTENSIONS.items():
+        if ext == fmt_ext:
+            return fmt
+    raise ValueError(f"No se reconoce el formato del archivo: {path}")
+
+
+def _typed(df: pd.DataFrame, bool_columns: Sequence[str]) -> pd.DataFrame:
+    if not bool_columns:
+        return df
+    return df.astype({col: bool for col in bool_columns if col in df.columns})
+
+
+def write_table(df: pd.DataFrame, path_base: str, fmt: str = 'csv',
+                bool_columns: Sequence[str] = None) -> str:
+    """
+    Escribe un DataFrame en el formato pedido y retorna la ruta escrita
+
+    En formatos columnares las columnas de `bool_columns` se guardan como booleanos;
+    en CSV se mantienen como 0/1 para conservar el formato histórico.
+    """
+    path = output_path(path_base, fmt)
+    with span('exportar_tabla', archivo=path, filas=len(df)):
+        _write(df, path, fmt, bool_columns)
+    count('filas_escritas', len(df))
+    count('bytes_escritos', os.path.getsize(path))
+    return path
+
+
+def _write(df: pd.DataFrame, path: str, fmt: str, bool_columns: Sequence[str]):
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+        return
+
+    _require_pyarrow()
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(_typed(df, bool_columns), preserve_index=False)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, path, compression=COMPRESSION, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, path, compression=COMPRESSION)
+
+
+class TableStreamWriter:
+    """
+    Escritura incremental por bloques (mismo esquema en todos los bloques)
+    """
+
+    def __init__(self, path_base: str, fmt: str = 'csv', bool_columns: Sequence[str] = None):
+        self.path = output_path(path_base, fmt)
+        self.fmt = fmt
+        self.bool_columns = list(bool_columns or [])
+        self._writer = None
+        self._file = None
+        if fmt == 'csv':
+            self._file = open(self.path, 'w', encoding='utf-8', newline='')
+        else:
+            _require_pyarrow()
+
+    def write(self, df: pd.DataFrame):
+        count('filas_escritas', len(df))
+        if self.fmt == 'csv':
+            df.to_csv(self._file, index=False, header=self._file.tell() == 0)
+            return
+
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(_typed(df, self.bool_columns), preserve_index=False)
+        if self._writer is None:
+            if self.fmt == 'parquet':
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.path, table.schema, compression=COMPRESSION)
+            else:
+                options = pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+                self._writer = pa.ipc.new_file(self.path, table.schema, options=options)
+        if self.fmt == 'parquet':
+            self._writer.write_table(table, row_group_size=PARQUET_ROW_GROUP_SIZE)
+        else:
+            self._writer.write_table(table)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self._writer is not None:
+            self._writer.close()
+        count('bytes_escritos', os.path.getsize(self.path))
+
+
+def read_table(path: str, columns: List[str] = None, rows: slice = None) -> pd.DataFrame:
+    """
+    Lee una tabla escrita con `write_table` (CSV, Parquet o Feather)
+
+    columns: subconjunto de columnas a cargar
+    rows: rango de filas `slice(inicio, fin)`; en Parquet solo se leen los grupos
+          de filas que lo cubren y en Feather se usa memoria mapeada
+    """
+    fmt = format_from_path(path)
+    start = (rows.start or 0) if rows is not None else 0
+    stop = rows.stop if rows is not None else None
+
+    if fmt == 'csv':
+        import pandas as pd
+
+        nrows = None if stop is None else max(stop - start, 0)
+        skip = range(1, start + 1) if start else None
+        return pd.read_csv(path, usecols=columns, skiprows=skip, nrows=nrows)
+
+    _require_pyarrow()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(path)
+        if rows is None:
+            return pf.read(columns=columns).to_pandas()
+        stop = pf.metadata.num_rows if stop is None else min(stop, pf.metadata.num_rows)
+        groups, offset, first_row = [], 0, None
+        for i in range(pf.num_row_groups):
+            n = pf.metadata.row_group(i).num_rows
+            if offset + n > start and offset < stop:
+                groups.append(i)
+                if first_row is None:
+                    first_row = offset
+            offset += n
+        if not groups:
+            return pf.schema_arrow.empty_table().select(columns or pf.schema_arrow.names).to_pandas()
+        table = pf.read_row_groups(groups, columns=columns)
+        return table.slice(start - first_row, stop - start).to_pandas()
+
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    if rows is not None:
+        stop = table.num_rows if stop is None else min(stop, table.num_rows)
+        table = table.slice(start, max(stop - start, 0))
+    return table.to_pandas()
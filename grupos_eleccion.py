@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Grupos de elección mutuamente excluyentes.
+
+En el modelo combinado cada actividad se puede hacer con administración
+propia, concesionada o no hacerse: es una elección entre {ninguna, propio,
+concesión}, no dos decisiones binarias independientes. Modelarla como dos
+bits genera 4^k combinaciones, la mayoría infactibles (ambas modalidades a la
+vez); con grupos de elección solo existen las Π(1 + opciones) asignaciones
+factibles (3^k con k pares).
+
+`ChoiceModel` compila los grupos en una matriz de EV (grupos x opciones).
+Una asignación es un vector con la opción elegida en cada grupo (0 =
+ninguna, j = opción j). Las asignaciones se numeran en base mixta con el
+primer grupo como dígito más significativo, igual que las máscaras de
+`combinaciones`.
+
+- `evaluate_assignments`: enumeración completa por bloques.
+- `k_best_assignments`: las k mejores (o peores) sin enumerar. El EV es
+  aditivo por grupo, así que se recorren las desviaciones desde la mejor
+  asignación con una cola de prioridad (generaliza `k_best_deviations` a
+  más de dos opciones por grupo).
+
+Un módulo de parámetros con `choice_groups` (parametros.py) se evalúa desde
+la línea de comandos:
+
+    python grupos_eleccion.py parametros --top 10 --salida modelo_parametros
+"""
+from typing import Dict, Iterator, List, Sequence, Tuple
+import heapq
+
+import numpy as np
+
+from tabla_actividades import activity_table
+
+# Asignaciones evaluadas por bloque en la enumeración completa
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+# Etiqueta de la opción "no hacer la actividad"
+NONE_LABEL = 'Ninguna'
+
+
+class ChoiceModel:
+    """
+    Grupos de elección compilados: nombres, etiquetas y decision_key de cada
+    opción, y EV por (grupo, opción) con la columna 0 = ninguna (EV 0)
+    """
+
+    def __init__(self, groups: Sequence[str], options: Sequence[Sequence[Tuple[str, str, float]]]):
+        """options[g] = [(etiqueta, decision_key, EV), ...] de las opciones del grupo g"""
+        self.groups: List[str] = list(groups)
+        self.labels: List[List[str]] = [[label for label, _, _ in opts] for opts in options]
+        self.keys: List[List[str]] = [[key for _, key, _ in opts] for opts in options]
+        self.n_options = np.array([len(opts) for opts in options], dtype=np.int64)
+        if len(self.groups) != len(options) or (self.n_options == 0).any():
+            raise ValueError("Cada grupo de elección necesita al menos una opción")
+        seen = [key for keys in self.keys for key in keys]
+        if len(seen) != len(set(seen)):
+            raise ValueError("Una decisión no puede pertenecer a dos grupos de elección")
+        width = int(self.n_options.max()) + 1 if len(self.groups) else 1
+        self.values = np.zeros((len(self.groups), width), dtype=np.float64)
+        for g, opts in enumerate(options):
+            self.values[g, 1:len(opts) + 1] = [ev for _, _, ev in opts]
+        self.radix = self.n_options + 1
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    @property
+    def count(self) -> int:
+        """Asignaciones factibles (entero de Python: no se desborda)"""
+        total = 1
+        for r in self.radix.tolist():
+            total *= r
+        return total
+
+    @property
+    def binary_count(self) -> int:
+        """Combinaciones del modelo equivalente con una decisión binaria por opción"""
+        return 2 ** int(self.n_options.sum())
+
+    def evaluate(self, choices: np.ndarray) -> np.ndarray:
+        """EV total por asignación, sumando grupo por grupo en orden"""
+        total = np.zeros(choices.shape[0], dtype=np.float64)
+        for g in range(len(self)):
+            total += self.values[g, choices[:, g]]
+        return total
+
+    def codes(self, choices: np.ndarray) -> List[int]:
+        """Número de cada asignación en la enumeración (base mixta)"""
+        codes = []
+        for row in choices.tolist():
+            code = 0
+            for digit, base in zip(row, self.radix.tolist()):
+                code = code * base + digit
+            codes.append(code)
+        return codes
+
+    def bits(self, choices: np.ndarray, decision_order: Sequence[str]) -> np.ndarray:
+        """Asignaciones como bits alineados por clave con decision_order (modelo binario)"""
+        position = {key: j for j, key in enumerate(decision_order)}
+        bits = np.zeros((choices.shape[0], len(decision_order)), dtype=np.int8)
+        for g, keys in enumerate(self.keys):
+            for option, key in enumerate(keys, start=1):
+                if key in position:
+                    bits[:, position[key]] = choices[:, g] == option
+        return bits
+
+
+def choice_model(activities, discount_rate: float = 0.12, groups: Dict[str, Sequence[str]] = None,
+                 labels: Dict[str, str] = None) -> ChoiceModel:
+    """
+    Modelo de elección de una lista de actividades
+
+    groups: nombre del grupo -> decision_keys de sus opciones; las actividades
+    que no están en ningún grupo forman un grupo propio (hacer / no hacer).
+    labels: etiqueta de cada opción por decision_key (por defecto el nombre).
+    """
+    table = activity_table(activities, discount_rate)
+    ev = dict(zip(table.decision_keys, table.ev.tolist()))
+    names = dict(zip(table.decision_keys, table.names))
+    labels = labels or {}
+    groups = dict(groups or {})
+    unknown = [key for keys in groups.values() for key in keys if key not in ev]
+    if unknown:
+        raise ValueError(f"Decisiones desconocidas en los grupos de elección: {unknown}")
+
+    grouped = {key for keys in groups.values() for key in keys}
+    group_of = {keys[0]: name for name, keys in groups.items() if keys}
+    ordered, options = [], []
+    # Grupos en el orden de su primera actividad (así el orden sigue al de los parámetros)
+    for key in table.decision_keys:
+        if key in group_of:
+            name = group_of[key]
+            keys = groups[name]
+        elif key in grouped:
+            continue
+        else:
+            name, keys = names[key], [key]
+        ordered.append(name)
+        options.append([(labels.get(k, names[k]), k, ev[k]) for k in keys])
+    return ChoiceModel(ordered, options)
+
+
+def model_from_parameters(parametros, activities, discount_rate: float = 0.12) -> ChoiceModel:
+    """
+    Modelo de elección de un módulo de parámetros: usa `choice_groups` si está
+    definido; la etiqueta de cada opción sale del campo `concesionado`
+    """
+    labels = {a['decision_key']: ('Concesión' if a['concesionado'] else 'Propio')
+              for a in parametros.activities if 'concesionado' in a}
+    return choice_model(activities, discount_rate, getattr(parametros, 'choice_groups', None), labels)
+
+
+def evaluate_parameters(parametros, discount_rate: float = None):
+    """
+    Enumera todas las asignaciones factibles de un módulo de parámetros
+    (`model_from_parameters` + `evaluate_assignments`)
+    Retorna (modelo, DataFrame de asignaciones ordenado por EV descendente).
+    """
+    from escenarios import compile_activities
+
+    if discount_rate is None:
+        discount_rate = getattr(parametros, 'discount_rate', 0.12)
+    model = model_from_parameters(parametros, compile_activities(parametros), discount_rate)
+    choices, ev_total = evaluate_assignments(model)
+    order = np.argsort(-ev_total, kind='stable')
+    return model, assignments_frame(model, choices[order], ev_total[order])
+
+
+def combined_model(tables: Dict[str, object], discount_rate: float = 0.12,
+                   labels: Dict[str, str] = None) -> ChoiceModel:
+    """
+    Modelo combinado de varios escenarios con las mismas decision_key
+
+    tables: modalidad -> actividades (o ActivityTable) de ese escenario. Cada
+    decision_key es un grupo cuyas opciones son las modalidades en que
+    aparece; la opción se identifica como `<decision_key>_<modalidad>` (igual
+    que en parametros.py) y se muestra con labels[modalidad].
+    """
+    labels = labels or {}
+    compiled = {mode: activity_table(acts, discount_rate) for mode, acts in tables.items()}
+    ordered, names = [], {}
+    for table in compiled.values():
+        for key, name in zip(table.decision_keys, table.names):
+            if key not in names:
+                ordered.append(key)
+                names[key] = name
+    options = [[(labels.get(mode, mode), f'{key}_{mode}', table.ev_of(key))
+                for mode, table in compiled.items() if key in table.decision_keys]
+               for key in ordered]
+    return ChoiceModel([names[key] for key in ordered], options)
+
+
+def iter_assignment_blocks(model: ChoiceModel, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[np.ndarray]:
+    """Asignaciones 0 .. count-1 en bloques (filas = asignaciones, columnas = grupos)"""
+    total = model.count
+    # Peso de cada dígito: producto de las bases de los grupos siguientes
+    weights = np.ones(len(model), dtype=np.int64)
+    for g in range(len(model) - 2, -1, -1):
+        weights[g] = weights[g + 1] * model.radix[g + 1]
+    for start in range(0, total, block_size):
+        codes = np.arange(start, min(start + block_size, total), dtype=np.int64)
+        yield ((codes[:, None] // weights) % model.radix).astype(np.int8)
+
+
+def evaluate_assignments(model: ChoiceModel, block_size: int = DEFAULT_BLOCK_SIZE,
+                         progress=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Enumera y evalúa todas las asignaciones factibles
+    Retorna (choices, ev_total) en orden de enumeración
+    """
+    total = model.count
+    choices = np.empty((total, len(model)), dtype=np.int8)
+    ev_total = np.empty(total, dtype=np.float64)
+    start = 0
+    for block in iter_assignment_blocks(model, block_size):
+        stop = start + len(block)
+        choices[start:stop] = block
+        ev_total[start:stop] = model.evaluate(block)
+        start = stop
+        if progress is not None:
+            progress(stop, total)
+    return choices, ev_total
+
+
+def k_best_assignments(model: ChoiceModel, k: int, worst: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Las k mejores (o peores) asignaciones sin enumerar, de mayor a menor EV
+
+    En cada grupo las opciones se ordenan de mejor a peor y desviarse a la
+    opción de rango r cuesta (mejor - valor_r). Los grupos se ordenan por el
+    costo de su primera desviación; cada estado (rango por grupo, último
+    grupo modificado i) genera a lo más tres sucesores: bajar un rango en i,
+    desviar el grupo i+1, o mover la primera desviación de i a i+1. Así cada
+    asignación se genera una sola vez y en orden creciente de costo.
+    """
+    n_groups = len(model)
+    k = min(k, model.count)
+    if k <= 0:
+        return np.empty((0, n_groups), dtype=np.int8), np.empty(0)
+
+    sign = -1.0 if worst else 1.0
+    ranked = []  # por grupo: opciones (0 = ninguna) de mejor a peor
+    for g in range(n_groups):
+        width = int(model.radix[g])
+        values = sign * model.values[g, :width]
+        ranked.append(np.argsort(-values, kind='stable').tolist())
+    deltas = [[float(sign * (model.values[g, r[0]] - model.values[g, opt])) for opt in r]
+              for g, r in enumerate(ranked)]
+    order = sorted(range(n_groups), key=lambda g: deltas[g][1])
+    deltas = [deltas[g] for g in order]
+
+    # Cada entrada: (costo, contador, último grupo, rangos como tupla)
+    found = [tuple([0] * n_groups)]
+    heap, counter = [], 0
+    if n_groups:
+        heap.append((deltas[0][1], counter, 0, (1,) + (0,) * (n_groups - 1)))
+    while heap and len(found) < k:
+        cost, _, i, ranks = heapq.heappop(heap)
+        found.append(ranks)
+        r = ranks[i]
+        successors = []
+        if r + 1 < len(deltas[i]):
+            successors.append((cost + deltas[i][r + 1] - deltas[i][r], i, ranks[:i] + (r + 1,) + ranks[i + 1:]))
+        if i + 1 < n_groups:
+            successors.append((cost + deltas[i + 1][1], i + 1, ranks[:i + 1] + (1,) + ranks[i + 2:]))
+            if r == 1:
+                successors.append((cost - deltas[i][1] + deltas[i + 1][1], i + 1,
+                                   ranks[:i] + (0, 1) + ranks[i + 2:]))
+        for item in successors:
+            counter += 1
+            heapq.heappush(heap, (item[0], counter, item[1], item[2]))
+
+    choices = np.zeros((len(found), n_groups), dtype=np.int8)
+    for row, ranks in enumerate(found):
+        for pos, g in enumerate(order):
+            choices[row, g] = ranked[g][ranks[pos]]
+    ev_total = model.evaluate(choices)
+    codes = model.codes(choices)
+    rows = sorted(range(len(found)), key=lambda i: (-ev_total[i], codes[i]))
+    return choices[rows], ev_total[rows]
+
+
+def assignments_frame(model: ChoiceModel, choices: np.ndarray, ev_total: np.ndarray):
+    """DataFrame del modelo combinado: la opción elegida en cada grupo + EV_total"""
+    import pandas as pd
+
+    columns = {}
+    for g, name in enumerate(model.groups):
+        labels = np.array([NONE_LABEL] + model.labels[g], dtype=object)
+        columns[name] = labels[choices[:, g]]
+    columns['EV_total'] = ev_total
+    return pd.DataFrame(columns)
+
+
+if __name__ == '__main__':
+    import argparse
+    import importlib
+
+    from formatos import FORMAT_EXTENSIONS, write_table
+
+    parser = argparse.ArgumentParser(description='Evalúa los grupos de elección de un módulo de parámetros')
+    parser.add_argument('modulo', nargs='?', default='parametros', help='módulo de parámetros (con choice_groups)')
+    parser.add_argument('--tasa', type=float, help='tasa de descuento (por defecto, la del módulo)')
+    parser.add_argument('--top', type=int, default=10, help='asignaciones a mostrar')
+    parser.add_argument('--salida', metavar='ARCHIVO', help='escribe todas las asignaciones (ruta sin extensión)')
+    parser.add_argument('--formato', choices=list(FORMAT_EXTENSIONS), default='csv', help='formato de la tabla')
+    args = parser.parse_args()
+
+    parametros = importlib.import_module(args.modulo)
+    model, df = evaluate_parameters(parametros, args.tasa)
+    print(f"🧮 {args.modulo}: {len(model)} grupos de elección, {model.count:,} asignaciones factibles "
+          f"(en vez de {2 ** len(parametros.decision_order):,} combinaciones de decision_order)")
+    print(df.head(args.top).to_string(index=False))
+    if args.salida:
+        write_table(df, args.salida, args.formato)
+        print(f"💾 Asignaciones guardadas en: {args.salida}{FORMAT_EXTENSIONS[args.formato]}")
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Informe de decisiones: un único modelo con varios formatos de salida.
+
+`build_report` calcula una sola vez, desde las tablas de actividades, todo
+lo que usan la decisión principal, las decisiones individuales y el resumen
+ejecutivo (VPN total por modalidad, HACER / NO HACER por actividad, listas
+ordenadas y mejor estrategia). Los renderizadores solo formatean ese
+`ExecutiveReport`:
+
+- consola (`render_console`, con emoji; más `render_main_decision` y
+  `render_individual_decisions` para las secciones del análisis),
+- texto (`.txt`, el resumen ejecutivo de siempre),
+- Markdown (`.md`), JSON (`.json`) y HTML autocontenido (`.html`).
+
+Cada renderizador arma el texto completo en memoria y `write_report` lo
+escribe con una sola escritura por archivo. Para agregar un formato basta
+registrar la función en `RENDERERS`.
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Sequence
+import html
+import json
+import os
+
+from instrumentacion import count, span
+from tabla_actividades import activity_table
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+RULE = '=' * 80
+SUBRULE = '-' * 50
+REPORT_FORMATS = ('txt', 'md', 'json', 'html')
+
+
+@dataclass
+class ActivityDecision:
+    name: str
+    npv: float              # VPN si se hace la actividad (si no se hace, 0)
+    horizon_years: int
+
+    @property
+    def recommendation(self) -> str:
+        return 'HACER' if self.npv > 0 else 'NO HACER'
+
+
+@dataclass
+class ModeReport:
+    """Decisiones de una modalidad (concesión o administración propia)"""
+    label: str
+    decisions: List[ActivityDecision]      # en el orden de la tabla
+    total: float
+    hacer: List[ActivityDecision]          # rentables, por VPN descendente
+    no_hacer: List[ActivityDecision]       # no rentables, por VPN descendente (menor pérdida primero)
+
+    def individual_frame(self) -> pd.DataFrame:
+        """Tabla de decisiones individuales (Hacer vs No hacer cada actividad)"""
+        import pandas as pd
+        return pd.DataFrame([{
+            'Actividad': d.name,
+            'NPV_Hacer': d.npv,
+            'NPV_No_Hacer': 0.0,
+            'Valor_Decision': d.npv - 0.0,
+            'Horizonte_Años': d.horizon_years,
+            'Recomendacion': d.recommendation,
+        } for d in self.decisions])
+
+
+@dataclass
+class ExecutiveReport:
+    concesion: ModeReport
+    propio: ModeReport
+    discount_rate: float
+
+    @property
+    def difference(self) -> float:
+        """Ventaja de administración propia sobre concesionar todo"""
+        return self.propio.total - self.concesion.total
+
+    @property
+    def propio_wins(self) -> bool:
+        return self.difference > 0
+
+    @property
+    def recommendation(self) -> str:
+        return 'ADMINISTRACIÓN PROPIA' if self.propio_wins else 'CONCESIONAR TODO'
+
+    @property
+    def best_strategy(self) -> str:
+        return 'ADMINISTRACIÓN PROPIA' if self.propio_wins else 'CONCESIÓN'
+
+    @property
+    def advantage(self) -> float:
+        return abs(self.difference)
+
+    @property
+    def best_value(self) -> float:
+        return max(self.concesion.total, self.propio.total)
+
+    def ranked_modes(self) -> List[ModeReport]:
+        """Modalidades con la recomendada primero"""
+        return [self.propio, self.concesion] if self.propio_wins else [self.concesion, self.propio]
+
+    def main_decision_frame(self) -> pd.DataFrame:
+        """Tabla de la decisión principal: concesionar todo vs administración propia"""
+        import pandas as pd
+        return pd.DataFrame([{
+            'Decision': 'Concesionar Todo',
+            'NPV_Total': self.concesion.total,
+            'Num_Actividades': len(self.concesion.decisions),
+            'Tipo': 'Concesión'
+        }, {
+            'Decision': 'Administración Propia',
+            'NPV_Total': self.propio.total,
+            'Num_Actividades': len(self.propio.decisions),
+            'Tipo': 'Propia'
+        }])
+
+    def to_dict(self) -> Dict:
+        def mode(m: ModeReport) -> Dict:
+            return {'label': m.label, 'total': m.total,
+                    'decisions': [dict(asdict(d), recommendation=d.recommendation) for d in m.decisions],
+                    'hacer': [d.name for d in m.hacer], 'no_hacer': [d.name for d in m.no_hacer]}
+        return {'discount_rate': self.discount_rate, 'recommendation': self.recommendation,
+                'best_strategy': self.best_strategy, 'difference': self.difference,
+                'advantage': self.advantage, 'best_value': self.best_value,
+                'concesion': mode(self.concesion), 'propio': mode(self.propio)}
+
+
+def _mode_report(label: str, table) -> ModeReport:
+    evs = table.ev.tolist()
+    decisions = [ActivityDecision(a.name, ev, a.horizon_years) for a, ev in zip(table.activities, evs)]
+    ranked = sorted(decisions, key=lambda d: d.npv, reverse=True)  # estable: igual que ordenar cada lista
+    return ModeReport(label, decisions, sum(evs),
+                      hacer=[d for d in ranked if d.npv > 0], no_hacer=[d for d in ranked if not d.npv > 0])
+
+
+def build_report(activities_concesion, activities_propio, discount_rate: float = 0.12) -> ExecutiveReport:
+    """Calcula el informe una sola vez (acepta listas de actividades o ActivityTable ya construidas)"""
+    with span('construir_informe'):
+        return ExecutiveReport(
+            concesion=_mode_report('Concesión', activity_table(activities_concesion, discount_rate)),
+            propio=_mode_report('Administración Propia', activity_table(activities_propio, discount_rate)),
+            discount_rate=discount_rate,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Consola y texto
+# ---------------------------------------------------------------------------
+
+def _ranked_lines(decisions: Sequence[ActivityDecision], indent: str) -> List[str]:
+    return [f"{indent}{i:2d}. {d.name:<30} → ${d.npv:>8,.0f}" for i, d in enumerate(decisions, 1)]
+
+
+def render_main_decision(report: ExecutiveReport) -> str:
+    """Sección de consola del análisis de decisión principal"""
+    c, p = report.concesion, report.propio
+    return '\n'.join([
+        "\n🎯 ANÁLISIS DE DECISIÓN PRINCIPAL:",
+        "=" * 60,
+        "💰 CONCESIONAR TODO:",
+        f"   VPN Total: ${c.total:,.0f}",
+        f"   Actividades: {len(c.decisions)}",
+        "\n💰 ADMINISTRACIÓN PROPIA:",
+        f"   VPN Total: ${p.total:,.0f}",
+        f"   Actividades: {len(p.decisions)}",
+        "\n⚖️ DIFERENCIA:",
+        f"   Ventaja Administración Propia: ${report.difference:,.0f}",
+        f"   Mejor opción: {'Administración Propia' if report.propio_wins else 'Concesión'}",
+    ])
+
+
+def render_individual_decisions(mode: ModeReport) -> str:
+    """Sección de consola del análisis de decisiones individuales de una modalidad"""
+    lines = ["\n🔍 ANÁLISIS DE DECISIONES INDIVIDUALES:", "=" * 60]
+    for d in mode.decisions:
+        lines += [f"📊 {d.name}:",
+                  f"   VPN si HAGO: ${d.npv:,.0f}",
+                  f"   VPN si NO HAGO: ${0.0:,.0f}",
+                  f"   Valor de la decisión: ${d.npv - 0.0:,.0f}",
+                  f"   Recomendación: {d.recommendation}",
+                  ""]
+    return '\n'.join(lines)
+
+
+def _summary_lines(report: ExecutiveReport, console: bool) -> List[str]:
+    """Resumen ejecutivo en líneas; console=True agrega emoji e indentación"""
+    e = (lambda icon: icon + ' ') if console else (lambda icon: '')
+    pad = '   ' if console else ''
+    names = {id(report.propio): 'ADMINISTRACIÓN PROPIA', id(report.concesion): 'CONCESIÓN'}
+    lines = ["RESUMEN EJECUTIVO - RECOMENDACIONES DE DECISIONES" if not console else
+             "\n" + RULE + "\n📋 RESUMEN EJECUTIVO - RECOMENDACIONES DE DECISIONES", RULE]
+    lines += [("\n🎯 " if console else "\n") + "DECISIÓN PRINCIPAL:", SUBRULE,
+              f"{e('✅')}RECOMENDACIÓN: {report.recommendation}",
+              f"{pad}{e('💰')}Ventaja: ${report.advantage:,.0f}"]
+    for mode in report.ranked_modes():
+        lines.append(f"{pad}{e('📊')}VPN {mode.label}: ${mode.total:,.0f}")
+    for mode in (report.propio, report.concesion):
+        lines += [f"\n{e('🔍')}DECISIONES INDIVIDUALES - {names[id(mode)]}:", SUBRULE,
+                  f"{e('✅')}HACER (Ordenadas por rentabilidad):"]
+        lines += _ranked_lines(mode.hacer, pad)
+        lines.append(f"\n{e('❌')}NO HACER (Ordenadas por pérdida):")
+        lines += _ranked_lines(mode.no_hacer, pad)
+    p, c = report.propio, report.concesion
+    lines += [f"\n{e('📊')}RESUMEN FINAL:", SUBRULE,
+              f"{e('🎯')}Mejor estrategia: {report.best_strategy}",
+              f"{e('💰')}Valor total esperado: ${report.best_value:,.0f}",
+              f"{e('📈')}Actividades rentables (Administración Propia): {len(p.hacer)}",
+              f"{e('📉')}Actividades no rentables (Administración Propia): {len(p.no_hacer)}",
+              f"{e('📈')}Actividades rentables (Concesión): {len(c.hacer)}",
+              f"{e('📉')}Actividades no rentables (Concesión): {len(c.no_hacer)}"]
+    return lines
+
+
+def render_console(report: ExecutiveReport) -> str:
+    return '\n'.join(_summary_lines(report, console=True))
+
+
+def render_text(report: ExecutiveReport) -> str:
+    return '\n'.join(_summary_lines(report, console=False)) + '\n'
+
+
+# ---------------------------------------------------------------------------
+# Markdown, JSON y HTML
+# ---------------------------------------------------------------------------
+
+def render_markdown(report: ExecutiveReport) -> str:
+    lines = ["# Resumen ejecutivo - recomendaciones de decisiones", "",
+             f"Tasa de descuento: {report.discount_rate * 100:.2f}%", "",
+             "## Decisión principal", "",
+             f"**Recomendación: {report.recommendation}** (ventaja ${report.advantage:,.0f})", "",
+             "| Opción | VPN total | Actividades |", "|---|---:|---:|"]
+    for mode in report.ranked_modes():
+        lines.append(f"| {mode.label} | ${mode.total:,.0f} | {len(mode.decisions)} |")
+    for mode in (report.propio, report.concesion):
+        lines += ["", f"## Decisiones individuales - {mode.label}", "",
+                  "| # | Actividad | VPN | Recomendación |", "|---:|---|---:|---|"]
+        for i, d in enumerate(mode.hacer + mode.no_hacer, 1):
+            lines.append(f"| {i} | {d.name.replace('|', '/')} | ${d.npv:,.0f} | {d.recommendation} |")
+    lines += ["", "## Resumen final", "",
+              f"- Mejor estrategia: {report.best_strategy}",
+              f"- Valor total esperado: ${report.best_value:,.0f}"]
+    for mode in (report.propio, report.concesion):
+        lines.append(f"- {mode.label}: {len(mode.hacer)} actividades rentables, "
+                     f"{len(mode.no_hacer)} no rentables")
+    return '\n'.join(lines) + '\n'
+
+
+def render_json(report: ExecutiveReport) -> str:
+    return json.dumps(report.to_dict(), ensure_ascii=False, indent=2) + '\n'
+
+
+_HTML_STYLE = """
+body { font-family: system-ui, sans-serif; margin: 2em auto; max-width: 60em; color: #222; }
+h1 { border-bottom: 2px solid #2e7d32; padding-bottom: .3em; }
+table { border-collapse: collapse; margin: 1em 0; }
+th, td { padding: .3em .8em; border-bottom: 1px solid #ddd; }
+td.num { text-align: right; font-variant-numeric: tabular-nums; }
+.hacer { color: #2e7d32; font-weight: bold; }
+.no-hacer { color: #c62828; font-weight: bold; }
+.recomendacion { font-size: 1.2em; padding: .6em 1em; background: #e8f5e9; border-left: 4px solid #2e7d32; }
+"""
+
+
+def render_html(report: ExecutiveReport) -> str:
+    esc = html.escape
+    parts = ['<!DOCTYPE html>', '<html lang="es">', '<head>', '<meta charset="utf-8">',
+             '<title>Resumen ejecutivo</title>', f'<style>{_HTML_STYLE}</style>', '</head>', '<body>',
+             '<h1>Resumen ejecutivo - recomendaciones de decisiones</h1>',
+             f'<p>Tasa de descuento: {report.discount_rate * 100:.2f}%</p>',
+             '<h2>Decisión principal</h2>',
+             f'<p class="recomendacion">Recomendación: <strong>{esc(report.recommendation)}</strong> '
+             f'(ventaja ${report.advantage:,.0f})</p>',
+             '<table><tr><th>Opción</th><th>VPN total</th><th>Actividades</th></tr>']
+    for mode in report.ranked_modes():
+        parts.append(f'<tr><td>{esc(mode.label)}</td><td class="num">${mode.total:,.0f}</td>'
+                     f'<td class="num">{len(mode.decisions)}</td></tr>')
+    parts.append('</table>')
+    for mode in (report.propio, report.concesion):
+        parts += [f'<h2>Decisiones individuales - {esc(mode.label)}</h2>',
+                  '<table><tr><th>#</th><th>Actividad</th><th>VPN</th><th>Recomendación</th></tr>']
+        for i, d in enumerate(mode.hacer + mode.no_hacer, 1):
+            css = 'hacer' if d.npv > 0 else 'no-hacer'
+            parts.append(f'<tr><td class="num">{i}</td><td>{esc(d.name)}</td><td class="num">${d.npv:,.0f}</td>'
+                         f'<td class="{css}">{esc(d.recommendation)}</td></tr>')
+        parts.append('</table>')
+    parts += ['<h2>Resumen final</h2>', '<ul>',
+              f'<li>Mejor estrategia: {esc(report.best_strategy)}</li>',
+              f'<li>Valor total esperado: ${report.best_value:,.0f}</li>']
+    for mode in (report.propio, report.concesion):
+        parts.append(f'<li>{esc(mode.label)}: {len(mode.hacer)} actividades rentables, '
+                     f'{len(mode.no_hacer)} no rentables</li>')
+    parts += ['</ul>', '</body>', '</html>']
+    return '\n'.join(parts) + '\n'
+
+
+RENDERERS: Dict[str, Callable[[ExecutiveReport], str]] = {
+    'txt': render_text,
+    'md': render_markdown,
+    'json': render_json,
+    'html': render_html,
+}
+
+
+def write_report(report: ExecutiveReport, path_base: str, formats: Sequence[str] = REPORT_FORMATS) -> List[str]:
+    """
+    Escribe el informe en cada formato (`<path_base>.<formato>`), una sola escritura por archivo
+    Retorna las rutas escritas.
+    """
+    unknown = [fmt for fmt in formats if fmt not in RENDERERS]
+    if unknown:
+        raise ValueError(f"Formato de informe desconocido: {', '.join(unknown)} (opciones: {', '.join(RENDERERS)})")
+    paths = []
+    for fmt in formats:
+        path = f'{path_base}.{fmt}'
+        with span('exportar_informe', archivo=path):
+            text = RENDERERS[fmt](report)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        count('bytes_escritos', os.path.getsize(path))
+        paths.append(path)
+    return paths
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentación liviana del pipeline: tramos temporizados, contadores y
+progreso con límite de frecuencia.
+
+- `span(nombre, **args)`: tramo anidado (context manager); `traced()` es el
+  decorador equivalente para funciones completas.
+- `phases()`: tramos consecutivos dentro de una función larga
+  (`phase('tornado')` cierra el tramo anterior y abre el siguiente), sin
+  reindentar su cuerpo.
+- `count(nombre, valor)`: contadores acumulados (combinaciones evaluadas,
+  bytes escritos, ...).
+- `progress(formato)`: callback (hecho, total) que imprime a lo más una vez
+  cada PROGRESS_INTERVAL segundos y siempre al terminar.
+
+Los tramos se guardan en memoria (inicio, duración, proceso, hilo,
+profundidad) y se exportan a JSON con un resumen por nombre, o al formato
+de traza de Chrome (chrome://tracing, Perfetto). Los procesos hijos
+devuelven sus eventos con `drain()` y el proceso principal los une con
+`merge()`. El registro recuerda el proceso que lo creó: un hijo creado con
+fork hereda una copia de los eventos del padre, que se descarta al primer
+uso en el hijo, así `drain()` solo devuelve lo registrado en ese proceso
+(con cualquier pool y en cualquier momento en que se cree).
+
+Para perfilar una corrida sin tocar el código basta con la variable de
+entorno ARBOL_TRAZA=<archivo.json> (o `main.py --traza <archivo.json>`); si
+el nombre termina en .trace.json se escribe en formato Chrome.
+"""
+from typing import Callable, Dict, List
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# Intervalo mínimo entre dos líneas de progreso (segundos)
+PROGRESS_INTERVAL = 1.0
+
+# Variable de entorno con la ruta de exportación de la traza
+TRACE_ENV = 'ARBOL_TRAZA'
+CHROME_SUFFIX = '.trace.json'
+
+
+class Tracer:
+    """Registro de tramos y contadores del proceso actual"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        # Reloj monótono anclado a la época: los eventos de distintos procesos quedan en la misma escala
+        self._epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self.reset()
+
+    def reset(self):
+        """Descarta eventos y contadores y asigna el registro al proceso actual"""
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.events: List[Dict] = []
+        self.counters: Dict[str, float] = {}
+
+    def _check_process(self):
+        """En un hijo creado con fork, descarta la copia heredada (esos eventos ya los tiene el padre)"""
+        if os.getpid() != self._pid:
+            self.reset()
+
+    def _now_us(self) -> float:
+        return (time.perf_counter_ns() + self._epoch_offset_ns) / 1000.0
+
+    def _stack(self) -> List[str]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args):
+        if not self.enabled:
+            yield
+            return
+        self._check_process()
+        stack = self._stack()
+        stack.append(name)
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            duration = self._now_us() - start
+            stack.pop()
+            event = {'name': name, 'ts': start, 'dur': duration, 'pid': self._pid,
+                     'tid': threading.get_ident(), 'depth': len(stack), 'args': args}
+            with self._lock:
+                self.events.append(event)
+
+    def count(self, name: str, value: float = 1):
+        if not self.enabled:
+            return
+        self._check_process()
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def drain(self) -> Dict:
+        """Retorna y limpia los eventos y contadores (para enviarlos desde un proceso hijo)"""
+        self._check_process()
+        with self._lock:
+            data = {'events': self.events, 'counters': self.counters}
+            self.events, self.counters = [], {}
+        return data
+
+    def merge(self, data: Dict):
+        """Incorpora los eventos y contadores de otro proceso"""
+        self._check_process()
+        with self._lock:
+            self.events.extend(data['events'])
+            for name, value in data['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> List[Dict]:
+        """Por nombre de tramo: llamadas, tiempo total y máximo (segundos), de mayor a menor"""
+        rows: Dict[str, Dict] = {}
+        for event in self.events:
+            row = rows.setdefault(event['name'], {'tramo': event['name'], 'llamadas': 0,
+                                                  'segundos': 0.0, 'maximo': 0.0})
+            row['llamadas'] += 1
+            row['segundos'] += event['dur'] / 1e6
+            row['maximo'] = max(row['maximo'], event['dur'] / 1e6)
+        return sorted(rows.values(), key=lambda row: -row['segundos'])
+
+    def to_json(self, path: str):
+        ordered = sorted(self.events, key=lambda e: (e['pid'], e['ts']))
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'spans': ordered, 'counters': self.counters, 'summary': self.summary()},
+                      f, ensure_ascii=False, indent=1, default=str)
+
+    def to_chrome_trace(self, path: str):
+        """Formato de eventos de traza de Chrome: tramos completos ('X') y contadores ('C')"""
+        events = [{'name': e['name'], 'cat': 'arbol', 'ph': 'X', 'ts': e['ts'], 'dur': e['dur'],
+                   'pid': e['pid'], 'tid': e['tid'], 'args': e['args']} for e in self.events]
+        end = max((e['ts'] + e['dur'] for e in self.events), default=self._now_us())
+        events.extend({'name': name, 'cat': 'arbol', 'ph': 'C', 'ts': end, 'pid': os.getpid(),
+                       'args': {name: value}} for name, value in sorted(self.counters.items()))
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+
+    def export(self, path: str):
+        """Exporta según la extensión: *.trace.json → Chrome, otro → JSON con resumen"""
+        if path.endswith(CHROME_SUFFIX):
+            self.to_chrome_trace(path)
+        else:
+            self.to_json(path)
+
+
+class Phases:
+    """Tramos consecutivos: cada llamada cierra el tramo abierto y abre uno nuevo"""
+
+    def __init__(self, tracer: Tracer, prefix: str = '', **args):
+        self.tracer = tracer
+        self.prefix = prefix
+        self.args = args
+        self._current = None
+
+    def __call__(self, name: str, **args):
+        self.end()
+        self._current = self.tracer.span(f'{self.prefix}{name}', **{**self.args, **args})
+        self._current.__enter__()
+
+    def end(self):
+        if self._current is not None:
+            current, self._current = self._current, None
+            current.__exit__(None, None, None)
+
+
+# Registro del proceso actual
+TRACER = Tracer()
+
+
+def span(name: str, **args):
+    return TRACER.span(name, **args)
+
+
+def count(name: str, value: float = 1):
+    TRACER.count(name, value)
+
+
+def phases(prefix: str = '', **args) -> Phases:
+    """Tramos consecutivos; args se agregan a todos los tramos (p. ej. el escenario)"""
+    return Phases(TRACER, prefix, **args)
+
+
+def traced(name: str = None):
+    """Decorador: registra cada llamada a la función como un tramo"""
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def progress(template: str, interval: float = PROGRESS_INTERVAL,
+             counter: str = None) -> Callable[[int, int], None]:
+    """
+    Callback de progreso (hecho, total) con límite de frecuencia
+
+    template se formatea con done, total y pct. Imprime solo si pasaron
+    `interval` segundos desde la línea anterior, y siempre al llegar al
+    total; si `counter` está dado, acumula en ese contador lo avanzado.
+    """
+    state = {'last': time.perf_counter(), 'done': 0}
+
+    def callback(done: int, total: int):
+        if counter is not None:
+            count(counter, done - state['done'])
+            state['done'] = done
+        now = time.perf_counter()
+        if done >= total or now - state['last'] >= interval:
+            print(template.format(done=done, total=total, pct=done / total * 100 if total else 100.0))
+            state['last'] = now
+    return callback
+
+
+def export_from_env(path: str = None):
+    """Exporta la traza a `path` o a la ruta de ARBOL_TRAZA (si no hay ninguna no hace nada)"""
+    path = path or os.environ.get(TRACE_ENV)
+    if path:
+        TRACER.export(path)
+    return path
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Ejecución en lote: muchos parques y variantes de parámetros en un pool de procesos.
+
+La entrada es una carpeta o un manifiesto:
+
+- Carpeta: cada archivo de escenarios (ver `escenarios`) en la raíz es un
+  parque con los escenarios que contiene (p. ej. la hoja de parámetros con
+  Concesión y Administración Propia); cada subcarpeta es un parque y cada
+  archivo dentro, una modalidad (`cantillana/concesion.json`, ...).
+- Manifiesto (JSON, YAML o CSV): una entrada por corrida con `parque`,
+  `archivo` y opcionalmente `escenario` (nombre dentro del archivo) y
+  `modalidad`. Las rutas relativas se resuelven desde el manifiesto.
+
+Todos los escenarios se cargan y validan en lote antes de lanzar el pool.
+Cada corrida escribe en su propio espacio de salida
+(`<salida>/<parque>/resultados-<modalidad>/`, con el log de la corrida en
+`<modalidad>.log`) y el pool tiene concurrencia acotada (`--procesos`). Al
+terminar se escriben:
+
+- resumen_corridas: una fila por corrida (EV de la mejor combinación, sus
+  actividades, combinaciones evaluadas, tiempo, estado). Las combinaciones
+  son las que evaluó la corrida: menos de 2^n con la búsqueda directa de
+  extremas y 0 si se reutilizaron desde la caché.
+- resumen_parques: una fila por parque con el EV de cada modalidad, la
+  mejor opción y la diferencia con la segunda.
+
+    python lote.py parques/ --salida resultados-lote --procesos 4
+    python lote.py manifiesto.yaml --graficos
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+import contextlib
+import csv
+import json
+import os
+import time
+import traceback
+
+from escenarios import SCENARIO_FORMATS, Scenario, load_scenarios, slugify
+from formatos import FORMAT_EXTENSIONS, write_table
+from instrumentacion import TRACER, export_from_env, progress, span
+
+DEFAULT_OUTPUT_DIR = 'resultados-lote'
+RUNS_TABLE = 'resumen_corridas'
+PARKS_TABLE = 'resumen_parques'
+
+
+def _read_manifest(path: str) -> List[Dict]:
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if ext == '.csv':
+            entries = list(csv.DictReader(f))
+        elif ext in ('.yaml', '.yml'):
+            import yaml
+            entries = yaml.safe_load(f)
+        else:
+            entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = entries.get('corridas', [])
+    base = os.path.dirname(os.path.abspath(path))
+    for entry in entries:
+        if not entry.get('parque') or not entry.get('archivo'):
+            raise ValueError(f"Cada entrada del manifiesto necesita 'parque' y 'archivo': {entry}")
+        entry['archivo'] = os.path.join(base, entry['archivo'])
+    return entries
+
+
+def _scan_directory(path: str) -> List[Dict]:
+    """Entradas de una carpeta: archivos de la raíz = parques; subcarpetas = parques con un archivo por modalidad"""
+    entries = []
+    for name in sorted(os.listdir(path)):
+        full = os.path.join(path, name)
+        if os.path.isdir(full):
+            for inner in sorted(os.listdir(full)):
+                stem, ext = os.path.splitext(inner)
+                if ext.lower() in SCENARIO_FORMATS:
+                    entries.append({'parque': name, 'archivo': os.path.join(full, inner), 'modalidad': stem})
+        elif os.path.splitext(name)[1].lower() in SCENARIO_FORMATS:
+            entries.append({'parque': os.path.splitext(name)[0], 'archivo': full})
+    return entries
+
+
+def batch_runs(source: str, discount_rate: float = None) -> List[Tuple[str, str, Scenario]]:
+    """
+    Corridas (parque, modalidad, escenario) de una carpeta o un manifiesto
+    Carga y valida todos los archivos en lote (un único ScenarioError con todos los problemas).
+    """
+    entries = _scan_directory(source) if os.path.isdir(source) else _read_manifest(source)
+    paths = list(dict.fromkeys(entry['archivo'] for entry in entries))
+    by_file: Dict[str, List[Scenario]] = {}
+    for scenario in load_scenarios(paths, discount_rate):
+        by_file.setdefault(scenario.source, []).append(scenario)
+
+    runs, seen = [], set()
+    for entry in entries:
+        scenarios = by_file[entry['archivo']]
+        if entry.get('escenario'):
+            scenarios = [s for s in scenarios if s.name == entry['escenario']]
+            if not scenarios:
+                raise ValueError(f"Escenario {entry['escenario']!r} no encontrado en {entry['archivo']}")
+        for scenario in scenarios:
+            # Con un solo escenario en el archivo, la modalidad puede venir de la entrada
+            mode = entry.get('modalidad') if len(scenarios) == 1 and entry.get('modalidad') else scenario.name
+            key = (slugify(entry['parque']), slugify(mode))
+            if key in seen:
+                raise ValueError(f"Corrida repetida: parque {entry['parque']!r}, modalidad {mode!r}")
+            seen.add(key)
+            runs.append((entry['parque'], mode, scenario))
+    return runs
+
+
+def _run_batch_job(park: str, mode: str, scenario: Scenario, output_dir: str, options: Dict) -> Tuple[Dict, Dict]:
+    """
+    Tarea del pool: analiza un escenario en su propio espacio de salida con la salida
+    de consola en un log. Retorna (fila del resumen, eventos de traza del proceso).
+    """
+    from main import analyze_scenario
+
+    park_dir = os.path.join(output_dir, slugify(park).replace('_', '-'))
+    mode_name = slugify(mode).replace('_', '-')
+    os.makedirs(park_dir, exist_ok=True)
+    row = {'Parque': park, 'Modalidad': mode, 'Archivo': scenario.source, 'Actividades': len(scenario.activities),
+           'Combinaciones_Evaluadas': 0, 'EV_Mejor': float('nan'),
+           'Actividades_Mejor': '', 'Segundos': 0.0, 'Estado': 'ok',
+           'Carpeta': os.path.join(park_dir, f'resultados-{mode_name}')}
+    start = time.perf_counter()
+    with open(os.path.join(park_dir, f'{mode_name}.log'), 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log):
+        try:
+            with span('corrida_lote', parque=park, modalidad=mode):
+                df_sorted, _, _, evaluated = analyze_scenario(scenario, mode_name,
+                                                              os.path.join(park_dir, 'resultados'), **options)
+            row['Combinaciones_Evaluadas'] = evaluated
+            best = df_sorted.loc[df_sorted['EV_total'].idxmax()]
+            row['EV_Mejor'] = float(best['EV_total'])
+            row['Actividades_Mejor'] = ', '.join(k for k in scenario.decision_order
+                                                 if k in best.index and best[k] == 1)
+        except Exception as exc:  # Una corrida fallida no detiene el lote
+            traceback.print_exc(file=log)
+            row['Estado'] = f'error: {exc}'
+    row['Segundos'] = time.perf_counter() - start
+    return row, TRACER.drain()
+
+
+def parks_summary(runs_df):
+    """Una fila por parque: EV de cada modalidad, mejor opción y diferencia con la segunda"""
+    import pandas as pd
+
+    rows = []
+    ok = runs_df[runs_df['Estado'] == 'ok']
+    for park, group in ok.groupby('Parque', sort=False):
+        ranked = group.sort_values('EV_Mejor', ascending=False)
+        row = {'Parque': park}
+        row.update({f'EV_{mode}': ev for mode, ev in zip(group['Modalidad'], group['EV_Mejor'])})
+        row['Mejor_Opcion'] = ranked['Modalidad'].iloc[0]
+        row['EV_Mejor'] = ranked['EV_Mejor'].iloc[0]
+        row['Diferencia_EV'] = (ranked['EV_Mejor'].iloc[0] - ranked['EV_Mejor'].iloc[1]
+                                if len(ranked) > 1 else float('nan'))
+        row['Actividades_Mejor'] = ranked['Actividades_Mejor'].iloc[0]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def run_batch(source: str, output_dir: str = DEFAULT_OUTPUT_DIR, max_workers: int = None,
+              output_format: str = 'csv', compute_only: bool = True, use_cache: bool = True,
+              discount_rate: float = None):
+    """
+    Ejecuta todas las corridas de `source` (carpeta o manifiesto) en un pool de procesos
+
+    max_workers acota la concurrencia (por defecto, los núcleos disponibles;
+    1 = en este proceso). compute_only=True omite los gráficos de cada corrida.
+    Retorna (resumen por corrida, resumen por parque) como DataFrames.
+    """
+    import pandas as pd
+
+    start = time.perf_counter()
+    runs = batch_runs(source, discount_rate)
+    os.makedirs(output_dir, exist_ok=True)
+    max_workers = max(1, min(len(runs), max_workers or os.cpu_count() or 1))
+    options = {'output_format': output_format, 'compute_only': compute_only, 'use_cache': use_cache}
+    print(f"📦 Lote: {len(runs)} corridas de {len({park for park, _, _ in runs})} parques "
+          f"({max_workers} procesos) → {output_dir}")
+
+    report = progress("   📊 Corridas terminadas: {done:,}/{total:,} ({pct:.1f}%)")
+    rows: List[Dict] = [None] * len(runs)
+    with span('lote', corridas=len(runs), procesos=max_workers):
+        if max_workers == 1:
+            for i, (park, mode, scenario) in enumerate(runs):
+                rows[i], trace = _run_batch_job(park, mode, scenario, output_dir, options)
+                TRACER.merge(trace)
+                report(i + 1, len(runs))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                futures = {pool.submit(_run_batch_job, park, mode, scenario, output_dir, options): i
+                           for i, (park, mode, scenario) in enumerate(runs)}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    rows[futures[future]], trace = future.result()
+                    TRACER.merge(trace)
+                    report(done, len(runs))
+    for row in rows:
+        if row['Estado'] != 'ok':
+            print(f"   ❌ {row['Parque']} / {row['Modalidad']}: {row['Estado']} (ver el log en {row['Carpeta']})")
+
+    runs_df = pd.DataFrame(rows)
+    parks_df = parks_summary(runs_df)
+    write_table(runs_df, os.path.join(output_dir, RUNS_TABLE), output_format)
+    write_table(parks_df, os.path.join(output_dir, PARKS_TABLE), output_format)
+
+    elapsed = time.perf_counter() - start
+    ok = runs_df[runs_df['Estado'] == 'ok']
+    combos = int(ok['Combinaciones_Evaluadas'].sum())
+    print(f"✅ {len(ok)}/{len(runs_df)} corridas en {elapsed:.2f} s: "
+          f"{len(runs_df) / elapsed:.2f} corridas/s, {combos / elapsed:,.0f} combinaciones/s "
+          f"(tiempo medio por corrida {ok['Segundos'].mean() if len(ok) else 0:.2f} s)")
+    ext = FORMAT_EXTENSIONS[output_format]
+    print(f"   📋 {RUNS_TABLE}{ext}, {PARKS_TABLE}{ext} en {output_dir}")
+    return runs_df, parks_df
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Análisis en lote de parques y variantes de parámetros')
+    parser.add_argument('entrada', help='carpeta de escenarios o manifiesto (JSON, YAML o CSV)')
+    parser.add_argument('--salida', default=DEFAULT_OUTPUT_DIR, help='carpeta base de resultados')
+    parser.add_argument('--procesos', type=int, help='máximo de procesos simultáneos')
+    parser.add_argument('--formato', choices=list(FORMAT_EXTENSIONS), default='csv', help='formato de las tablas')
+    parser.add_argument('--graficos', action='store_true', help='genera también los gráficos de cada corrida')
+    parser.add_argument('--tasa', type=float, help='tasa de descuento si el escenario no la define')
+    parser.add_argument('--sin-cache', action='store_true', help='recalcula todos los artefactos')
+    parser.add_argument('--traza', metavar='ARCHIVO',
+                        help='exporta tramos y contadores (JSON; formato Chrome si termina en .trace.json)')
+    args = parser.parse_args()
+    _, parks = run_batch(args.entrada, args.salida, args.procesos, args.formato, compute_only=not args.graficos,
+                         use_cache=not args.sin_cache, discount_rate=args.tasa)
+    if len(parks):
+        print(parks[['Parque', 'Mejor_Opcion', 'EV_Mejor', 'Diferencia_EV']].to_string(index=False))
+    trace_file = export_from_env(args.traza)
+    if trace_file:
+        print(f"🧭 Traza guardada en: {trace_file}")
@@ -1,31 +1,76 @@
-
 # -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import importlib
 import itertools
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
 import math
 import os
-import time
+import sys
 
-import matplotlib.pyplot as plt
-import pandas as pd
-import networkx as nx
+# pandas, matplotlib y networkx se importan dentro de las funciones que los usan:
+# importar este módulo (o correr en modo solo cálculo) no carga el stack de gráficos
+if TYPE_CHECKING:
+    import networkx as nx
+    import pandas as pd
 
+from arbol import activity_tree, rollback
+from cache_resultados import ResultCache, cache_key
+from combinaciones import (MAX_DECISION_KEYS, TABLE_EV_FILE, TABLE_MASKS_FILE, TABLE_META_FILE,
+                           CombinationTable, bits_to_masks, combinations_frame, evaluate_bits,
+                           evaluate_combinations, k_best_deviations, keyed_ev_vector,
+                           open_combination_table, stream_combinations_csv)
+from diagrama_arbol import layout_tree, render_tree
+from escenarios import compile_activities
+from distribucion import portfolio_distribution
+from formatos import FORMAT_EXTENSIONS, output_path, write_table
+from grupos_eleccion import (NONE_LABEL, assignments_frame, combined_model, evaluate_assignments,
+                             k_best_assignments)
+from informe import (REPORT_FORMATS, ExecutiveReport, ModeReport, build_report, render_console,
+                     render_individual_decisions, render_main_decision, write_report)
+from instrumentacion import TRACER, export_from_env, phases, progress, traced
+from montecarlo import simulate_portfolio
+from optimizador import (MAX_BRUTE_FORCE, PortfolioProblem, constraints_from_parameters, optimize_portfolios,
+                         portfolios_frame, verify_against_brute_force)
+from renderizado import FigureRenderer, SpecCollector
+from sensibilidad import (pack_perturbations, parametric_tornado, parametric_tornado_difference,
+                          unpack_perturbations)
+from tabla_actividades import Activity, activity_table
+from tasas import RateSweep, sweep_discount_rates
 import parametros_concesion as P_CONCESION
 import parametros_administracion_propia as P_PROPIO
 
-@dataclass
-class ActivityOutcome:
-    label: str
-    prob: float
-    npv: float
+# Tiempo de importación de este módulo y sus dependencias (sin el arranque del intérprete)
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+HEAVY_MODULES = ('pandas', 'matplotlib', 'networkx')
+
+# Sobre este número de decisiones no se enumeran las 2^n combinaciones:
+# solo se buscan las TOP_K mejores y peores
+MAX_FULL_ENUMERATION = 25
+TOP_K = 10
+
+# Variación relativa de probabilidades y VPN en el tornado paramétrico
+TORNADO_PERCENT = 0.10
+
+# Grilla de tasas de descuento para el barrido (0% a 30%)
+SWEEP_RATES = [i / 1000 for i in range(301)]
 
-@dataclass
-class Activity:
-    name: str
-    decision_key: str
-    horizon_years: int
-    outcomes: List[ActivityOutcome]
+# Simulación Monte Carlo del VPN de los portafolios (en modo solo cálculo, una corrida rápida)
+MONTECARLO_TRIALS = 1_000_000
+MONTECARLO_TRIALS_COMPUTE_ONLY = 100_000
+MONTECARLO_SEED = 12345
+
+# Etapas más lentas listadas al final de la corrida (ver instrumentacion)
+TOP_SPANS = 8
+
+# Dibujo del árbol: se colapsan los subárboles bajo esta profundidad o bajo esta probabilidad de camino
+TREE_MAX_DEPTH = 6
+TREE_MIN_MASS = 0.0
 
 # Función load_activities eliminada - ahora se carga directamente en analyze_scenario
 
@@ -89,90 +134,26 @@ def verify_probabilities(parametros):
     
     return all_valid
 
-def analyze_main_decision(activities_concesion: List[Activity], activities_propio: List[Activity], discount_rate: float = 0.12) -> pd.DataFrame:
+def analyze_main_decision(report: ExecutiveReport) -> pd.DataFrame:
     """
     Analiza la decisión principal: Concesionar todo vs Administración propia
     """
-    print("\n🎯 ANÁLISIS DE DECISIÓN PRINCIPAL:")
-    print("="*60)
-    
-    # Calcular VPN de la mejor combinación de concesión
-    best_concesion_ev = sum(expected_npv(act, discount_rate) for act in activities_concesion)
-    
-    # Calcular VPN de la mejor combinación de administración propia
-    best_propio_ev = sum(expected_npv(act, discount_rate) for act in activities_propio)
-    
-    # Calcular diferencia
-    diferencia = best_propio_ev - best_concesion_ev
-    
-    print(f"💰 CONCESIONAR TODO:")
-    print(f"   VPN Total: ${best_concesion_ev:,.0f}")
-    print(f"   Actividades: {len(activities_concesion)}")
-    
-    print(f"\n💰 ADMINISTRACIÓN PROPIA:")
-    print(f"   VPN Total: ${best_propio_ev:,.0f}")
-    print(f"   Actividades: {len(activities_propio)}")
-    
-    print(f"\n⚖️ DIFERENCIA:")
-    print(f"   Ventaja Administración Propia: ${diferencia:,.0f}")
-    print(f"   Mejor opción: {'Administración Propia' if diferencia > 0 else 'Concesión'}")
-    
-    # Crear DataFrame para exportar
-    decision_data = [{
-        'Decision': 'Concesionar Todo',
-        'NPV_Total': best_concesion_ev,
-        'Num_Actividades': len(activities_concesion),
-        'Tipo': 'Concesión'
-    }, {
-        'Decision': 'Administración Propia',
-        'NPV_Total': best_propio_ev,
-        'Num_Actividades': len(activities_propio),
-        'Tipo': 'Propia'
-    }]
-    
-    return pd.DataFrame(decision_data)
+    print(render_main_decision(report))
+    return report.main_decision_frame()
 
-def analyze_individual_decisions(activities: List[Activity], discount_rate: float = 0.12) -> pd.DataFrame:
+def analyze_individual_decisions(mode: ModeReport) -> pd.DataFrame:
     """
     Analiza cada decisión individual: Hacer vs No hacer cada actividad
     """
-    print(f"\n🔍 ANÁLISIS DE DECISIONES INDIVIDUALES:")
-    print("="*60)
-    
-    decision_data = []
-    
-    for act in activities:
-        # VPN si hago la actividad
-        npv_hacer = expected_npv(act, discount_rate)
-        
-        # VPN si no hago la actividad (siempre 0)
-        npv_no_hacer = 0.0
-        
-        # Diferencia (valor de la decisión)
-        valor_decision = npv_hacer - npv_no_hacer
-        
-        decision_data.append({
-            'Actividad': act.name,
-            'NPV_Hacer': npv_hacer,
-            'NPV_No_Hacer': npv_no_hacer,
-            'Valor_Decision': valor_decision,
-            'Horizonte_Años': act.horizon_years,
-            'Recomendacion': 'HACER' if valor_decision > 0 else 'NO HACER'
-        })
-        
-        print(f"📊 {act.name}:")
-        print(f"   VPN si HAGO: ${npv_hacer:,.0f}")
-        print(f"   VPN si NO HAGO: ${npv_no_hacer:,.0f}")
-        print(f"   Valor de la decisión: ${valor_decision:,.0f}")
-        print(f"   Recomendación: {'HACER' if valor_decision > 0 else 'NO HACER'}")
-        print()
-    
-    return pd.DataFrame(decision_data)
+    print(render_individual_decisions(mode))
+    return mode.individual_frame()
 
+@traced()
 def plot_main_decision_analysis(df_main_decision: pd.DataFrame, outfile: str):
     """
     Gráfico de la decisión principal: Concesionar vs Administración propia
     """
+    import matplotlib.pyplot as plt
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
     
     # Gráfico 1: Comparación de NPVs
@@ -206,10 +187,12 @@ def plot_main_decision_analysis(df_main_decision: pd.DataFrame, outfile: str):
     plt.savefig(outfile, dpi=150, bbox_inches='tight')
     plt.close()
 
+@traced()
 def plot_individual_decisions(df_individual: pd.DataFrame, outfile: str):
     """
     Gráfico de decisiones individuales: Hacer vs No hacer cada actividad
     """
+    import matplotlib.pyplot as plt
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(16, 12))
     
     # Ordenar por valor de decisión
@@ -253,199 +236,71 @@ def plot_individual_decisions(df_individual: pd.DataFrame, outfile: str):
     plt.savefig(outfile, dpi=150, bbox_inches='tight')
     plt.close()
 
-def generate_executive_summary(activities_concesion: List[Activity], activities_propio: List[Activity], discount_rate: float = 0.12):
+@traced()
+def generate_executive_summary(report: ExecutiveReport, path_base: str = 'resultados-concesion/resumen_ejecutivo'):
     """
     Genera un resumen ejecutivo con recomendaciones claras de qué hacer y qué no hacer
+    (consola y archivos .txt, .md, .json y .html con el mismo informe)
     """
-    print("\n" + "="*80)
-    print("📋 RESUMEN EJECUTIVO - RECOMENDACIONES DE DECISIONES")
-    print("="*80)
-    
-    # 1. DECISIÓN PRINCIPAL
-    print("\n🎯 DECISIÓN PRINCIPAL:")
-    print("-" * 50)
-    
-    npv_concesion = sum(expected_npv(act, discount_rate) for act in activities_concesion)
-    npv_propio = sum(expected_npv(act, discount_rate) for act in activities_propio)
-    diferencia = npv_propio - npv_concesion
-    
-    if diferencia > 0:
-        print(f"✅ RECOMENDACIÓN: ADMINISTRACIÓN PROPIA")
-        print(f"   💰 Ventaja: ${diferencia:,.0f}")
-        print(f"   📊 VPN Administración Propia: ${npv_propio:,.0f}")
-        print(f"   📊 VPN Concesión: ${npv_concesion:,.0f}")
-    else:
-        print(f"✅ RECOMENDACIÓN: CONCESIONAR TODO")
-        print(f"   💰 Ventaja: ${-diferencia:,.0f}")
-        print(f"   📊 VPN Concesión: ${npv_concesion:,.0f}")
-        print(f"   📊 VPN Administración Propia: ${npv_propio:,.0f}")
-    
-    # 2. DECISIONES INDIVIDUALES - ADMINISTRACIÓN PROPIA
-    print(f"\n🔍 DECISIONES INDIVIDUALES - ADMINISTRACIÓN PROPIA:")
-    print("-" * 50)
-    
-    actividades_hacer = []
-    actividades_no_hacer = []
-    
-    for act in activities_propio:
-        npv_hacer = expected_npv(act, discount_rate)
-        if npv_hacer > 0:
-            actividades_hacer.append((act.name, npv_hacer))
-        else:
-            actividades_no_hacer.append((act.name, npv_hacer))
-    
-    # Ordenar por VPN descendente
-    actividades_hacer.sort(key=lambda x: x[1], reverse=True)
-    actividades_no_hacer.sort(key=lambda x: x[1], reverse=True)
-    
-    print("✅ HACER (Ordenadas por rentabilidad):")
-    for i, (nombre, npv) in enumerate(actividades_hacer, 1):
-        print(f"   {i:2d}. {nombre:<30} → ${npv:>8,.0f}")
-    
-    print("\n❌ NO HACER (Ordenadas por pérdida):")
-    for i, (nombre, npv) in enumerate(actividades_no_hacer, 1):
-        print(f"   {i:2d}. {nombre:<30} → ${npv:>8,.0f}")
-    
-    # 3. DECISIONES INDIVIDUALES - CONCESIÓN
-    print(f"\n🔍 DECISIONES INDIVIDUALES - CONCESIÓN:")
-    print("-" * 50)
-    
-    actividades_hacer_concesion = []
-    actividades_no_hacer_concesion = []
-    
-    for act in activities_concesion:
-        npv_hacer = expected_npv(act, discount_rate)
-        if npv_hacer > 0:
-            actividades_hacer_concesion.append((act.name, npv_hacer))
-        else:
-            actividades_no_hacer_concesion.append((act.name, npv_hacer))
-    
-    # Ordenar por VPN descendente
-    actividades_hacer_concesion.sort(key=lambda x: x[1], reverse=True)
-    actividades_no_hacer_concesion.sort(key=lambda x: x[1], reverse=True)
-    
-    print("✅ HACER (Ordenadas por rentabilidad):")
-    for i, (nombre, npv) in enumerate(actividades_hacer_concesion, 1):
-        print(f"   {i:2d}. {nombre:<30} → ${npv:>8,.0f}")
-    
-    print("\n❌ NO HACER (Ordenadas por pérdida):")
-    for i, (nombre, npv) in enumerate(actividades_no_hacer_concesion, 1):
-        print(f"   {i:2d}. {nombre:<30} → ${npv:>8,.0f}")
-    
-    # 4. RESUMEN FINAL
-    print(f"\n📊 RESUMEN FINAL:")
-    print("-" * 50)
-    print(f"🎯 Mejor estrategia: {'ADMINISTRACIÓN PROPIA' if diferencia > 0 else 'CONCESIÓN'}")
-    print(f"💰 Valor total esperado: ${max(npv_concesion, npv_propio):,.0f}")
-    print(f"📈 Actividades rentables (Administración Propia): {len(actividades_hacer)}")
-    print(f"📉 Actividades no rentables (Administración Propia): {len(actividades_no_hacer)}")
-    print(f"📈 Actividades rentables (Concesión): {len(actividades_hacer_concesion)}")
-    print(f"📉 Actividades no rentables (Concesión): {len(actividades_no_hacer_concesion)}")
-    
-    # 5. GUARDAR RESUMEN EN ARCHIVO
-    with open('resultados-concesion/resumen_ejecutivo.txt', 'w', encoding='utf-8') as f:
-        f.write("RESUMEN EJECUTIVO - RECOMENDACIONES DE DECISIONES\n")
-        f.write("="*80 + "\n\n")
-        
-        f.write("DECISIÓN PRINCIPAL:\n")
-        f.write("-" * 50 + "\n")
-        if diferencia > 0:
-            f.write("RECOMENDACIÓN: ADMINISTRACIÓN PROPIA\n")
-            f.write(f"Ventaja: ${diferencia:,.0f}\n")
-            f.write(f"VPN Administración Propia: ${npv_propio:,.0f}\n")
-            f.write(f"VPN Concesión: ${npv_concesion:,.0f}\n")
-        else:
-            f.write("RECOMENDACIÓN: CONCESIONAR TODO\n")
-            f.write(f"Ventaja: ${-diferencia:,.0f}\n")
-            f.write(f"VPN Concesión: ${npv_concesion:,.0f}\n")
-            f.write(f"VPN Administración Propia: ${npv_propio:,.0f}\n")
-        
-        f.write(f"\nDECISIONES INDIVIDUALES - ADMINISTRACIÓN PROPIA:\n")
-        f.write("-" * 50 + "\n")
-        f.write("HACER (Ordenadas por rentabilidad):\n")
-        for i, (nombre, npv) in enumerate(actividades_hacer, 1):
-            f.write(f"{i:2d}. {nombre:<30} → ${npv:>8,.0f}\n")
-        f.write("\nNO HACER (Ordenadas por pérdida):\n")
-        for i, (nombre, npv) in enumerate(actividades_no_hacer, 1):
-            f.write(f"{i:2d}. {nombre:<30} → ${npv:>8,.0f}\n")
-        
-        f.write(f"\nDECISIONES INDIVIDUALES - CONCESIÓN:\n")
-        f.write("-" * 50 + "\n")
-        f.write("HACER (Ordenadas por rentabilidad):\n")
-        for i, (nombre, npv) in enumerate(actividades_hacer_concesion, 1):
-            f.write(f"{i:2d}. {nombre:<30} → ${npv:>8,.0f}\n")
-        f.write("\nNO HACER (Ordenadas por pérdida):\n")
-        for i, (nombre, npv) in enumerate(actividades_no_hacer_concesion, 1):
-            f.write(f"{i:2d}. {nombre:<30} → ${npv:>8,.0f}\n")
-        
-        f.write(f"\nRESUMEN FINAL:\n")
-        f.write("-" * 50 + "\n")
-        f.write(f"Mejor estrategia: {'ADMINISTRACIÓN PROPIA' if diferencia > 0 else 'CONCESIÓN'}\n")
-        f.write(f"Valor total esperado: ${max(npv_concesion, npv_propio):,.0f}\n")
-        f.write(f"Actividades rentables (Administración Propia): {len(actividades_hacer)}\n")
-        f.write(f"Actividades no rentables (Administración Propia): {len(actividades_no_hacer)}\n")
-        f.write(f"Actividades rentables (Concesión): {len(actividades_hacer_concesion)}\n")
-        f.write(f"Actividades no rentables (Concesión): {len(actividades_no_hacer_concesion)}\n")
-    
-    print(f"\n💾 Resumen ejecutivo guardado en: resultados-concesion/resumen_ejecutivo.txt")
+    print(render_console(report))
+    paths = write_report(report, path_base)
+    print(f"\n💾 Resumen ejecutivo guardado en: {', '.join(paths)}")
 
-def enumerate_combinations(decision_order: List[str]) -> List[Tuple[Tuple[int, ...], Dict[str, int]]]:
-    combos = []
+def iter_combinations(decision_order: List[str]) -> Iterator[Tuple[Tuple[int, ...], Dict[str, int]]]:
+    """Versión generadora de enumerate_combinations (no materializa las 2^n combinaciones)"""
     for bits in itertools.product([0,1], repeat=len(decision_order)):
-        mapping = dict(zip(decision_order, bits))
-        combos.append((bits, mapping))
-    return combos
+        yield bits, dict(zip(decision_order, bits))
+
+def enumerate_combinations(decision_order: List[str]) -> List[Tuple[Tuple[int, ...], Dict[str, int]]]:
+    return list(iter_combinations(decision_order))
+
+def top_k_combinations(activities: List[Activity], k: int, discount_rate: float = 0.12,
+                       decision_keys: List[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Obtiene las k mejores y las k peores combinaciones sin enumerar las 2^n
+    Retorna (top, worst) con el mismo formato que df_sorted.head(k) y df_sorted.tail(k)
+    """
+    table = activity_table(activities, discount_rate)
+    if decision_keys is None:
+        decision_keys = table.decision_keys
+    ev_vector = keyed_ev_vector(decision_keys, dict(zip(table.decision_keys, table.ev.tolist())))
+
+    frames = []
+    for worst in (False, True):
+        bits = k_best_deviations(ev_vector, k, worst=worst)
+        df = combinations_frame(decision_keys, bits, evaluate_bits(bits, ev_vector))
+        frames.append(df.sort_values('EV_total', ascending=False, kind='stable').reset_index(drop=True))
+    return frames[0], frames[1]
 
 # Función eval_combo eliminada - ya no se usa con la nueva estructura
 
 def tornado_data(activities: List[Activity], discount_rate: float = 0.12) -> pd.DataFrame:
+    import pandas as pd
     rows = []
-    for act in activities:
-        on_val = expected_npv(act, discount_rate)
+    table = activity_table(activities, discount_rate)
+    for name, on_val in zip(table.names, table.ev.tolist()):
         off_val = 0.0
         delta = on_val - off_val
         rows.append({
-            'actividad': act.name,
+            'actividad': name,
             'impacto_EV_mantener_vs_no': delta
         })
     df = pd.DataFrame(rows).sort_values('impacto_EV_mantener_vs_no', key=abs, ascending=False)
     return df
 
-def build_decision_tree_graph(activities: List[Activity]) -> nx.DiGraph:
-    """
-    Árbol de decisión simple:
-    - Nodo de decisión por actividad (0/1)
-    - Si 1 (mantener), nodo de azar con ramas según outcomes con prob.
-    - Si 0 (no), pasa directo al siguiente.
-    El gráfico mostrará etiquetas con la última decisión tomada y, en ramas de azar,
-    la etiqueta del escenario y su probabilidad.
-    """
-    G = nx.DiGraph()
-    root = ('D', 0, 'root')  # (tipo, profundidad, etiqueta)
-    G.add_node(root, label='Inicio')
-    frontier = [root]
-    for depth, act in enumerate(activities, start=1):
-        new_frontier = []
-        for node in frontier:
-            # Decisión: 0 (no mantener)
-            d0 = ('D', depth, f"{act.decision_key}=0")
-            G.add_edge(node, d0, label='0')
-            G.nodes[d0]['label'] = f"{act.name}: NO"
-            new_frontier.append(d0)
-            # Decisión: 1 (mantener) -> chance node
-            d1 = ('D', depth, f"{act.decision_key}=1")
-            G.add_edge(node, d1, label='1')
-            G.nodes[d1]['label'] = f"{act.name}: SÍ"
-            # Chance outcomes
-            for i, o in enumerate(act.outcomes):
-                cnode = ('C', depth, f"{act.decision_key}_o{i}")
-                G.add_edge(d1, cnode, label=f"p={o.prob:.2f}")
-                G.nodes[cnode]['label'] = f"{o.label} (p={o.prob:.2f}, VPN={o.npv:,.0f})"
-                new_frontier.append(cnode)
-        frontier = new_frontier
-    return G
+def build_decision_tree_graph(activities: List[Activity], discount_rate: float = 0.12) -> nx.DiGraph:
+    """
+    Árbol de decisión simple como networkx.DiGraph (exportación opcional de arbol.activity_tree):
+    - Nodo de decisión por actividad (NO / SÍ)
+    - Si SÍ, nodo de azar con ramas según outcomes con prob.
+    - Si NO, pasa directo al siguiente.
+    Los subárboles idénticos son un solo nodo, así el grafo tiene O(n) nodos.
+    """
+    return activity_tree(activities, discount_rate).to_networkx()
 
+@traced()
 def plot_tornado(df: pd.DataFrame, outfile: str):
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(8, 5))
     y = list(df['actividad'])
     x = [val / 1e6 for val in df['impacto_EV_mantener_vs_no']]  # Convertir a millones
@@ -458,23 +313,34 @@ def plot_tornado(df: pd.DataFrame, outfile: str):
     plt.savefig(outfile, dpi=150)
     plt.close()
 
-def plot_tree(G: nx.DiGraph, outfile: str):
-    # Layout jerárquico aproximado
-    pos = nx.spring_layout(G, k=0.9, iterations=400)
-    labels = nx.get_node_attributes(G, 'label')
-    edge_labels = nx.get_edge_attributes(G, 'label')
-
-    plt.figure(figsize=(12, 10))
-    nx.draw(G, pos, with_labels=False, node_size=800, font_size=8)
-    nx.draw_networkx_labels(G, pos, labels, font_size=7)
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=7)
-    plt.title('Árbol de decisión con probabilidades (borrador)')
+@traced()
+def plot_parametric_tornado(df: pd.DataFrame, outfile: str, title: str, top: int = 15, show_scenario: bool = False):
+    """Tornado paramétrico: rango bajo/alto de las perturbaciones con mayor amplitud"""
+    import matplotlib.pyplot as plt
+    df_top = df.head(top).iloc[::-1]
+    base = df_top['Valor_Base'].iloc[0] / 1e6 if len(df_top) else 0.0
+    labels = [(f"[{row['Escenario']}] " if show_scenario else '') + f"{row['Actividad']} · {row['Resultado']} ({row['Parametro']})"
+              for _, row in df_top.iterrows()]
+    low = df_top['Valor_Bajo'] / 1e6
+    high = df_top['Valor_Alto'] / 1e6
+    
+    plt.figure(figsize=(12, 8))
+    y_pos = range(len(df_top))
+    plt.barh(y_pos, low - base, left=base, color='#E74C3C', alpha=0.8, label='Variación -')
+    plt.barh(y_pos, high - base, left=base, color='#2ECC71', alpha=0.8, label='Variación +')
+    plt.axvline(x=base, color='black', linestyle='--', alpha=0.5)
+    plt.yticks(list(y_pos), labels, fontsize=8)
+    plt.xlabel('Millones $')
+    plt.title(title)
+    plt.legend()
     plt.tight_layout()
     plt.savefig(outfile, dpi=150)
     plt.close()
 
+@traced()
 def plot_top_combinations(df_sorted: pd.DataFrame, outfile: str):
     """Gráfico de las 10 mejores combinaciones por EV total"""
+    import matplotlib.pyplot as plt
     top_10 = df_sorted.head(10)
     
     plt.figure(figsize=(12, 8))
@@ -506,8 +372,10 @@ def plot_top_combinations(df_sorted: pd.DataFrame, outfile: str):
     plt.savefig(outfile, dpi=150)
     plt.close()
 
+@traced()
 def plot_worst_combinations(df_sorted: pd.DataFrame, outfile: str):
     """Gráfico de las 10 peores combinaciones por EV total"""
+    import matplotlib.pyplot as plt
     worst_10 = df_sorted.tail(10)
     
     plt.figure(figsize=(12, 8))
@@ -543,11 +411,14 @@ def compare_concession_vs_own(activities_concesion: List[Activity], activities_p
     """
     Compara el valor esperado de actividades propias vs concesionadas
     """
+    import pandas as pd
     comparison_data = []
     
-    # Crear diccionarios para acceso rápido por nombre
-    concesion_dict = {act.name: act for act in activities_concesion}
-    propio_dict = {act.name: act for act in activities_propio}
+    # Crear diccionarios para acceso rápido por nombre (EV precalculado en las tablas)
+    table_concesion = activity_table(activities_concesion, discount_rate)
+    table_propio = activity_table(activities_propio, discount_rate)
+    concesion_dict = dict(zip(table_concesion.names, table_concesion.ev.tolist()))
+    propio_dict = dict(zip(table_propio.names, table_propio.ev.tolist()))
     
     # Obtener todos los nombres únicos
     all_names = set(concesion_dict.keys()) | set(propio_dict.keys())
@@ -555,11 +426,8 @@ def compare_concession_vs_own(activities_concesion: List[Activity], activities_p
     for name in all_names:
         if name in concesion_dict and name in propio_dict:
             # Tiene ambas versiones
-            propio = propio_dict[name]
-            concesion = concesion_dict[name]
-            
-            ev_propio = expected_npv(propio, discount_rate)
-            ev_concesion = expected_npv(concesion, discount_rate)
+            ev_propio = propio_dict[name]
+            ev_concesion = concesion_dict[name]
             diferencia = ev_propio - ev_concesion
             
             comparison_data.append({
@@ -573,8 +441,7 @@ def compare_concession_vs_own(activities_concesion: List[Activity], activities_p
             })
         elif name in concesion_dict:
             # Solo tiene versión concesionada
-            concesion = concesion_dict[name]
-            ev_concesion = expected_npv(concesion, discount_rate)
+            ev_concesion = concesion_dict[name]
             comparison_data.append({
                 'Actividad': name,
                 'EV_Propio': 0,
@@ -586,8 +453,7 @@ def compare_concession_vs_own(activities_concesion: List[Activity], activities_p
             })
         elif name in propio_dict:
             # Solo tiene versión propia
-            propio = propio_dict[name]
-            ev_propio = expected_npv(propio, discount_rate)
+            ev_propio = propio_dict[name]
             comparison_data.append({
                 'Actividad': name,
                 'EV_Propio': ev_propio,
@@ -600,8 +466,10 @@ def compare_concession_vs_own(activities_concesion: List[Activity], activities_p
     
     return pd.DataFrame(comparison_data).sort_values('Diferencia_EV', key=abs, ascending=False)
 
+@traced()
 def plot_concession_comparison(df_comparison: pd.DataFrame, outfile: str):
     """Gráfico de comparación entre opciones propias y concesionadas"""
+    import matplotlib.pyplot as plt
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
     
     # Gráfico 1: Comparación de EV
@@ -644,10 +512,43 @@ def plot_concession_comparison(df_comparison: pd.DataFrame, outfile: str):
     plt.savefig(outfile, dpi=150)
     plt.close()
 
+@traced()
+def plot_rate_sweep(sweep: RateSweep, outfile: str):
+    """Curvas de VPN vs tasa de descuento: estrategias y actividades individuales"""
+    import matplotlib.pyplot as plt
+    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(20, 7))
+    rates_pct = sweep.rates * 100
+    
+    # Gráfico 1: VPN total de cada estrategia
+    ax1.plot(rates_pct, sweep.total_concesion / 1e6, label='Concesionar Todo', color='#FF6B6B')
+    ax1.plot(rates_pct, sweep.total_propio / 1e6, label='Administración Propia', color='#4ECDC4')
+    ax1.set_title('VPN Total vs Tasa de Descuento', fontsize=14, fontweight='bold')
+    ax1.set_xlabel('Tasa de descuento (%)')
+    ax1.set_ylabel('VPN Total (Millones $)')
+    ax1.legend()
+    ax1.grid(True, alpha=0.3)
+    
+    # Gráficos 2 y 3: VPN de cada actividad por modalidad
+    for ax, names, ev, title in ((ax2, sweep.names_concesion, sweep.ev_concesion, 'Concesión'),
+                                 (ax3, sweep.names_propio, sweep.ev_propio, 'Administración Propia')):
+        for j, name in enumerate(names):
+            ax.plot(rates_pct, ev[:, j] / 1e6, label=name)
+        ax.axhline(y=0, color='black', linestyle='--', alpha=0.5)
+        ax.set_title(f'VPN por Actividad - {title}', fontsize=14, fontweight='bold')
+        ax.set_xlabel('Tasa de descuento (%)')
+        ax.set_ylabel('VPN (Millones $)')
+        ax.legend(fontsize=7)
+        ax.grid(True, alpha=0.3)
+    
+    plt.tight_layout()
+    plt.savefig(outfile, dpi=150, bbox_inches='tight')
+    plt.close()
+
 def analyze_main_scenarios(df_sorted: pd.DataFrame) -> pd.DataFrame:
     """
     Analiza los dos escenarios principales: todo concesionado vs todo propio
     """
+    import pandas as pd
     # Filtrar combinaciones donde concesionar_todo = 1 (todo concesionado)
     todo_concesionado = df_sorted[df_sorted['concesionar_todo'] == 1]
     
@@ -691,8 +592,10 @@ def analyze_main_scenarios(df_sorted: pd.DataFrame) -> pd.DataFrame:
     
     return pd.DataFrame(scenarios_data)
 
+@traced()
 def plot_main_scenarios(df_scenarios: pd.DataFrame, outfile: str):
     """Gráfico comparativo de los dos escenarios principales"""
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(12, 6))
     
     # Gráfico de barras
@@ -716,17 +619,41 @@ def plot_main_scenarios(df_scenarios: pd.DataFrame, outfile: str):
     plt.savefig(outfile, dpi=150)
     plt.close()
 
-def analyze_scenario(parametros, scenario_name: str, resultados_base: str):
+def artifact_files(files: List[str], compute_only: bool = False) -> List[str]:
+    """Archivos que forman un artefacto; en modo solo cálculo se omiten las figuras"""
+    return [f for f in files if not (compute_only and f.endswith(('.png', '.svg', '.pdf')))]
+
+@traced()
+def analyze_scenario(parametros, scenario_name: str, resultados_base: str,
+                     streaming: bool = False, sorted_output: bool = True,
+                     output_format: str = 'csv', use_cache: bool = True, compute_only: bool = False,
+                     renderer: FigureRenderer = None):
     """
     Analiza un escenario específico usando los parámetros correspondientes
+    
+    Con streaming=True las combinaciones se evalúan por bloques y se agregan
+    directamente a combinaciones_ev.csv (memoria constante); solo las mejores
+    y peores quedan en el DataFrame retornado. sorted_output controla si el
+    CSV en streaming se ordena con un merge externo (solo en formato CSV).
+    output_format: 'csv', 'parquet' o 'feather' para las tablas exportadas.
+    use_cache: reutiliza los artefactos cuyas entradas no cambiaron desde la
+    ejecución anterior (ver cache_resultados).
+    compute_only: solo tablas y resúmenes, sin gráficos (no carga matplotlib ni networkx).
+    renderer: dónde se dibujan las figuras (ver renderizado); por defecto en el
+    acto, en este proceso.
+
+    Retorna (df_sorted, df_tornado, activities, evaluadas): evaluadas es la
+    cantidad de combinaciones evaluadas en esta ejecución (2^n al enumerar,
+    solo las extremas con la búsqueda directa, 0 si vienen de la caché).
     """
+    import pandas as pd
+    phase = phases(escenario=scenario_name)
+    renderer = renderer if renderer is not None else FigureRenderer(max_workers=0, use_cache=use_cache)
     print(f"\n🔍 Analizando escenario: {scenario_name}")
     
     # Cargar actividades desde los parámetros
-    activities = []
-    for a in parametros.activities:
-        outcomes = [ActivityOutcome(**o) for o in a['outcomes']]
-        activities.append(Activity(a['name'], a['decision_key'], a['horizon_years'], outcomes))
+    phase('carga')
+    activities = compile_activities(parametros)
     
     decision_keys = parametros.decision_order
     discount_rate = getattr(parametros, 'discount_rate', 0.12)  # Usar tasa de descuento de parámetros
@@ -740,67 +667,326 @@ def analyze_scenario(parametros, scenario_name: str, resultados_base: str):
         os.makedirs(scenario_dir)
         print(f"   📁 Carpeta creada: {scenario_dir}")
     
-    # 1) EV por actividad
+    cache = ResultCache(scenario_dir, 'escenario', enabled=use_cache)
+    acts_table = activity_table(activities, discount_rate)
+    ext = FORMAT_EXTENSIONS[output_format]
+
+    # 1) EV por actividad (caché por actividad: solo se recalculan las que cambiaron)
+    phase('ev')
     print("   💰 Calculando valor esperado por actividad...")
-    act_ev = {a.decision_key: expected_npv(a, discount_rate) for a in activities}
+    ev = cache.activity_values('ev', acts_table, discount_rate, lambda sub: sub.ev)
+    act_ev = dict(zip(acts_table.decision_keys, ev.tolist()))
     print(f"   ✅ EV calculado para {len(act_ev)} actividades")
     
-    # 2) Enumeración de combinaciones
-    print("   🔢 Generando combinaciones de decisiones...")
-    combos = enumerate_combinations(decision_keys)
-    total_combos = len(combos)
+    # 2) Evaluación de combinaciones
+    phase('combinaciones')
+    total_combos = 2 ** len(decision_keys)
     print(f"   📈 Total de combinaciones: {total_combos:,} (2^{len(decision_keys)})")
-    
-    print("   ⚡ Evaluando combinaciones...")
-    rows = []
-    for i, (bits, mapping) in enumerate(combos):
-        if (i + 1) % 200 == 0 or i == 0:
-            print(f"   📊 Procesando combinación {i+1:,}/{total_combos:,} ({(i+1)/total_combos*100:.1f}%)")
+    ev_vector = keyed_ev_vector(decision_keys, act_ev)
+    
+    # Progreso con límite de frecuencia (y contador de combinaciones evaluadas)
+    report_progress = progress("   📊 Procesando combinación {done:,}/{total:,} ({pct:.1f}%)",
+                               counter='combinaciones_evaluadas')
+    
+    combos_key = cache_key('combinaciones', acts_table, decision_keys, streaming, sorted_output, output_format, TOP_K)
+    combos_files = [f'{scenario_dir}/combinaciones_ev{ext}'] + [
+        f'{scenario_dir}/{name}' for name in (TABLE_MASKS_FILE, TABLE_EV_FILE, TABLE_META_FILE)]
+    combos_reused = len(decision_keys) <= MAX_DECISION_KEYS and cache.fresh('combinaciones', combos_key, combos_files)
+    
+    if combos_reused:
+        # Entradas sin cambios: se reabre la tabla compacta guardada en la ejecución anterior
+        table = open_combination_table(scenario_dir, decision_keys)
+        if streaming:
+            df_sorted = pd.concat([table.head(TOP_K), table.tail(TOP_K)], ignore_index=True)
+        else:
+            df_sorted = table.decode()
+        evaluated = 0
+        print(f"   ♻️ Combinaciones reutilizadas desde la caché ({len(table):,} filas)")
+    elif streaming:
+        # Evaluación en streaming: bloques agregados al CSV, estado acotado en memoria
+        print("   🌊 Evaluando combinaciones en streaming...")
+        table = None  # la tabla compacta la escribe stream_combinations_csv en disco
+        if sorted_output and output_format != 'csv':
+            print(f"   ⚠️  El orden externo solo aplica a CSV: {output_format} se escribe en orden de enumeración")
+        summary = stream_combinations_csv(
+            output_path(f'{scenario_dir}/combinaciones_ev', 'csv'), decision_keys, ev_vector,
+            k=TOP_K, sort=sorted_output and output_format == 'csv', progress=report_progress,
+            table_dir=scenario_dir, fmt=output_format
+        )
+        (top_bits, top_ev), (worst_bits, worst_ev) = summary.extremes()
+        df_sorted = pd.concat([combinations_frame(decision_keys, top_bits, top_ev),
+                               combinations_frame(decision_keys, worst_bits, worst_ev)], ignore_index=True)
+        evaluated = summary.count
+        print(f"   ✅ {summary.count:,} combinaciones evaluadas "
+              f"(EV medio ${summary.ev_mean:,.0f}, mín ${summary.ev_min:,.0f}, máx ${summary.ev_max:,.0f})")
+    elif len(decision_keys) > MAX_FULL_ENUMERATION:
+        # Demasiadas combinaciones para enumerar: búsqueda directa de las mejores y peores
+        print(f"   🎯 Buscando las {TOP_K} mejores y {TOP_K} peores combinaciones (sin enumeración completa)...")
+        df_top, df_worst = top_k_combinations(acts_table, TOP_K, discount_rate, decision_keys)
+        df_sorted = pd.concat([df_top, df_worst], ignore_index=True)
+        evaluated = len(df_sorted)
+        table = None
+        if len(decision_keys) <= MAX_DECISION_KEYS:
+            table = CombinationTable(decision_keys, bits_to_masks(df_sorted[decision_keys].to_numpy()),
+                                     df_sorted['EV_total'].to_numpy())
+        print(f"   ✅ {len(df_sorted)} combinaciones extremas obtenidas")
+    else:
+        # Evaluación vectorizada (máscaras enteras por bloques)
+        print("   ⚡ Evaluando combinaciones...")
+        bits, ev_total = evaluate_combinations(decision_keys, ev_vector, progress=report_progress)
+        evaluated = len(ev_total)
         
-        total_ev = sum(expected_npv(act, discount_rate) for bit, act in zip(bits, activities) if bit == 1)
-        rows.append({
-            **mapping,
-            'EV_total': total_ev
-        })
-    
-    print("   📋 Organizando resultados...")
-    df = pd.DataFrame(rows)
-    df_sorted = df.sort_values('EV_total', ascending=False).reset_index(drop=True)
-    print(f"   ✅ {len(df_sorted)} combinaciones evaluadas y ordenadas")
+        phase('orden')
+        print("   📋 Organizando resultados...")
+        # La fila i corresponde a la máscara i, así que el orden es también la máscara
+        order = pd.Series(ev_total).sort_values(ascending=False).index.to_numpy()
+        table = CombinationTable(decision_keys, order.astype('uint64'), ev_total[order])
+        df_sorted = combinations_frame(decision_keys, bits[order], ev_total[order])
+        del bits
+        print(f"   ✅ {len(df_sorted)} combinaciones evaluadas y ordenadas")
+
+    # Distribución exacta del VPN de las mejores combinaciones
+    phase('distribucion')
+    distribution_key = cache_key('distribucion', combos_key)
+    distribution_files = [f'{scenario_dir}/distribucion_top10{ext}']
+    if cache.fresh('distribucion', distribution_key, distribution_files):
+        print(f"   ♻️ Distribución del VPN de las {TOP_K} mejores combinaciones reutilizada")
+    else:
+        print(f"   📐 Calculando distribución del VPN de las {TOP_K} mejores combinaciones...")
+        df_distribution = top_combinations_distribution(df_sorted.head(TOP_K), activities, discount_rate)
+        best = df_distribution.iloc[0]
+        print(f"   ✅ Mejor combinación: P(pérdida) {best['Prob_Perdida']*100:.1f}%, "
+              f"VaR 95% ${best['VaR_95']:,.0f}, CVaR 95% ${best['CVaR_95']:,.0f}")
+        write_table(df_distribution, f'{scenario_dir}/distribucion_top10', output_format)
+        cache.record('distribucion', distribution_key, distribution_files)
+
+    # Portafolios óptimos con restricciones (presupuesto, capacidad, cupo, obligatorias)
+    phase('portafolios')
+    constraints = constraints_from_parameters(parametros)
+    portfolio_key = cache_key('portafolios', acts_table, [(a.cost, sorted(a.resources.items())) for a in activities],
+                              constraints, TOP_K, output_format)
+    portfolio_files = [f'{scenario_dir}/portafolios_optimos{ext}']
+    if cache.fresh('portafolios', portfolio_key, portfolio_files):
+        print(f"   ♻️ Portafolios óptimos reutilizados ({constraints.describe()})")
+    else:
+        print(f"   🧩 Optimizando portafolios ({constraints.describe()})...")
+        problem = PortfolioProblem(acts_table, constraints, discount_rate)
+        portfolio_bits, portfolio_ev = optimize_portfolios(problem, TOP_K)
+        if len(portfolio_ev) == 0:
+            print("   ⚠️  Ningún portafolio cumple las restricciones")
+        else:
+            chosen = [key for key, bit in zip(problem.keys, portfolio_bits[0]) if bit]
+            print(f"   ✅ Portafolio óptimo: EV ${portfolio_ev[0]:,.0f} ({', '.join(chosen) or 'ninguna actividad'})")
+        if len(problem) <= MAX_BRUTE_FORCE:
+            ok = verify_against_brute_force(problem, TOP_K, (portfolio_bits, portfolio_ev))
+            print(f"   {'✅' if ok else '❌'} Verificación contra enumeración completa "
+                  f"{'correcta' if ok else 'con diferencias'}")
+        write_table(portfolios_frame(problem, portfolio_bits, portfolio_ev), f'{scenario_dir}/portafolios_optimos',
+                    output_format, bool_columns=problem.keys)
+        cache.record('portafolios', portfolio_key, portfolio_files)
 
     # 3) Tornado (impacto marginal)
+    phase('tornado')
     print("   🌪️ Generando análisis tornado...")
-    df_tornado = tornado_data(activities, discount_rate)
-    plot_tornado(df_tornado, f'{scenario_dir}/tornado.png')
-    print(f"   ✅ Gráfico tornado guardado: {scenario_dir}/tornado.png")
+    df_tornado = tornado_data(acts_table, discount_rate)
+    tornado_files = artifact_files([f'{scenario_dir}/tornado.png', f'{scenario_dir}/tornado_data{ext}'], compute_only)
+    tornado_key = cache_key('tornado', acts_table, output_format)
+    if cache.fresh('tornado', tornado_key, tornado_files):
+        print(f"   ♻️ Tornado reutilizado: {', '.join(tornado_files)}")
+    else:
+        if not compute_only:
+            renderer.submit(plot_tornado, f'{scenario_dir}/tornado.png', df_tornado)
+        write_table(df_tornado, f'{scenario_dir}/tornado_data', output_format)
+        cache.record('tornado', tornado_key, tornado_files)
+        print(f"   ✅ Tornado guardado: {', '.join(tornado_files)}")
+    
+    # Tornado paramétrico: ±TORNADO_PERCENT en cada probabilidad y VPN (evaluación en lote)
+    phase('tornado_parametrico')
+    param_key = cache_key('tornado_parametrico', acts_table, TORNADO_PERCENT, scenario_name, output_format)
+    param_files = artifact_files([f'{scenario_dir}/tornado_parametrico.png',
+                                  f'{scenario_dir}/tornado_parametrico{ext}'], compute_only)
+    if cache.fresh('tornado_parametrico', param_key, param_files):
+        print(f"   ♻️ Tornado paramétrico reutilizado")
+    else:
+        # Solo se recalculan las perturbaciones de las actividades que cambiaron
+        width = int(acts_table.n_outcomes.max())
+        packed = cache.activity_values(f'tornado_parametrico_{TORNADO_PERCENT}', acts_table, discount_rate,
+                                       lambda sub: pack_perturbations(sub, discount_rate, TORNADO_PERCENT, width),
+                                       variant=(width,))
+        df_tornado_param = pd.DataFrame(parametric_tornado(acts_table, discount_rate, TORNADO_PERCENT, scenario_name,
+                                                           perturbed=unpack_perturbations(packed, width)))
+        if not compute_only:
+            renderer.submit(plot_parametric_tornado, f'{scenario_dir}/tornado_parametrico.png', df_tornado_param,
+                            title=f'Tornado paramétrico (±{TORNADO_PERCENT*100:.0f}%): VPN del mejor portafolio')
+        write_table(df_tornado_param, f'{scenario_dir}/tornado_parametrico', output_format)
+        cache.record('tornado_parametrico', param_key, param_files)
+        print(f"   ✅ Tornado paramétrico: {len(df_tornado_param)} perturbaciones evaluadas")
 
-    # 4) Árbol de decisión
+    # 4) Árbol de decisión: almacén en arreglos con subárboles compartidos + inducción hacia atrás
+    phase('arbol')
     print("   🌳 Construyendo árbol de decisión...")
-    G = build_decision_tree_graph(activities)
-    print(f"   📊 Nodos en el árbol: {G.number_of_nodes()}")
-    print(f"   🔗 Conexiones en el árbol: {G.number_of_edges()}")
-    plot_tree(G, f'{scenario_dir}/arbol_decision.png')
-    print(f"   ✅ Árbol de decisión guardado: {scenario_dir}/arbol_decision.png")
+    tree = activity_tree(acts_table, discount_rate)
+    tree_result = rollback(tree)
+    print(f"   📊 Nodos en el árbol: {len(tree)} ({tree.path_count():,} caminos lógicos)")
+    print(f"   🔗 Conexiones en el árbol: {tree.n_edges}")
+    print(f"   🎯 EV óptimo (inducción hacia atrás): ${tree_result.value:,.0f}")
+    policy_key = cache_key('politica_optima', acts_table, output_format)
+    policy_files = [f'{scenario_dir}/politica_optima{ext}']
+    if not cache.fresh('politica_optima', policy_key, policy_files):
+        write_table(pd.DataFrame(tree_result.policy()), f'{scenario_dir}/politica_optima', output_format)
+        cache.record('politica_optima', policy_key, policy_files)
+
+    tree_key = cache_key('arbol', acts_table, TREE_MAX_DEPTH, TREE_MIN_MASS)
+    tree_files = [f'{scenario_dir}/arbol_decision.svg']
+    if compute_only:
+        pass  # El árbol solo produce el gráfico
+    elif cache.fresh('arbol', tree_key, tree_files):
+        print(f"   ♻️ Árbol de decisión reutilizado: {tree_files[0]}")
+    else:
+        renderer.submit(render_tree, tree_files[0], tree, result=tree_result,
+                        title=f'Árbol de decisión - {scenario_name}', max_depth=TREE_MAX_DEPTH, min_mass=TREE_MIN_MASS)
+        cache.record('arbol', tree_key, tree_files)
+        tree_layout = layout_tree(tree, TREE_MAX_DEPTH, TREE_MIN_MASS)
+        print(f"   ✅ Árbol de decisión en cola: {tree_files[0]} "
+              f"({len(tree_layout)} nodos dibujados, {int(tree_layout.collapsed.sum())} subárboles colapsados)")
 
     # 5) Exportar resultados a CSV
-    print("   💾 Exportando datos a CSV...")
-    df_sorted.to_csv(f'{scenario_dir}/combinaciones_ev.csv', index=False)
-    df_tornado.to_csv(f'{scenario_dir}/tornado_data.csv', index=False)
-    print(f"   ✅ Archivos CSV exportados")
+    phase('exportacion')
+    if not combos_reused:
+        print(f"   💾 Exportando datos ({output_format})...")
+        if not streaming:
+            write_table(df_sorted, f'{scenario_dir}/combinaciones_ev', output_format, bool_columns=decision_keys)
+            if table is not None:
+                table.save(scenario_dir)
+        if table is not None or streaming:
+            cache.record('combinaciones', combos_key, combos_files)
+        print(f"   ✅ Archivos {output_format} exportados")
 
     # 6) Gráficos de mejores y peores combinaciones
-    print("   📊 Generando gráficos de combinaciones...")
-    plot_top_combinations(df_sorted, f'{scenario_dir}/top_10_combinaciones.png')
-    plot_worst_combinations(df_sorted, f'{scenario_dir}/worst_10_combinaciones.png')
-    print(f"   ✅ Gráficos de combinaciones guardados")
+    phase('graficos')
+    plots_key = cache_key('graficos_combinaciones', combos_key)
+    plot_files = [f'{scenario_dir}/top_10_combinaciones.png', f'{scenario_dir}/worst_10_combinaciones.png']
+    if compute_only:
+        pass
+    elif cache.fresh('graficos_combinaciones', plots_key, plot_files):
+        print("   ♻️ Gráficos de combinaciones reutilizados")
+    else:
+        print("   📊 Generando gráficos de combinaciones...")
+        if streaming or table is not None:
+            # Solo se decodifican las filas que se grafican desde la tabla compacta (memoria mapeada)
+            table = open_combination_table(scenario_dir, decision_keys)
+            df_top, df_worst = table.head(TOP_K), table.tail(TOP_K)
+        else:
+            df_top, df_worst = df_sorted.head(TOP_K), df_sorted.tail(TOP_K)
+        renderer.submit(plot_top_combinations, plot_files[0], df_top)
+        renderer.submit(plot_worst_combinations, plot_files[1], df_worst)
+        cache.record('graficos_combinaciones', plots_key, plot_files)
+        print(f"   ✅ Gráficos de combinaciones guardados")
+
+    cache.save()
+    phase.end()
+    print(f"   🗄️ Caché de resultados: {cache.report()}")
+    
+    return df_sorted, df_tornado, activities, evaluated
+
+def selected_activities(df_sorted: pd.DataFrame, activities: List[Activity], rank: int = 0) -> List[Activity]:
+    """Actividades activadas (=1) en la combinación de posición `rank` de df_sorted"""
+    row = df_sorted.iloc[rank]
+    return [act for act in activities if act.decision_key in row.index and row[act.decision_key] == 1]
+
+def top_combinations_distribution(df_top: pd.DataFrame, activities: List[Activity], discount_rate: float = 0.12) -> pd.DataFrame:
+    """
+    Distribución exacta del VPN (convolución) de cada combinación de df_top:
+    probabilidad de pérdida, cuantiles, VaR y CVaR al 95%
+    """
+    import pandas as pd
+    rows = []
+    for rank in range(len(df_top)):
+        acts = selected_activities(df_top, activities, rank)
+        summary = portfolio_distribution(acts, discount_rate).summary()
+        rows.append({
+            'Ranking': rank + 1,
+            'EV_total': df_top.iloc[rank]['EV_total'],
+            **summary,
+            'Actividades': ', '.join(a.decision_key for a in acts) if acts else 'Ninguna',
+        })
+    return pd.DataFrame(rows)
+
+def simulate_portfolios(portfolios: Dict[str, List[Activity]], discount_rate: float = 0.12,
+                        n_trials: int = MONTECARLO_TRIALS, seed: int = MONTECARLO_SEED,
+                        target_sem: float = None, workers: int = 1) -> pd.DataFrame:
+    """
+    Simula la distribución del VPN de cada portafolio (nombre -> actividades)
+    """
+    import pandas as pd
+    rows = []
+    for name, acts in portfolios.items():
+        result = simulate_portfolio(acts, discount_rate, n_trials=n_trials, seed=seed,
+                                    target_sem=target_sem, workers=workers)
+        summary = result.summary()
+        rows.append({'Portafolio': name, 'Num_Actividades': len(acts), **summary})
+        print(f"   🎲 {name}: VPN medio ${summary['VPN_Medio']:,.0f} "
+              f"(P05 ${summary['P05']:,.0f}, P95 ${summary['P95']:,.0f}, "
+              f"P(pérdida) {summary['Prob_Perdida']*100:.1f}%, {summary['Ensayos']:,} ensayos)")
+    return pd.DataFrame(rows)
+
+def _run_scenario_job(module_name: str, scenario_name: str, resultados_base: str, options: Dict):
+    """
+    Tarea de un proceso del pool: importa el módulo de parámetros y analiza el escenario
+    Retorna (resultado, figuras pendientes, eventos de traza del proceso)
+    """
+    parametros = importlib.import_module(module_name)
+    figures = SpecCollector()
+    result = analyze_scenario(parametros, scenario_name, resultados_base, renderer=figures, **options)
+    return result, figures.specs, TRACER.drain()
+
+def run_scenarios(jobs: List[Tuple[str, str, str]], max_workers: int = None, renderer: FigureRenderer = None,
+                  **options) -> List[Tuple[pd.DataFrame, pd.DataFrame, List[Activity], int]]:
+    """
+    Ejecuta el pipeline completo de analyze_scenario para N escenarios
+    
+    jobs: lista de (nombre del módulo de parámetros, nombre del escenario, carpeta base).
+    Cada escenario corre en su propio proceso (los módulos se importan por nombre
+    en el proceso hijo); con max_workers=1 se ejecutan en secuencia en este proceso.
+    Las figuras de cada escenario se devuelven como especificaciones y se encolan
+    en `renderer` (por defecto se dibujan en el acto, en este proceso).
+    Retorna las tuplas (df_sorted, df_tornado, activities, evaluadas) en el mismo orden de jobs.
+    """
+    if max_workers is None:
+        max_workers = min(len(jobs), os.cpu_count() or 1)
     
-    return df_sorted, df_tornado, activities
+    if max_workers <= 1 or len(jobs) <= 1:
+        outcomes = [_run_scenario_job(module_name, name, base, options) for module_name, name, base in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_run_scenario_job, module_name, name, base, options)
+                       for module_name, name, base in jobs]
+            outcomes = [future.result() for future in futures]
+    renderer = renderer if renderer is not None else FigureRenderer(max_workers=0, use_cache=options.get('use_cache', True))
+    for _, specs, trace in outcomes:
+        TRACER.merge(trace)
+        for spec in specs:
+            renderer.submit_spec(spec)
+    return [result for result, _, _ in outcomes]
 
-def main():
+@traced()
+def main(streaming: bool = False, output_format: str = 'csv', parallel: bool = True, use_cache: bool = True,
+         compute_only: bool = False, render_workers: int = None, montecarlo_trials: int = None):
+    """
+    render_workers: procesos del pool de dibujo (por defecto, los núcleos
+    disponibles; 0 = dibuja en el proceso principal). Las figuras se dibujan
+    mientras sigue el cálculo y se esperan todas al final.
+    montecarlo_trials: ensayos de la simulación Monte Carlo (por defecto
+    MONTECARLO_TRIALS, o MONTECARLO_TRIALS_COMPUTE_ONLY en modo solo cálculo).
+    """
+    import pandas as pd
+    phase = phases()
+    renderer = FigureRenderer(render_workers, use_cache=use_cache)
     print("🚀 Iniciando análisis de árbol de decisiones...")
     start_time = time.time()
     
     # Verificar cálculos
+    phase('verificacion')
     verify_calculation_example()
     
     # Verificar probabilidades
@@ -809,48 +995,155 @@ def main():
     print("\n🔍 Verificando parámetros de administración propia...")
     verify_probabilities(P_PROPIO)
     
-    # Analizar escenario de CONCESIÓN
-    df_concesion, df_tornado_concesion, activities_concesion = analyze_scenario(
-        P_CONCESION, "concesion", "resultados"
-    )
-    
-    # Analizar escenario de ADMINISTRACIÓN PROPIA
-    df_propio, df_tornado_propio, activities_propio = analyze_scenario(
-        P_PROPIO, "administracion-propia", "resultados"
-    )
+    # Analizar escenarios de CONCESIÓN y ADMINISTRACIÓN PROPIA (en procesos separados si parallel=True)
+    phase('escenarios')
+    (df_concesion, df_tornado_concesion, activities_concesion, _), \
+        (df_propio, df_tornado_propio, activities_propio, _) = run_scenarios(
+            [(P_CONCESION.__name__, "concesion", "resultados"),
+             (P_PROPIO.__name__, "administracion-propia", "resultados")],
+            max_workers=None if parallel else 1, renderer=renderer,
+            streaming=streaming, output_format=output_format, use_cache=use_cache,
+            compute_only=compute_only
+        )
     
     # Análisis comparativo entre ambos escenarios
+    phase('comparacion')
     print("\n⚖️ Generando análisis comparativo...")
     discount_rate = getattr(P_CONCESION, 'discount_rate', 0.12)  # Usar tasa de descuento
-    df_comparison = compare_concession_vs_own(activities_concesion, activities_propio, discount_rate)
+    # Tablas compiladas una sola vez; todas las etapas siguientes leen de ellas
+    table_concesion = activity_table(activities_concesion, discount_rate)
+    table_propio = activity_table(activities_propio, discount_rate)
+    df_comparison = compare_concession_vs_own(table_concesion, table_propio, discount_rate)
+    
+    # Caché de los artefactos comparativos (manifiesto propio, separado del de cada escenario)
+    ext = FORMAT_EXTENSIONS[output_format]
+    cache_concesion = ResultCache('resultados-concesion', 'comparacion', enabled=use_cache)
+    cache_propio = ResultCache('resultados-administracion-propia', 'comparacion', enabled=use_cache)
+    both_key = cache_key('ambos_escenarios', table_concesion, table_propio, output_format)
     
     # Guardar análisis comparativo en carpeta de concesión
-    plot_concession_comparison(df_comparison, f'resultados-concesion/comparacion_concesion_vs_propio.png')
-    df_comparison.to_csv(f'resultados-concesion/comparacion_concesion_vs_propio.csv', index=False)
-    print(f"   ✅ Análisis comparativo guardado en resultados-concesion/")
+    files = artifact_files(['resultados-concesion/comparacion_concesion_vs_propio.png', f'resultados-concesion/comparacion_concesion_vs_propio{ext}'], compute_only)
+    if cache_concesion.fresh('comparacion', both_key, files):
+        print(f"   ♻️ Análisis comparativo reutilizado en resultados-concesion/")
+    else:
+        if not compute_only:
+            renderer.submit(plot_concession_comparison, 'resultados-concesion/comparacion_concesion_vs_propio.png',
+                            df_comparison)
+        write_table(df_comparison, 'resultados-concesion/comparacion_concesion_vs_propio', output_format)
+        cache_concesion.record('comparacion', both_key, files)
+        print(f"   ✅ Análisis comparativo guardado en resultados-concesion/")
+    
+    # Tornado paramétrico sobre la diferencia Propio - Concesión
+    phase('tornado_diferencia')
+    key = cache_key('tornado_parametrico_diferencia', both_key, TORNADO_PERCENT)
+    files = artifact_files(['resultados-concesion/tornado_parametrico_diferencia.png', f'resultados-concesion/tornado_parametrico_diferencia{ext}'], compute_only)
+    if cache_concesion.fresh('tornado_parametrico_diferencia', key, files):
+        print(f"   ♻️ Tornado paramétrico de la diferencia reutilizado en resultados-concesion/")
+    else:
+        df_tornado_diff = pd.DataFrame(parametric_tornado_difference(table_concesion, table_propio,
+                                                                     discount_rate, TORNADO_PERCENT))
+        if not compute_only:
+            renderer.submit(plot_parametric_tornado, 'resultados-concesion/tornado_parametrico_diferencia.png',
+                            df_tornado_diff,
+                            title=f'Tornado paramétrico (±{TORNADO_PERCENT*100:.0f}%): ventaja Administración Propia',
+                            show_scenario=True)
+        write_table(df_tornado_diff, 'resultados-concesion/tornado_parametrico_diferencia', output_format)
+        cache_concesion.record('tornado_parametrico_diferencia', key, files)
+        print(f"   ✅ Tornado paramétrico de la diferencia guardado en resultados-concesion/")
+    
+    # Barrido de tasa de descuento (una sola pasada vectorizada)
+    phase('barrido_tasas')
+    print("\n📉 Generando barrido de tasa de descuento...")
+    sweep = sweep_discount_rates(table_concesion, table_propio, SWEEP_RATES)
+    df_sweep = pd.DataFrame(sweep.summary_rows())
+    df_flips = pd.DataFrame(sweep.flip_rows(), columns=['Tipo', 'Escenario', 'Actividad', 'Tasa_Cambio', 'Antes', 'Despues'])
+    key = cache_key('barrido_tasas', both_key, SWEEP_RATES)
+    files = artifact_files(['resultados-concesion/vpn_vs_tasa.png', f'resultados-concesion/barrido_tasas{ext}',
+                            f'resultados-concesion/cambios_recomendacion{ext}'], compute_only)
+    if not cache_concesion.fresh('barrido_tasas', key, files):
+        if not compute_only:
+            renderer.submit(plot_rate_sweep, 'resultados-concesion/vpn_vs_tasa.png', sweep)
+        write_table(df_sweep, 'resultados-concesion/barrido_tasas', output_format)
+        write_table(df_flips, 'resultados-concesion/cambios_recomendacion', output_format)
+        cache_concesion.record('barrido_tasas', key, files)
+    for _, flip in df_flips.iterrows():
+        target = flip['Actividad'] or flip['Escenario']
+        print(f"   🔄 {target}: {flip['Antes']} → {flip['Despues']} a una tasa de {flip['Tasa_Cambio']*100:.2f}%")
+    print(f"   ✅ Barrido de {len(SWEEP_RATES)} tasas guardado en resultados-concesion/")
     
     # NUEVO: Análisis de decisión principal
+    phase('decision_principal')
     print("\n🎯 Generando análisis de decisión principal...")
-    df_main_decision = analyze_main_decision(activities_concesion, activities_propio, discount_rate)
-    plot_main_decision_analysis(df_main_decision, f'resultados-concesion/decision_principal.png')
-    df_main_decision.to_csv(f'resultados-concesion/decision_principal.csv', index=False)
-    print(f"   ✅ Análisis de decisión principal guardado en resultados-concesion/")
-    
+    report = build_report(table_concesion, table_propio, discount_rate)
+    df_main_decision = analyze_main_decision(report)
+    files = artifact_files(['resultados-concesion/decision_principal.png', f'resultados-concesion/decision_principal{ext}'], compute_only)
+    if cache_concesion.fresh('decision_principal', both_key, files):
+        print(f"   ♻️ Análisis de decisión principal reutilizado en resultados-concesion/")
+    else:
+        if not compute_only:
+            renderer.submit(plot_main_decision_analysis, 'resultados-concesion/decision_principal.png', df_main_decision)
+        write_table(df_main_decision, 'resultados-concesion/decision_principal', output_format)
+        cache_concesion.record('decision_principal', both_key, files)
+        print(f"   ✅ Análisis de decisión principal guardado en resultados-concesion/")
+    
+    # Modelo combinado: cada actividad propia, concesionada o ninguna (grupos mutuamente excluyentes)
+    phase('modelo_combinado')
+    print("\n🧮 Generando modelo combinado (propio / concesión / ninguna por actividad)...")
+    model = combined_model({'propio': table_propio, 'concesion': table_concesion}, discount_rate,
+                           {'propio': 'Propio', 'concesion': 'Concesión'})
+    print(f"   📊 Asignaciones factibles: {model.count:,} (en vez de {model.binary_count:,} combinaciones binarias)")
+    key = cache_key('modelo_combinado', both_key, TOP_K)
+    files = [f'resultados-concesion/modelo_combinado{ext}']
+    if cache_concesion.fresh('modelo_combinado', key, files):
+        print(f"   ♻️ Modelo combinado reutilizado en resultados-concesion/")
+    else:
+        if model.count <= 2 ** MAX_FULL_ENUMERATION:
+            choices, ev_combined = evaluate_assignments(model)
+            order = pd.Series(ev_combined).sort_values(ascending=False).index.to_numpy()
+            df_combined = assignments_frame(model, choices[order], ev_combined[order])
+        else:
+            # Demasiadas asignaciones: solo las TOP_K mejores y peores
+            df_combined = pd.concat([assignments_frame(model, *k_best_assignments(model, TOP_K)),
+                                     assignments_frame(model, *k_best_assignments(model, TOP_K, worst=True))],
+                                    ignore_index=True)
+        write_table(df_combined, 'resultados-concesion/modelo_combinado', output_format)
+        cache_concesion.record('modelo_combinado', key, files)
+        best = df_combined.iloc[0]
+        print(f"   ✅ Mejor asignación: EV ${best['EV_total']:,.0f} "
+              f"({', '.join(f'{g}: {best[g]}' for g in model.groups if best[g] != NONE_LABEL) or 'ninguna actividad'})")
+        print(f"   ✅ Modelo combinado guardado en resultados-concesion/")
+
     # NUEVO: Análisis de decisiones individuales - Concesión
+    phase('decisiones_individuales')
     print("\n🔍 Generando análisis de decisiones individuales - Concesión...")
-    df_individual_concesion = analyze_individual_decisions(activities_concesion, discount_rate)
-    plot_individual_decisions(df_individual_concesion, f'resultados-concesion/decisiones_individuales_concesion.png')
-    df_individual_concesion.to_csv(f'resultados-concesion/decisiones_individuales_concesion.csv', index=False)
+    df_individual_concesion = analyze_individual_decisions(report.concesion)
+    key = cache_key('decisiones_individuales', table_concesion, output_format)
+    files = artifact_files(['resultados-concesion/decisiones_individuales_concesion.png',
+                            f'resultados-concesion/decisiones_individuales_concesion{ext}'], compute_only)
+    if not cache_concesion.fresh('decisiones_individuales_concesion', key, files):
+        if not compute_only:
+            renderer.submit(plot_individual_decisions, 'resultados-concesion/decisiones_individuales_concesion.png',
+                            df_individual_concesion)
+        write_table(df_individual_concesion, 'resultados-concesion/decisiones_individuales_concesion', output_format)
+        cache_concesion.record('decisiones_individuales_concesion', key, files)
     print(f"   ✅ Análisis de decisiones individuales (Concesión) guardado en resultados-concesion/")
     
     # NUEVO: Análisis de decisiones individuales - Administración Propia
     print("\n🔍 Generando análisis de decisiones individuales - Administración Propia...")
-    df_individual_propio = analyze_individual_decisions(activities_propio, discount_rate)
-    plot_individual_decisions(df_individual_propio, f'resultados-administracion-propia/decisiones_individuales_propio.png')
-    df_individual_propio.to_csv(f'resultados-administracion-propia/decisiones_individuales_propio.csv', index=False)
+    df_individual_propio = analyze_individual_decisions(report.propio)
+    key = cache_key('decisiones_individuales', table_propio, output_format)
+    files = artifact_files(['resultados-administracion-propia/decisiones_individuales_propio.png',
+                            f'resultados-administracion-propia/decisiones_individuales_propio{ext}'], compute_only)
+    if not cache_propio.fresh('decisiones_individuales_propio', key, files):
+        if not compute_only:
+            renderer.submit(plot_individual_decisions,
+                            'resultados-administracion-propia/decisiones_individuales_propio.png', df_individual_propio)
+        write_table(df_individual_propio, 'resultados-administracion-propia/decisiones_individuales_propio', output_format)
+        cache_propio.record('decisiones_individuales_propio', key, files)
     print(f"   ✅ Análisis de decisiones individuales (Administración Propia) guardado en resultados-administracion-propia/")
     
     # Crear resumen de escenarios principales
+    phase('escenarios_principales')
     print("🎯 Generando resumen de escenarios principales...")
     scenarios_data = []
     
@@ -877,27 +1170,71 @@ def main():
         })
     
     df_scenarios = pd.DataFrame(scenarios_data)
-    plot_main_scenarios(df_scenarios, f'resultados-concesion/escenarios_principales.png')
-    df_scenarios.to_csv(f'resultados-concesion/escenarios_principales.csv', index=False)
+    key = cache_key('escenarios_principales', scenarios_data, output_format)
+    files = artifact_files(['resultados-concesion/escenarios_principales.png', f'resultados-concesion/escenarios_principales{ext}'], compute_only)
+    if not cache_concesion.fresh('escenarios_principales', key, files):
+        if not compute_only:
+            renderer.submit(plot_main_scenarios, 'resultados-concesion/escenarios_principales.png', df_scenarios)
+        write_table(df_scenarios, 'resultados-concesion/escenarios_principales', output_format)
+        cache_concesion.record('escenarios_principales', key, files)
     print(f"   ✅ Resumen de escenarios guardado en resultados-concesion/")
     
+    # Distribución del VPN (Monte Carlo) de las mejores combinaciones y de las dos estrategias
+    phase('montecarlo')
+    print("\n🎲 Simulando distribución del VPN (Monte Carlo)...")
+    portfolios = {
+        'Mejor Combinación - Concesión': selected_activities(df_concesion, activities_concesion),
+        'Mejor Combinación - Administración Propia': selected_activities(df_propio, activities_propio),
+        'Concesionar Todo': activities_concesion,
+        'Administración Propia': activities_propio,
+    }
+    if montecarlo_trials is None:
+        montecarlo_trials = MONTECARLO_TRIALS_COMPUTE_ONLY if compute_only else MONTECARLO_TRIALS
+    key = cache_key('montecarlo', portfolios, discount_rate, montecarlo_trials, MONTECARLO_SEED, output_format)
+    files = [f'resultados-concesion/montecarlo_portafolios{ext}']
+    if cache_concesion.fresh('montecarlo', key, files):
+        print(f"   ♻️ Simulación Monte Carlo reutilizada en resultados-concesion/")
+    else:
+        df_montecarlo = simulate_portfolios(portfolios, discount_rate, n_trials=montecarlo_trials)
+        write_table(df_montecarlo, 'resultados-concesion/montecarlo_portafolios', output_format)
+        cache_concesion.record('montecarlo', key, files)
+        print(f"   ✅ Simulación Monte Carlo guardada en resultados-concesion/")
+    cache_concesion.save()
+    cache_propio.save()
+    print(f"   🗄️ Caché de resultados (comparación): {cache_concesion.report()}")
+    
     # NUEVO: Resumen ejecutivo con recomendaciones
+    phase('resumen_ejecutivo')
     print("\n📋 Generando resumen ejecutivo...")
-    generate_executive_summary(activities_concesion, activities_propio, discount_rate)
+    generate_executive_summary(report)
     print(f"   ✅ Resumen ejecutivo generado")
 
+    # Figuras: se esperan una sola vez, al final del cálculo
+    phase('graficos')
+    if not compute_only:
+        print("\n🖼️ Esperando las figuras...")
+        renderer.wait()
+        print(f"   ✅ {renderer.rendered} figuras dibujadas en {renderer.seconds:.1f} s "
+              f"({renderer.max_workers or 'sin'} procesos de dibujo)")
+        if renderer.cache.hits + renderer.cache.misses:
+            print(f"   🗄️ Caché de figuras: {renderer.cache.report()}")
+        else:
+            # Los artefactos vinieron de la caché de resultados, que ni siquiera pide sus figuras
+            print("   🗄️ Caché de figuras: sin consultas (artefactos reutilizados desde la caché de resultados)")
+    phase.end()
+
     # Imprimir resumen de resultados
     print('\n' + '='*60)
     print('📊 RESUMEN DE RESULTADOS')
     print('='*60)
     
     print('\n=== EV por actividad - CONCESIÓN ===')
-    for a in activities_concesion:
-        print(f"- {a.name}: EV = {expected_npv(a, discount_rate):,.0f} (horizonte {a.horizon_years} años)")
+    for a, ev in zip(table_concesion.activities, table_concesion.ev.tolist()):
+        print(f"- {a.name}: EV = {ev:,.0f} (horizonte {a.horizon_years} años)")
 
     print('\n=== EV por actividad - ADMINISTRACIÓN PROPIA ===')
-    for a in activities_propio:
-        print(f"- {a.name}: EV = {expected_npv(a, discount_rate):,.0f} (horizonte {a.horizon_years} años)")
+    for a, ev in zip(table_propio.activities, table_propio.ev.tolist()):
+        print(f"- {a.name}: EV = {ev:,.0f} (horizonte {a.horizon_years} años)")
 
     print('\n=== Top 5 combinaciones - CONCESIÓN ===')
     print(df_concesion.head(5)[['EV_total'] + [col for col in df_concesion.columns if col != 'EV_total']].to_string(index=False))
@@ -915,46 +1252,69 @@ def main():
     end_time = time.time()
     total_time = end_time - start_time
     
+    ext = FORMAT_EXTENSIONS[output_format]
+    outputs = {
+        'resultados-concesion': artifact_files([
+            f'combinaciones_ev{ext}', 'tornado.png', f'tornado_data{ext}', 'tornado_parametrico.png',
+            f'tornado_parametrico{ext}', f'distribucion_top10{ext}', f'portafolios_optimos{ext}', f'politica_optima{ext}', 'arbol_decision.svg',
+            'top_10_combinaciones.png', 'worst_10_combinaciones.png', 'comparacion_concesion_vs_propio.png',
+            f'comparacion_concesion_vs_propio{ext}', 'tornado_parametrico_diferencia.png',
+            f'tornado_parametrico_diferencia{ext}', 'vpn_vs_tasa.png', f'barrido_tasas{ext}',
+            f'cambios_recomendacion{ext}', 'escenarios_principales.png', f'escenarios_principales{ext}',
+            f'montecarlo_portafolios{ext}', 'decision_principal.png', f'decision_principal{ext}',
+            f'modelo_combinado{ext}',
+            'decisiones_individuales_concesion.png', f'decisiones_individuales_concesion{ext}',
+        ] + [f'resumen_ejecutivo.{fmt}' for fmt in REPORT_FORMATS], compute_only),
+        'resultados-administracion-propia': artifact_files([
+            f'combinaciones_ev{ext}', 'tornado.png', f'tornado_data{ext}', 'tornado_parametrico.png',
+            f'tornado_parametrico{ext}', f'distribucion_top10{ext}', f'portafolios_optimos{ext}', f'politica_optima{ext}', 'arbol_decision.svg',
+            'top_10_combinaciones.png', 'worst_10_combinaciones.png', 'decisiones_individuales_propio.png',
+            f'decisiones_individuales_propio{ext}',
+        ], compute_only),
+    }
+    
     print(f"\n🎉 ¡Análisis completado exitosamente!")
     print(f"⏱️  Tiempo total: {total_time:.1f} segundos")
+    print(f"⏱️  Tiempo de importación: {IMPORT_SECONDS:.2f} segundos "
+          f"(módulos pesados cargados: {', '.join(m for m in HEAVY_MODULES if m in sys.modules) or 'ninguno'})")
+    if compute_only:
+        print("🧮 Modo solo cálculo: no se generaron gráficos")
     print(f"📊 Combinaciones concesión: {len(df_concesion):,}")
     print(f"📊 Combinaciones administración propia: {len(df_propio):,}")
-    print(f"📁 Archivos generados: 21")
+    print(f"📁 Archivos generados: {sum(len(files) for files in outputs.values())}")
     
     print('\n📋 Archivos generados:')
-    print(f'\n📁 Carpeta "resultados-concesion":')
-    print(f' - combinaciones_ev.csv')
-    print(f' - tornado.png')
-    print(f' - tornado_data.csv')
-    print(f' - arbol_decision.png')
-    print(f' - top_10_combinaciones.png')
-    print(f' - worst_10_combinaciones.png')
-    print(f' - comparacion_concesion_vs_propio.png')
-    print(f' - comparacion_concesion_vs_propio.csv')
-    print(f' - escenarios_principales.png')
-    print(f' - escenarios_principales.csv')
-    print(f' - decision_principal.png')
-    print(f' - decision_principal.csv')
-    print(f' - decisiones_individuales_concesion.png')
-    print(f' - decisiones_individuales_concesion.csv')
-    print(f' - resumen_ejecutivo.txt')
-    
-    print(f'\n📁 Carpeta "resultados-administracion-propia":')
-    print(f' - combinaciones_ev.csv')
-    print(f' - tornado.png')
-    print(f' - tornado_data.csv')
-    print(f' - arbol_decision.png')
-    print(f' - top_10_combinaciones.png')
-    print(f' - worst_10_combinaciones.png')
-    print(f' - decisiones_individuales_propio.png')
-    print(f' - decisiones_individuales_propio.csv')
+    for folder, files in outputs.items():
+        print(f'\n📁 Carpeta "{folder}":')
+        for name in files:
+            print(f' - {name}')
+
+    print('\n⏱️  Etapas más lentas:')
+    for row in TRACER.summary()[:TOP_SPANS]:
+        print(f"   {row['tramo']}: {row['segundos']:.2f} s ({row['llamadas']} llamadas)")
+    counters = TRACER.counters
+    print(f"   📊 Combinaciones evaluadas: {int(counters.get('combinaciones_evaluadas', 0)):,} · "
+          f"bytes escritos: {int(counters.get('bytes_escritos', 0)):,}")
 
+@traced()
 def create_parameters_excel():
     """
     Crea un archivo Excel con todos los parámetros de ambos escenarios
+    con la tasa de descuento en cada fila (se puede volver a cargar con
+    escenarios.load_scenarios sin caer en la tasa por defecto)
     """
+    import pandas as pd
     print("\n📊 CREANDO ARCHIVO EXCEL CON PARÁMETROS...")
     
+    # Se reutiliza el Excel si los parámetros de ambos escenarios no cambiaron
+    excel_file = 'parametros_completos.xlsx'
+    cache = ResultCache('resultados-concesion', 'excel')
+    key = cache_key('parametros_excel', P_PROPIO.activities, P_CONCESION.activities,
+                    P_PROPIO.discount_rate, P_CONCESION.discount_rate)
+    if cache.fresh('parametros_excel', key, [excel_file]):
+        print(f"♻️ Archivo Excel reutilizado (parámetros sin cambios): {excel_file}")
+        return excel_file
+    
     # Lista para almacenar todos los datos
     all_data = []
     
@@ -965,11 +1325,13 @@ def create_parameters_excel():
             all_data.append({
                 'escenario': 'Administración Propia',
                 'actividad': activity['name'],
+                'decision_key': activity['decision_key'],
                 'caso': caso,
                 'label': outcome['label'],
                 'prob': outcome['prob'],
                 'npv': outcome['npv'],
-                'horizon_years': activity['horizon_years']
+                'horizon_years': activity['horizon_years'],
+                'discount_rate': P_PROPIO.discount_rate
             })
     
     # Procesar concesión
@@ -979,18 +1341,19 @@ def create_parameters_excel():
             all_data.append({
                 'escenario': 'Concesión',
                 'actividad': activity['name'],
+                'decision_key': activity['decision_key'],
                 'caso': caso,
                 'label': outcome['label'],
                 'prob': outcome['prob'],
                 'npv': outcome['npv'],
-                'horizon_years': activity['horizon_years']
+                'horizon_years': activity['horizon_years'],
+                'discount_rate': P_CONCESION.discount_rate
             })
     
     # Crear DataFrame
     df = pd.DataFrame(all_data)
     
     # Guardar en Excel
-    excel_file = 'parametros_completos.xlsx'
     with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
         # Hoja principal con todos los datos
         df.to_excel(writer, sheet_name='Todos_Parametros', index=False)
@@ -1009,7 +1372,33 @@ def create_parameters_excel():
     print(f"   📋 Hojas: Todos_Parametros, Administracion_Propia, Concesion")
     print(f"   📊 Total de registros: {len(df)}")
     
+    cache.record('parametros_excel', key, [excel_file])
+    cache.save()
     return excel_file
 
 if __name__ == '__main__':
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Análisis de árbol de decisiones: concesión vs administración propia')
+    parser.add_argument('--solo-calculo', action='store_true',
+                        help='solo tablas y resúmenes, sin gráficos (no carga matplotlib ni networkx)')
+    parser.add_argument('--formato', choices=list(FORMAT_EXTENSIONS), default='csv', help='formato de las tablas')
+    parser.add_argument('--streaming', action='store_true', help='evalúa las combinaciones en streaming')
+    parser.add_argument('--secuencial', action='store_true', help='analiza los escenarios en este proceso')
+    parser.add_argument('--sin-cache', action='store_true', help='recalcula todos los artefactos')
+    parser.add_argument('--procesos-graficos', type=int,
+                        help='procesos de dibujo (0 = en el proceso principal; por defecto, los núcleos)')
+    parser.add_argument('--ensayos', type=int,
+                        help=f'ensayos Monte Carlo (por defecto {MONTECARLO_TRIALS:,}; '
+                             f'{MONTECARLO_TRIALS_COMPUTE_ONLY:,} con --solo-calculo)')
+    parser.add_argument('--traza', metavar='ARCHIVO',
+                        help='exporta tramos y contadores (JSON; formato Chrome si termina en .trace.json)')
+    args = parser.parse_args()
+    if args.ensayos is not None and args.ensayos < 1:
+        parser.error(f'--ensayos debe ser al menos 1 (se indicó {args.ensayos})')
+    main(streaming=args.streaming, output_format=args.formato, parallel=not args.secuencial,
+         use_cache=not args.sin_cache, compute_only=args.solo_calculo, render_workers=args.procesos_graficos,
+         montecarlo_trials=args.ensayos)
+    trace_file = export_from_env(args.traza)
+    if trace_file:
+        print(f"🧭 Traza guardada en: {trace_file}")
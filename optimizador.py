@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Optimización de portafolios con restricciones.
+
+Sin restricciones el mejor portafolio es trivial (toda actividad con EV > 0);
+con restricciones reales deja de serlo. Cada actividad puede declarar en los
+módulos de parámetros campos opcionales:
+
+    "cost": inversión inicial ($)
+    "resources": {"personal": 3, ...}   consumo de recursos con capacidad limitada
+
+y el módulo de parámetros puede definir (todos opcionales):
+
+    budget = 250_000_000               presupuesto total para los costos
+    capacity = {"personal": 12}        capacidad de cada recurso
+    max_activities = 5                 a lo más K actividades (p. ej. K concesiones)
+    required_activities = ["trekking"] actividades que deben estar en el portafolio
+
+`optimize_portfolios` resuelve el problema (mochila multidimensional 0/1)
+con ramificación y acotamiento: las actividades se recorren por EV
+decreciente y cada rama se poda si su cota superior de EV no alcanza al
+k-ésimo mejor portafolio factible ya encontrado. La cota es el mínimo entre
+la suma de los EV positivos restantes, los mejores EV restantes que caben en
+el cupo de actividades y la mochila fraccionaria de cada restricción.
+Retorna el óptimo y los k mejores portafolios factibles.
+
+`brute_force_portfolios` enumera las 2^n combinaciones (solo para n chico) y
+sirve de referencia para verificar el resultado.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import heapq
+
+import numpy as np
+
+from combinaciones import evaluate_bits, iter_mask_blocks, masks_to_bits
+from tabla_actividades import activity_table
+
+# Sobre este número de actividades no se enumera para verificar
+MAX_BRUTE_FORCE = 22
+
+# Nombre de la fila de costos en la matriz de consumos
+COST_ROW = 'costo'
+
+
+@dataclass
+class PortfolioConstraints:
+    budget: Optional[float] = None
+    capacity: Dict[str, float] = field(default_factory=dict)
+    max_activities: Optional[int] = None
+    required: List[str] = field(default_factory=list)
+
+    @property
+    def active(self) -> bool:
+        return (self.budget is not None or bool(self.capacity) or self.max_activities is not None
+                or bool(self.required))
+
+    def describe(self) -> str:
+        parts = []
+        if self.budget is not None:
+            parts.append(f"presupuesto ${self.budget:,.0f}")
+        parts.extend(f"{name} ≤ {limit:,.0f}" for name, limit in sorted(self.capacity.items()))
+        if self.max_activities is not None:
+            parts.append(f"a lo más {self.max_activities} actividades")
+        if self.required:
+            parts.append(f"obligatorias: {', '.join(self.required)}")
+        return '; '.join(parts) if parts else 'sin restricciones'
+
+
+def constraints_from_parameters(parametros) -> PortfolioConstraints:
+    """Lee las restricciones opcionales de un módulo de parámetros"""
+    return PortfolioConstraints(
+        budget=getattr(parametros, 'budget', None),
+        capacity=dict(getattr(parametros, 'capacity', {}) or {}),
+        max_activities=getattr(parametros, 'max_activities', None),
+        required=list(getattr(parametros, 'required_activities', []) or []),
+    )
+
+
+class PortfolioProblem:
+    """
+    Problema compilado: EV por actividad, matriz de consumos (restricciones x
+    actividades) con sus límites y máscara de actividades obligatorias
+    """
+
+    def __init__(self, activities, constraints: PortfolioConstraints, discount_rate: float = 0.12):
+        table = activity_table(activities, discount_rate)
+        self.keys: List[str] = table.decision_keys
+        self.ev = table.ev.copy()
+        self.constraints = constraints
+
+        rows, limits, names = [], [], []
+        if constraints.budget is not None:
+            rows.append([float(getattr(a, 'cost', 0.0)) for a in table.activities])
+            limits.append(float(constraints.budget))
+            names.append(COST_ROW)
+        for resource, limit in sorted(constraints.capacity.items()):
+            rows.append([float(getattr(a, 'resources', {}).get(resource, 0.0)) for a in table.activities])
+            limits.append(float(limit))
+            names.append(resource)
+        # Fila del cupo de actividades (-1 si no hay): su cota se calcula aparte
+        self.cardinality_row = -1
+        if constraints.max_activities is not None:
+            self.cardinality_row = len(rows)
+            rows.append([1.0] * len(table))
+            limits.append(float(constraints.max_activities))
+            names.append('actividades')
+        self.weights = np.array(rows, dtype=np.float64).reshape(len(rows), len(table))
+        self.limits = np.array(limits, dtype=np.float64)
+        self.row_names = names
+        if (self.weights < 0).any():
+            raise ValueError("Los costos y consumos de recursos deben ser no negativos")
+
+        unknown = [key for key in constraints.required if key not in self.keys]
+        if unknown:
+            raise ValueError(f"Actividades obligatorias desconocidas: {unknown}")
+        self.required = np.zeros(len(table), dtype=bool)
+        self.required[[table.index_of(key) for key in constraints.required]] = True
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def usage(self, bits: np.ndarray) -> np.ndarray:
+        """Consumo de cada restricción por portafolio (filas = portafolios)"""
+        return bits.astype(np.float64) @ self.weights.T
+
+    def feasible(self, bits: np.ndarray) -> np.ndarray:
+        bits = np.atleast_2d(bits)
+        ok = (self.usage(bits) <= self.limits + 1e-9 * np.maximum(np.abs(self.limits), 1.0)).all(axis=1)
+        return ok & (bits[:, self.required] == 1).all(axis=1)
+
+
+def _ranked(problem: PortfolioProblem, bits: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Ordena por EV decreciente (empates: orden de enumeración) y deja los k primeros"""
+    ev_total = evaluate_bits(bits, problem.ev)
+    masks = [int(''.join(map(str, row)), 2) if len(row) else 0 for row in bits.tolist()]
+    order = sorted(range(len(bits)), key=lambda i: (-ev_total[i], masks[i]))[:k]
+    return bits[order], ev_total[order]
+
+
+def optimize_portfolios(problem: PortfolioProblem, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Los k mejores portafolios factibles por ramificación y acotamiento
+    Retorna (bits, EV_total) con las columnas en el orden de problem.keys
+    """
+    n, m = len(problem), len(problem.limits)
+    if k <= 0:
+        return np.empty((0, n), dtype=np.int8), np.empty(0)
+
+    # Obligatorias fijas; el resto se recorre por EV decreciente (cotas más ajustadas)
+    forced = np.nonzero(problem.required)[0]
+    free = [int(i) for i in np.argsort(-problem.ev, kind='stable') if not problem.required[i]]
+    ev = problem.ev[free].tolist()
+    weights = problem.weights[:, free].T.tolist()
+    remaining0 = (problem.limits - problem.weights[:, forced].sum(axis=1)).tolist()
+    base_ev = float(problem.ev[forced].sum())
+    if any(r < 0 for r in remaining0):
+        return np.empty((0, n), dtype=np.int8), np.empty(0)
+
+    n_free = len(free)
+    positive = [max(v, 0.0) for v in ev]
+    # suffix[i] = suma de EV positivos desde i; cum[i] = suma de los primeros i EV positivos
+    suffix = [0.0] * (n_free + 1)
+    for i in range(n_free - 1, -1, -1):
+        suffix[i] = suffix[i + 1] + positive[i]
+    cum = [0.0] * (n_free + 1)
+    for i in range(n_free):
+        cum[i + 1] = cum[i] + positive[i]
+    n_positive = sum(v > 0 for v in ev)
+    card_row = problem.cardinality_row
+    # Por restricción: actividades con EV positivo ordenadas por EV / consumo (mochila fraccionaria)
+    by_ratio = [sorted((i for i in range(n_free) if positive[i] > 0),
+                       key=lambda i, j=j: -positive[i] / weights[i][j] if weights[i][j] > 0 else -np.inf)
+                for j in range(m) if j != card_row]
+    ratio_rows = [j for j in range(m) if j != card_row]
+    tol = 1e-9 * (sum(abs(v) for v in ev) + abs(base_ev) + 1.0)
+
+    best: List[Tuple[float, int, Tuple[int, ...]]] = []  # min-heap de (EV, -orden, elegidas)
+    chosen: List[int] = []
+    counter = [0]
+
+    def bound(i: int, remaining: List[float]) -> float:
+        b = suffix[i]
+        if card_row >= 0:
+            # Los EV positivos están al inicio (orden decreciente): los mejores que caben en el cupo
+            lo = min(i, n_positive)
+            hi = max(lo, min(i + int(remaining[card_row] + 1e-9), n_positive))
+            b = min(b, cum[hi] - cum[lo])
+        for j, order in zip(ratio_rows, by_ratio):
+            cap, total = remaining[j], 0.0
+            for a in order:
+                if a < i:
+                    continue
+                w = weights[a][j]
+                if w <= cap:
+                    cap -= w
+                    total += positive[a]
+                else:
+                    total += positive[a] * cap / w
+                    break
+            if total < b:
+                b = total
+        return b
+
+    def search(i: int, value: float, remaining: List[float]):
+        if len(best) == k and value + bound(i, remaining) + tol < best[0][0]:
+            return
+        if i == n_free:
+            counter[0] += 1
+            item = (value, -counter[0], tuple(chosen))
+            if len(best) < k:
+                heapq.heappush(best, item)
+            elif value > best[0][0]:
+                heapq.heapreplace(best, item)
+            return
+        w = weights[i]
+        if all(w[j] <= remaining[j] + 1e-9 for j in range(m)):
+            chosen.append(i)
+            search(i + 1, value + ev[i], [remaining[j] - w[j] for j in range(m)])
+            chosen.pop()
+        search(i + 1, value, remaining)
+
+    search(0, base_ev, remaining0)
+
+    bits = np.zeros((len(best), n), dtype=np.int8)
+    for row, (_, _, picks) in enumerate(best):
+        bits[row, forced] = 1
+        bits[row, [free[i] for i in picks]] = 1
+    return _ranked(problem, bits, k)
+
+
+def brute_force_portfolios(problem: PortfolioProblem, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """Referencia: enumera las 2^n combinaciones y filtra las factibles"""
+    n = len(problem)
+    if n > MAX_BRUTE_FORCE:
+        raise ValueError(f"Demasiadas actividades para fuerza bruta: {n} (máximo {MAX_BRUTE_FORCE})")
+    blocks = []
+    for masks in iter_mask_blocks(n):
+        bits = masks_to_bits(masks, n)
+        ok = problem.feasible(bits)
+        if ok.any():
+            blocks.append(bits[ok])
+    bits = np.concatenate(blocks) if blocks else np.empty((0, n), dtype=np.int8)
+    ev_total = evaluate_bits(bits, problem.ev)
+    # Solo se ordenan los candidatos que pueden quedar entre los k primeros
+    if len(bits) > k:
+        keep = np.argpartition(-ev_total, k - 1)[:k]
+        bits = bits[ev_total >= ev_total[keep].min()]
+    return _ranked(problem, bits, k)
+
+
+def verify_against_brute_force(problem: PortfolioProblem, k: int = 10,
+                               result: Tuple[np.ndarray, np.ndarray] = None) -> bool:
+    """True si los EV de los k mejores portafolios coinciden con la enumeración completa"""
+    bits, ev_total = result if result is not None else optimize_portfolios(problem, k)
+    ref_bits, ref_ev = brute_force_portfolios(problem, k)
+    return (len(ev_total) == len(ref_ev) and bool(problem.feasible(bits).all())
+            and np.allclose(ev_total, ref_ev, rtol=1e-9, atol=1e-6))
+
+
+def portfolios_frame(problem: PortfolioProblem, bits: np.ndarray, ev_total: np.ndarray):
+    """DataFrame de portafolios: una columna por actividad, EV_total y el consumo de cada restricción"""
+    import pandas as pd
+
+    columns = {key: bits[:, j] for j, key in enumerate(problem.keys)}
+    columns['EV_total'] = ev_total
+    usage = problem.usage(bits) if len(bits) else np.empty((0, len(problem.row_names)))
+    for j, name in enumerate(problem.row_names):
+        columns[f'uso_{name}'] = usage[:, j]
+    return pd.DataFrame(columns)
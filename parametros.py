@@ -248,7 +248,18 @@ activities = [
 
 
 
-# Orden consistente de las decisiones para construir combinaciones (2^11)
+# Orden consistente de las decisiones para construir combinaciones
+# (2^20: concesionar_todo + 19 actividades)
 # Primera decisión: concesionar_todo (1 = concesionar todo, 0 = administración propia)
 # Luego las decisiones individuales de cada actividad
 decision_order = ["concesionar_todo"] + [a["decision_key"] for a in activities]
+
+# Grupos de elección mutuamente excluyentes (ver grupos_eleccion.py): cada actividad
+# se hace propia, concesionada o no se hace. Con 9 actividades en ambas modalidades
+# más Señaléticas (sin pareja: un grupo de una opción, hacer / no hacer) hay
+# 3^9 x 2 = 39.366 asignaciones factibles en vez de las 2^20 combinaciones de
+# decision_order. Se evalúan con: python grupos_eleccion.py parametros
+choice_groups = {}
+for _activity in activities:
+    choice_groups.setdefault(_activity["name"].split(" - ")[0], []).append(_activity["decision_key"])
+del _activity
@@ -14,6 +14,8 @@ discount_rate = 0.06  # 12% anual
 # - decision_key: nombre corto para la decisión binaria (1 = se mantiene / se invierte, 0 = no)
 # - horizon_years: horizonte temporal de evaluación (informativo)
 # - outcomes: lista de escenarios con 'label', 'prob' (0-1) y 'npv' (flujo futuro al final del horizonte)
+# - cost (opcional): inversión inicial, se descuenta del presupuesto 'budget'
+# - resources (opcional): consumo de recursos, p. ej. {"personal": 3}, limitado por 'capacity'
 #
 # Nota: Puedes ajustar probabilidades y montos. Deben sumar 1.0 por actividad.
 activities = [
@@ -112,3 +114,10 @@ activities = [
 
 # Orden consistente de las decisiones para construir combinaciones (2^10)
 decision_order = [a["decision_key"] for a in activities]
+
+# Restricciones opcionales del portafolio (ver optimizador.py). Sin ellas el
+# óptimo es tomar toda actividad con EV positivo. Ejemplos:
+# budget = 250_000_000                 # presupuesto para la suma de 'cost'
+# capacity = {"personal": 12}          # capacidad de cada recurso de 'resources'
+# max_activities = 5                   # a lo más 5 actividades propias
+# required_activities = ["trekking"]   # actividades que deben incluirse
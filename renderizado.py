@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Dibujo de figuras fuera del hilo principal.
+
+Cada figura se describe con un `PlotSpec` pequeño y serializable (la
+función de dibujo, sus datos ya reducidos y el archivo de salida) y se
+encola en un `FigureRenderer`, que la dibuja en un pool de procesos con el
+backend Agg mientras el cálculo numérico sigue. `wait()` espera todas las
+figuras una sola vez al final; si alguna falla se borra su archivo (así la
+caché no la da por válida) y se informa el error.
+
+- `FigureRenderer(max_workers=0)` dibuja en el acto, en el mismo proceso
+  (comportamiento anterior).
+- `SpecCollector` solo junta las especificaciones: los procesos que
+  analizan escenarios las devuelven y el proceso principal las encola en
+  su propio pool, así hay un único pool de dibujo por corrida.
+
+El pool se crea con la primera figura: en modo solo cálculo no se inicia
+ningún proceso ni se carga matplotlib.
+
+Caché de figuras (`FigureCache`): antes de dibujar, cada figura se identifica
+con un hash de sus datos de entrada y de la versión de la función de dibujo
+(su código fuente y el de las funciones auxiliares del mismo módulo que usa,
+más la versión de matplotlib). Si el archivo existe y su clave no cambió se
+reutiliza del disco. Las claves se guardan por carpeta en
+`<carpeta>/.cache/figuras.json`; a diferencia de la caché de resultados no
+dependen de la versión de todo el código, así un cambio en otro módulo no
+obliga a redibujar.
+
+Cuándo actúa: en una nueva ejecución sin cambios la caché de resultados
+reutiliza los artefactos completos y ni siquiera encola sus figuras (la
+caché de figuras informa 0 consultas). Solo sirve cuando la caché de
+resultados se invalida en forma parcial: un cambio de código en otro módulo
+(cambia `code_version`) o una entrada que recalcula un artefacto sin cambiar
+los datos de su figura. Con `--sin-cache` se desactivan las dos.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, fields, is_dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+import hashlib
+import importlib.metadata
+import inspect
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from cache_resultados import CACHE_DIRNAME
+from instrumentacion import TRACER, count, span
+
+FIGURE_CACHE_FILE = 'figuras.json'
+
+
+@dataclass
+class PlotSpec:
+    function: Callable     # función de dibujo a nivel de módulo (se serializa por nombre)
+    outfile: str
+    args: Tuple = ()
+    kwargs: Dict = field(default_factory=dict)
+
+    def render(self):
+        return self.function(*self.args, outfile=self.outfile, **self.kwargs)
+
+
+@lru_cache(maxsize=None)
+def function_version(function: Callable) -> str:
+    """
+    Hash del código de una función de dibujo y de las funciones del mismo
+    módulo que llama (recursivo), más la versión de matplotlib
+    """
+    digest = hashlib.sha256()
+    try:
+        digest.update(importlib.metadata.version('matplotlib').encode('utf-8'))
+    except importlib.metadata.PackageNotFoundError:
+        pass
+    seen, pending = set(), [inspect.unwrap(function)]
+    while pending:
+        fn = pending.pop()
+        if fn in seen:
+            continue
+        seen.add(fn)
+        digest.update(inspect.getsource(fn).encode('utf-8'))
+        module = vars(sys.modules[fn.__module__])
+        for name in sorted(fn.__code__.co_names):
+            helper = module.get(name)
+            if inspect.isfunction(helper) and helper.__module__ == fn.__module__:
+                pending.append(inspect.unwrap(helper))
+    return digest.hexdigest()
+
+
+def _update(digest, obj):
+    """Agrega al hash el contenido de los datos de una figura"""
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        digest.update(repr(obj).encode('utf-8'))
+    elif isinstance(obj, np.ndarray):
+        digest.update(f'{obj.dtype}{obj.shape}'.encode('utf-8'))
+        data = repr(obj.tolist()).encode('utf-8') if obj.dtype == object else np.ascontiguousarray(obj).tobytes()
+        digest.update(data)
+    elif type(obj).__name__ == 'DataFrame':
+        import pandas as pd
+        digest.update(repr((list(obj.columns), [str(t) for t in obj.dtypes])).encode('utf-8'))
+        # Sin el índice: los gráficos dibujan por posición y el índice puede variar entre corridas
+        digest.update(pd.util.hash_pandas_object(obj, index=False).to_numpy().tobytes())
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=repr):
+            _update(digest, key)
+            _update(digest, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        digest.update(f'{type(obj).__name__}{len(obj)}'.encode('utf-8'))
+        for item in obj:
+            _update(digest, item)
+    elif is_dataclass(obj):
+        _update(digest, {f.name: getattr(obj, f.name) for f in fields(obj)})
+    elif hasattr(obj, '__dict__'):
+        digest.update(type(obj).__name__.encode('utf-8'))
+        _update(digest, vars(obj))
+    else:
+        digest.update(repr(obj).encode('utf-8'))
+
+
+class FigureCache:
+    """Claves de las figuras ya dibujadas, por carpeta de salida"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._manifests: Dict[str, Dict[str, str]] = {}
+
+    def key(self, spec: 'PlotSpec') -> str:
+        digest = hashlib.sha256(function_version(spec.function).encode('utf-8'))
+        _update(digest, spec.args)
+        _update(digest, spec.kwargs)
+        return digest.hexdigest()
+
+    def _manifest_path(self, outfile: str) -> str:
+        return os.path.join(os.path.dirname(outfile) or '.', CACHE_DIRNAME, FIGURE_CACHE_FILE)
+
+    def _manifest(self, outfile: str) -> Dict[str, str]:
+        path = self._manifest_path(outfile)
+        if path not in self._manifests:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._manifests[path] = json.load(f)
+            except (OSError, ValueError):
+                self._manifests[path] = {}
+        return self._manifests[path]
+
+    def fresh(self, spec: 'PlotSpec', key: str) -> bool:
+        """True si la figura ya está en disco con la misma clave"""
+        ok = (self.enabled and self._manifest(spec.outfile).get(os.path.basename(spec.outfile)) == key
+              and os.path.exists(spec.outfile))
+        if ok:
+            self.hits += 1
+        else:
+            self.misses += 1
+        count('figuras_reutilizadas' if ok else 'figuras_dibujadas')
+        return ok
+
+    def record(self, spec: 'PlotSpec', key: str):
+        """Registra una figura recién dibujada (el manifiesto se escribe en el acto)"""
+        if not self.enabled:
+            return
+        manifest = self._manifest(spec.outfile)
+        manifest[os.path.basename(spec.outfile)] = key
+        path = self._manifest_path(spec.outfile)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+
+    def report(self) -> str:
+        return f"{self.hits} reutilizadas, {self.misses} dibujadas"
+
+
+def _init_worker():
+    """
+    Los procesos de dibujo usan Agg (sin pantalla ni hilo de interfaz) y parten
+    con la traza vacía: el pool se crea tarde, cuando el padre ya registró tramos
+    """
+    TRACER.reset()
+    os.environ['MPLBACKEND'] = 'Agg'
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render_job(spec: PlotSpec) -> Dict:
+    """Tarea del pool: dibuja la figura y retorna los eventos de traza del proceso"""
+    spec.render()
+    return TRACER.drain()
+
+
+class SpecCollector:
+    """Junta las figuras pedidas sin dibujarlas (para devolverlas desde otro proceso)"""
+
+    def __init__(self):
+        self.specs: List[PlotSpec] = []
+
+    def submit(self, function: Callable, outfile: str, *args, **kwargs):
+        self.submit_spec(PlotSpec(function, outfile, args, kwargs))
+
+    def submit_spec(self, spec: PlotSpec):
+        self.specs.append(spec)
+
+
+class FigureRenderer:
+    """
+    Pool de dibujo de figuras
+
+    max_workers: procesos de dibujo (por defecto, los núcleos disponibles);
+    0 dibuja en el acto en este proceso. use_cache: reutiliza las figuras
+    cuyos datos y función de dibujo no cambiaron.
+    """
+
+    def __init__(self, max_workers: int = None, use_cache: bool = True):
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.cache = FigureCache(use_cache)
+        self._pool = None
+        self._pending: List[Tuple[PlotSpec, str, object]] = []
+        self._start = None
+        self.rendered = 0
+
+    def submit(self, function: Callable, outfile: str, *args, **kwargs):
+        """Encola function(*args, outfile=outfile, **kwargs)"""
+        self.submit_spec(PlotSpec(function, outfile, args, kwargs))
+
+    def submit_spec(self, spec: PlotSpec):
+        if self._start is None:
+            self._start = time.perf_counter()
+        key = self.cache.key(spec)
+        if self.cache.fresh(spec, key):
+            return
+        if self.max_workers <= 0:
+            spec.render()
+            self.rendered += 1
+            self.cache.record(spec, key)
+            return
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+        self._pending.append((spec, key, self._pool.submit(_render_job, spec)))
+
+    def wait(self) -> int:
+        """
+        Espera todas las figuras encoladas y cierra el pool
+        Retorna cuántas se dibujaron; si alguna falló, lanza RuntimeError con todos los errores.
+        """
+        errors = []
+        with span('esperar_graficos', figuras=len(self._pending)):
+            for spec, key, future in self._pending:
+                try:
+                    TRACER.merge(future.result())
+                    self.rendered += 1
+                    self.cache.record(spec, key)
+                except Exception as exc:
+                    errors.append(f"{spec.outfile}: {exc!r}")
+                    if os.path.exists(spec.outfile):
+                        os.remove(spec.outfile)  # Que la caché no reutilice una figura a medias
+        self._pending = []
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if errors:
+            raise RuntimeError("Fallaron figuras:\n" + '\n'.join(f'  - {e}' for e in errors))
+        return self.rendered
+
+    @property
+    def seconds(self) -> float:
+        """Tiempo desde la primera figura encolada"""
+        return time.perf_counter() - self._start if self._start is not None else 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.wait()
+        elif self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
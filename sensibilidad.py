@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Análisis tornado paramétrico.
+
+Se perturba cada probabilidad (renormalizando el resto de la actividad) y
+cada flujo `npv` de cada escenario en ±porcentaje, y se mide el efecto en:
+
+- el EV del mejor portafolio (suma de las actividades con EV > 0), y
+- la diferencia Administración Propia - Concesión de analyze_main_decision.
+
+Como una perturbación solo cambia el EV de su propia actividad, todas se
+evalúan a la vez con fórmulas cerradas sobre matrices (actividades x
+escenarios x {bajo, alto}), sin volver a llamar `expected_npv`.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from tabla_actividades import activity_table
+
+DEFAULT_PERCENT = 0.10
+
+
+def _outcome_matrices(activities, discount_rate: float, width: int = None):
+    table = activity_table(activities, discount_rate)
+    probs, npvs = table.probs, table.npvs
+    if width is not None and width > probs.shape[1]:
+        pad = ((0, 0), (0, width - probs.shape[1]))
+        probs, npvs = np.pad(probs, pad), np.pad(npvs, pad)
+    valid = np.arange(probs.shape[1])[None, :] < table.n_outcomes[:, None]
+    return probs, npvs, valid, table.growth
+
+
+def perturbed_evs(activities: Sequence, discount_rate: float = 0.12, percent: float = DEFAULT_PERCENT,
+                  width: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    EV de cada actividad bajo todas las perturbaciones
+
+    Retorna (ev_base [A], ev_prob [A, M, 2], ev_npv [A, M, 2], valid [A, M]),
+    donde el último eje es (−percent, +percent). Con `width` las matrices se
+    rellenan hasta M = width escenarios.
+    """
+    probs, npvs, valid, factors = _outcome_matrices(activities, discount_rate, width)
+    scale = np.array([1 - percent, 1 + percent])
+    weighted = probs * npvs
+    total_weighted = weighted.sum(axis=1)
+    total_prob = probs.sum(axis=1)
+    ev_base = total_weighted / factors
+
+    # Flujo del escenario j escalado: solo cambia su término p_j·npv_j
+    ev_npv = (total_weighted[:, None, None] + weighted[:, :, None] * (scale - 1)) / factors[:, None, None]
+
+    # Probabilidad del escenario j escalada y luego renormalizada a la suma original
+    num = total_weighted[:, None, None] + weighted[:, :, None] * (scale - 1)
+    den = total_prob[:, None, None] + probs[:, :, None] * (scale - 1)
+    ev_prob = num / den * total_prob[:, None, None] / factors[:, None, None]
+    return ev_base, ev_prob, ev_npv, valid
+
+
+def pack_perturbations(activities, discount_rate: float, percent: float, width: int) -> np.ndarray:
+    """
+    Una fila plana por actividad: [ev_base, ev_prob (width x 2), ev_npv (width x 2)]
+    Cada fila depende solo de su actividad, así se puede guardar en la caché por actividad
+    """
+    ev_base, ev_prob, ev_npv, _ = perturbed_evs(activities, discount_rate, percent, width)
+    n = len(ev_base)
+    return np.hstack([ev_base[:, None], ev_prob.reshape(n, -1), ev_npv.reshape(n, -1)])
+
+
+def unpack_perturbations(packed: np.ndarray, width: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Inverso de pack_perturbations: (ev_base, ev_prob, ev_npv)"""
+    n = len(packed)
+    size = width * 2
+    return (packed[:, 0], packed[:, 1:1 + size].reshape(n, width, 2),
+            packed[:, 1 + size:].reshape(n, width, 2))
+
+
+def parametric_tornado(activities: Sequence, discount_rate: float = 0.12,
+                       percent: float = DEFAULT_PERCENT, scenario: str = '',
+                       perturbed: Tuple[np.ndarray, np.ndarray, np.ndarray] = None) -> List[Dict]:
+    """
+    Amplitud del EV del mejor portafolio ante cada perturbación de probabilidad y VPN
+    Retorna filas ordenadas de mayor a menor amplitud
+
+    perturbed: (ev_base, ev_prob, ev_npv) ya calculados (p. ej. desde la caché)
+    """
+    table = activity_table(activities, discount_rate)
+    if perturbed is None:
+        ev_base, ev_prob, ev_npv, valid = perturbed_evs(table, discount_rate, percent)
+    else:
+        ev_base, ev_prob, ev_npv = perturbed
+        valid = _outcome_matrices(table, discount_rate, ev_prob.shape[1])[2]
+    best_base = np.clip(ev_base, 0, None)
+    portfolio = best_base.sum()
+
+    def portfolio_with(ev_new):
+        return portfolio - best_base[:, None, None] + np.clip(ev_new, 0, None)
+
+    return _rows(table, scenario, portfolio,
+                 {'prob': portfolio_with(ev_prob), 'npv': portfolio_with(ev_npv)}, valid, percent)
+
+
+def parametric_tornado_difference(activities_concesion: Sequence, activities_propio: Sequence,
+                                  discount_rate: float = 0.12, percent: float = DEFAULT_PERCENT) -> List[Dict]:
+    """
+    Amplitud de la diferencia VPN Propio - VPN Concesión ante cada perturbación
+    de ambos escenarios
+    """
+    table_c = activity_table(activities_concesion, discount_rate)
+    table_p = activity_table(activities_propio, discount_rate)
+    base_c, prob_c, npv_c, valid_c = perturbed_evs(table_c, discount_rate, percent)
+    base_p, prob_p, npv_p, valid_p = perturbed_evs(table_p, discount_rate, percent)
+    difference = base_p.sum() - base_c.sum()
+
+    rows = _rows(table_p, 'Administración Propia', difference,
+                 {'prob': difference - base_p[:, None, None] + prob_p,
+                  'npv': difference - base_p[:, None, None] + npv_p}, valid_p, percent)
+    rows += _rows(table_c, 'Concesión', difference,
+                  {'prob': difference + base_c[:, None, None] - prob_c,
+                   'npv': difference + base_c[:, None, None] - npv_c}, valid_c, percent)
+    rows.sort(key=lambda row: row['Amplitud'], reverse=True)
+    return rows
+
+
+def _rows(table, scenario: str, base: float, metrics: Dict[str, np.ndarray], valid: np.ndarray,
+          percent: float) -> List[Dict]:
+    rows = []
+    for param, metric in metrics.items():
+        for i, j in zip(*np.nonzero(valid)):
+            low, high = float(metric[i, j, 0]), float(metric[i, j, 1])
+            rows.append({
+                'Escenario': scenario,
+                'Actividad': table.names[i],
+                'Resultado': table.labels[i][j],
+                'Parametro': param,
+                'Variacion': percent,
+                'Valor_Base': float(base),
+                'Valor_Bajo': low,
+                'Valor_Alto': high,
+                'Amplitud': abs(high - low),
+            })
+    rows.sort(key=lambda row: row['Amplitud'], reverse=True)
+    return rows
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio local de preguntas "¿qué pasa si...?" con estado precalculado.
+
+Mantiene los escenarios cargados y compilados en memoria (EV por actividad
+de cada modalidad) y responde parches de parámetros en milisegundos, sin
+reescribir módulos ni volver a correr main.py. Un parche solo recalcula el
+EV de las actividades que toca (todas las de una modalidad si cambia la
+tasa); los totales son sumas sobre el vector de EV.
+
+Escucha solo en 127.0.0.1 (HTTP/JSON, sin dependencias externas):
+
+    GET  /estado       resultados del estado actual
+    POST /whatif       resultados con el parche aplicado (no modifica el estado)
+    POST /aplicar      aplica el parche al estado
+    POST /reiniciar    vuelve a los parámetros cargados al iniciar
+
+Parche (JSON); "escenario" limita el parche a una modalidad (por defecto,
+todas las que tienen la actividad):
+
+    {"escenario": "concesion",
+     "discount_rate": 0.08,
+     "actividades": {
+        "cabalgatas": {"outcomes": {"Alta Demanda": {"prob": 0.4}}, "normalizar": true},
+        "lodge": {"horizon_years": 3}}}
+
+outcomes acepta un objeto etiqueta -> campos (cambia esos outcomes) o una
+lista (reemplaza todos). Con "normalizar" las probabilidades de los outcomes
+no modificados se reescalan para que la suma siga siendo 1. El resultado
+pasa por la misma validación que los archivos de escenarios.
+
+    python servicio.py                                   # parámetros del repositorio
+    python servicio.py --escenario concesion=c.json --escenario propio=p.yaml
+    curl -d '{"actividades": {"cabalgatas": {"outcomes": {"Alta Demanda": {"prob": 0.4}}, "normalizar": true}}}' \\
+         localhost:8765/whatif
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+import copy
+import json
+import threading
+import time
+
+import numpy as np
+
+from escenarios import Scenario, ScenarioError, compile_activity, validate_scenarios
+from tabla_actividades import ActivityTable
+
+LOCALHOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Tamaño máximo del cuerpo de una petición (bytes)
+MAX_BODY = 1 << 20
+NONE_OPTION = 'ninguna'
+
+
+class ModeState:
+    """
+    Estado precalculado de una modalidad: definiciones, orden de decisiones y
+    EV por actividad. Es inmutable: un parche produce un estado nuevo que
+    comparte todo lo que no cambió.
+    """
+
+    def __init__(self, name: str, definitions: List[Dict], discount_rate: float, decision_order: List[str],
+                 ev: np.ndarray = None):
+        self.name = name
+        self.definitions = definitions
+        self.discount_rate = discount_rate
+        self.decision_order = list(decision_order)
+        self.keys = [a['decision_key'] for a in definitions]
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.ev = ev if ev is not None else self._ev(range(len(definitions)))
+
+    @classmethod
+    def from_parameters(cls, name: str, parametros) -> 'ModeState':
+        return cls(name, copy.deepcopy(list(parametros.activities)), getattr(parametros, 'discount_rate', 0.12),
+                   parametros.decision_order)
+
+    def _ev(self, rows) -> np.ndarray:
+        # Tabla sin registrar (activity_table guardaría cada variante en memoria)
+        return ActivityTable([compile_activity(self.definitions[i]) for i in rows], self.discount_rate).ev
+
+    def patched(self, changes: Dict[str, Dict], discount_rate: float = None) -> 'ModeState':
+        """Estado con las actividades cambiadas; solo se recalcula su EV (o todo si cambia la tasa)"""
+        definitions = list(self.definitions)
+        rows = []
+        for key, change in changes.items():
+            i = self.index[key]
+            definitions[i] = _patched_definition(definitions[i], change)
+            rows.append(i)
+        rate = self.discount_rate if discount_rate is None else float(discount_rate)
+        errors = validate_scenarios([Scenario(self.name, [definitions[i] for i in rows] or definitions, rate,
+                                              decision_order=[definitions[i]['decision_key'] for i in rows] or None)])
+        if errors:
+            raise ScenarioError(errors)
+        if rate != self.discount_rate:
+            return ModeState(self.name, definitions, rate, self.decision_order)
+        state = ModeState(self.name, definitions, rate, self.decision_order, self.ev.copy())
+        if rows:
+            state.ev[rows] = state._ev(rows)
+        return state
+
+    def summary(self) -> Dict:
+        best = [key for key in self.decision_order if key in self.index and self.ev[self.index[key]] > 0]
+        return {
+            'discount_rate': self.discount_rate,
+            'ev': dict(zip(self.keys, self.ev.tolist())),
+            'mejor_combinacion': {'actividades': best, 'EV_total': float(self.ev[self.ev > 0].sum())},
+            'EV_todas': float(self.ev.sum()),
+        }
+
+
+def _patched_definition(definition: Dict, change: Dict) -> Dict:
+    """Copia de la definición con el parche de una actividad"""
+    result = dict(definition)
+    for field_name in ('name', 'horizon_years', 'cost', 'resources'):
+        if field_name in change:
+            result[field_name] = change[field_name]
+    outcomes = change.get('outcomes')
+    if outcomes is not None:
+        items = list(outcomes.values()) if isinstance(outcomes, dict) else outcomes
+        if not isinstance(items, list) or not all(isinstance(o, dict) for o in items):
+            raise ScenarioError([f"{definition['decision_key']}: outcomes debe ser una lista de outcomes "
+                                 f"o un objeto etiqueta -> campos"])
+    if isinstance(outcomes, list):
+        result['outcomes'] = [dict(o) for o in outcomes]
+    elif isinstance(outcomes, dict):
+        labels = [o['label'] for o in definition['outcomes']]
+        unknown = [label for label in outcomes if label not in labels]
+        if unknown:
+            raise ScenarioError([f"{definition['decision_key']}: outcomes desconocidos {unknown} "
+                                 f"(disponibles: {labels})"])
+        result['outcomes'] = [dict(o, **outcomes.get(o['label'], {})) for o in definition['outcomes']]
+        if change.get('normalizar'):
+            fixed = sum(float(o['prob']) for o in result['outcomes'] if o['label'] in outcomes)
+            rest = sum(float(o['prob']) for o in result['outcomes'] if o['label'] not in outcomes)
+            if rest > 0 and fixed <= 1:
+                scale = (1.0 - fixed) / rest
+                for o in result['outcomes']:
+                    if o['label'] not in outcomes:
+                        o['prob'] = float(o['prob']) * scale
+    return result
+
+
+class WhatIfService:
+    """Estado de todas las modalidades; los parches se evalúan sobre una copia (copy-on-write)"""
+
+    def __init__(self, scenarios: Dict[str, object]):
+        self._initial = {name: ModeState.from_parameters(name, p) for name, p in scenarios.items()}
+        self.modes = dict(self._initial)
+        self._lock = threading.Lock()
+
+    def _patched(self, patch: Dict) -> Dict[str, ModeState]:
+        target = patch.get('escenario')
+        if target is not None and target not in self.modes:
+            raise ScenarioError([f"Escenario desconocido: {target!r} (disponibles: {list(self.modes)})"])
+        changes = patch.get('actividades') or {}
+        if not isinstance(changes, dict) or not all(isinstance(change, dict) for change in changes.values()):
+            raise ScenarioError(["'actividades' debe ser un objeto actividad -> campos a cambiar"])
+        rate = patch.get('discount_rate')
+        if rate is not None and (isinstance(rate, bool) or not isinstance(rate, (int, float))):
+            raise ScenarioError([f"discount_rate inválida ({rate!r})"])
+        names = [target] if target else list(self.modes)
+        unknown = [key for key in changes if not any(key in self.modes[n].index for n in names)]
+        if unknown:
+            raise ScenarioError([f"Actividades desconocidas: {unknown}"])
+        modes = dict(self.modes)
+        for name in names:
+            state = self.modes[name]
+            own = {key: change for key, change in changes.items() if key in state.index}
+            if own or patch.get('discount_rate') is not None:
+                modes[name] = state.patched(own, patch.get('discount_rate'))
+        return modes
+
+    def results(self, modes: Dict[str, ModeState] = None, base: Dict[str, ModeState] = None) -> Dict:
+        """Resultados por modalidad, decisión principal y mejor modalidad por actividad"""
+        modes = modes or self.modes
+        result = {'escenarios': {name: state.summary() for name, state in modes.items()}}
+        totals = sorted(((state.ev.sum(), name) for name, state in modes.items()), reverse=True)
+        result['decision'] = {
+            'mejor_opcion': totals[0][1],
+            'EV_total': float(totals[0][0]),
+            'diferencia': float(totals[0][0] - totals[1][0]) if len(totals) > 1 else None,
+        }
+        # Modelo combinado: cada actividad en su mejor modalidad (o ninguna si todas tienen EV <= 0)
+        choice, combined = {}, 0.0
+        for key in dict.fromkeys(k for state in modes.values() for k in state.keys):
+            options = [(float(state.ev[state.index[key]]), name) for name, state in modes.items() if key in state.index]
+            ev, name = max(options)
+            choice[key] = name if ev > 0 else NONE_OPTION
+            combined += max(ev, 0.0)
+        result['por_actividad'] = choice
+        result['EV_combinado'] = combined
+        if base is not None:
+            result['cambios'] = {
+                name: {key: {'antes': float(base[name].ev[base[name].index[key]]), 'despues': float(ev)}
+                       for key, ev in zip(state.keys, state.ev.tolist())
+                       if ev != base[name].ev[base[name].index[key]]}
+                for name, state in modes.items() if state is not base[name]}
+        return result
+
+    def what_if(self, patch: Dict) -> Dict:
+        base = self.modes
+        return self.results(self._patched(patch), base)
+
+    def apply(self, patch: Dict) -> Dict:
+        with self._lock:
+            base = self.modes
+            self.modes = self._patched(patch)
+            return self.results(self.modes, base)
+
+    def reset(self) -> Dict:
+        with self._lock:
+            self.modes = dict(self._initial)
+        return self.results()
+
+
+def _handler(service: WhatIfService):
+    routes = {
+        ('GET', '/estado'): lambda body: service.results(),
+        ('POST', '/whatif'): service.what_if,
+        ('POST', '/aplicar'): service.apply,
+        ('POST', '/reiniciar'): lambda body: service.reset(),
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, payload: Dict):
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _dispatch(self, method: str):
+            start = time.perf_counter()
+            route = routes.get((method, self.path.split('?')[0].rstrip('/') or '/'))
+            if route is None:
+                return self._reply(404, {'error': f'Ruta desconocida: {method} {self.path}',
+                                         'rutas': [f'{m} {p}' for m, p in routes]})
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > MAX_BODY:
+                    return self._reply(413, {'error': 'Parche demasiado grande'})
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(body, dict):
+                    raise ValueError('el parche debe ser un objeto JSON')
+                payload = route(body)
+            except ScenarioError as exc:
+                return self._reply(400, {'error': 'Parche inválido', 'errores': exc.errors})
+            except (ValueError, TypeError, KeyError) as exc:
+                return self._reply(400, {'error': f'Parche inválido: {exc}'})
+            payload['ms'] = (time.perf_counter() - start) * 1000
+            self._reply(200, payload)
+
+        def do_GET(self):
+            self._dispatch('GET')
+
+        def do_POST(self):
+            self._dispatch('POST')
+
+        def log_message(self, format, *args):
+            print(f"   🌐 {self.address_string()} {format % args}")
+
+    return Handler
+
+
+def serve(service: WhatIfService, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """Servidor HTTP en 127.0.0.1 (sin arrancar: llamar a serve_forever)"""
+    return ThreadingHTTPServer((LOCALHOST, port), _handler(service))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from escenarios import load_scenario
+
+    parser = argparse.ArgumentParser(description='Servicio local de análisis "¿qué pasa si...?"')
+    parser.add_argument('--puerto', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--escenario', action='append', metavar='MODALIDAD=ARCHIVO',
+                        help='escenario a cargar (repetible); por defecto concesión y propio del repositorio')
+    args = parser.parse_args()
+
+    if args.escenario:
+        scenarios = {}
+        for item in args.escenario:
+            name, _, path = item.partition('=')
+            scenarios[name] = load_scenario(path)
+    else:
+        import parametros_administracion_propia
+        import parametros_concesion
+        scenarios = {'concesion': parametros_concesion, 'propio': parametros_administracion_propia}
+
+    start = time.perf_counter()
+    service = WhatIfService(scenarios)
+    server = serve(service, args.puerto)
+    print(f"🚀 Servicio listo en http://{LOCALHOST}:{args.puerto} "
+          f"({', '.join(service.modes)}; precálculo {(time.perf_counter() - start) * 1000:.1f} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Servicio detenido")
+    finally:
+        server.server_close()
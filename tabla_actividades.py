@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Tabla compilada de actividades (estructura de arreglos).
+
+`Activity` y `ActivityOutcome` son la representación interna de una
+actividad (se construyen desde los módulos de parámetros o con
+`escenarios.compile_activities`).
+
+Las listas de `Activity` con sus `outcomes` se compilan una sola vez en
+arreglos contiguos: probabilidades y VPN (actividades x escenarios,
+rellenados con ceros), horizontes, factores de descuento, EV y varianza por
+actividad. Todas las etapas del análisis leen de la tabla en vez de volver a
+recorrer los dataclasses.
+
+Las tablas se guardan en un registro en memoria (LRU acotado a `MAX_TABLES`)
+indexado por un hash del contenido (definición de actividades + tasa de
+descuento), así la misma definición compilada se reutiliza entre etapas.
+Hashear una lista recorre todos sus outcomes: las etapas de un análisis se
+pasan la `ActivityTable` ya compilada, que guarda sus hashes.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+import hashlib
+
+import numpy as np
+
+
+@dataclass
+class ActivityOutcome:
+    label: str
+    prob: float
+    npv: float
+
+
+@dataclass
+class Activity:
+    name: str
+    decision_key: str
+    horizon_years: int
+    outcomes: List[ActivityOutcome]
+    # Opcionales, solo para el optimizador con restricciones
+    cost: float = 0.0
+    resources: Dict[str, float] = field(default_factory=dict)
+
+
+def activity_hash(activity) -> str:
+    """Hash de contenido de una actividad (sin la tasa de descuento)"""
+    return hashlib.sha256(repr((activity.name, activity.decision_key, activity.horizon_years,
+                                [(o.label, o.prob, o.npv) for o in activity.outcomes])).encode('utf-8')).hexdigest()
+
+
+def activities_hash(activities: Sequence, discount_rate: float, activity_hashes: Sequence[str] = None) -> str:
+    """
+    Hash de contenido de una lista de actividades y la tasa de descuento
+    activity_hashes: hashes por actividad ya calculados (no se recorren los outcomes)
+    """
+    if activity_hashes is None:
+        activity_hashes = [activity_hash(act) for act in activities]
+    digest = hashlib.sha256(repr(float(discount_rate)).encode('utf-8'))
+    for item in activity_hashes:
+        digest.update(item.encode('ascii'))
+    return digest.hexdigest()
+
+
+def activity_definition(activity) -> Dict:
+    """Definición serializable de una actividad (la misma forma que en los módulos de parámetros)"""
+    return {
+        'name': activity.name,
+        'decision_key': activity.decision_key,
+        'horizon_years': activity.horizon_years,
+        'outcomes': [{'label': o.label, 'prob': o.prob, 'npv': o.npv} for o in activity.outcomes],
+    }
+
+
+class ActivityTable:
+    """
+    Actividades compiladas en arreglos contiguos para una tasa de descuento
+    """
+
+    def __init__(self, activities: Sequence, discount_rate: float, content_hash: str = None,
+                 activity_hashes: Sequence[str] = None):
+        self.activities = list(activities)
+        self.discount_rate = discount_rate
+        # Hashes calculados solo si se piden (p. ej. como clave de caché)
+        self._content_hash = content_hash
+        self._activity_hashes = list(activity_hashes) if activity_hashes is not None else None
+
+        n = len(self.activities)
+        counts = np.fromiter((len(a.outcomes) for a in self.activities), dtype=np.int64, count=n)
+        width = int(counts.max()) if n else 1
+        self.names: List[str] = [a.name for a in self.activities]
+        self.decision_keys: List[str] = [a.decision_key for a in self.activities]
+        self.labels: List[List[str]] = [[o.label for o in a.outcomes] for a in self.activities]
+        self.n_outcomes = counts
+        self.horizons = np.fromiter((a.horizon_years for a in self.activities), dtype=np.float64, count=n)
+
+        # Relleno vectorizado de las matrices a partir de los outcomes aplanados
+        rows = np.repeat(np.arange(n), counts)
+        cols = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        self.probs = np.zeros((n, width), dtype=np.float64)
+        self.npvs = np.zeros((n, width), dtype=np.float64)
+        self.probs[rows, cols] = [o.prob for a in self.activities for o in a.outcomes]
+        self.npvs[rows, cols] = [o.npv for a in self.activities for o in a.outcomes]
+
+        # Mismas operaciones que expected_npv: prob × npv / (1 + r)^h, sumado por actividad
+        self.growth = np.array([(1 + discount_rate) ** a.horizon_years for a in self.activities], dtype=np.float64)
+        self.discounted = self.npvs / self.growth[:, None]
+        self.ev = (self.probs * self.npvs / self.growth[:, None]).sum(axis=1)
+        self.variance = (self.probs * (self.discounted - self.ev[:, None]) ** 2).sum(axis=1)
+        self._index = {key: i for i, key in enumerate(self.decision_keys)}
+
+    def __len__(self) -> int:
+        return len(self.activities)
+
+    @property
+    def activity_hashes(self) -> List[str]:
+        """Hash de contenido de cada actividad, en el orden de la tabla"""
+        if self._activity_hashes is None:
+            self._activity_hashes = [activity_hash(act) for act in self.activities]
+        return self._activity_hashes
+
+    @property
+    def content_hash(self) -> str:
+        if self._content_hash is None:
+            self._content_hash = activities_hash(self.activities, self.discount_rate, self.activity_hashes)
+        return self._content_hash
+
+    @property
+    def discount_factors(self) -> np.ndarray:
+        return 1.0 / self.growth
+
+    def index_of(self, decision_key: str) -> int:
+        return self._index[decision_key]
+
+    def ev_of(self, decision_key: str) -> float:
+        return float(self.ev[self._index[decision_key]])
+
+
+# Registro de tablas compiladas por hash de contenido (las menos usadas salen primero)
+MAX_TABLES = 32
+_TABLES: 'OrderedDict[str, ActivityTable]' = OrderedDict()
+
+
+def activity_table(activities, discount_rate: float = 0.12) -> ActivityTable:
+    """
+    Tabla compilada para (actividades, tasa); se reutiliza si ya existe una con el mismo contenido
+    Acepta una lista de actividades o una ActivityTable (con otra tasa se
+    reutilizan sus hashes por actividad en vez de volver a recorrer los outcomes)
+    """
+    hashes = None
+    if isinstance(activities, ActivityTable):
+        if activities.discount_rate == discount_rate:
+            return activities
+        hashes = activities.activity_hashes
+        activities = activities.activities
+    else:
+        hashes = [activity_hash(act) for act in activities]
+    key = activities_hash(activities, discount_rate, hashes)
+    table = _TABLES.get(key)
+    if table is None:
+        table = ActivityTable(activities, discount_rate, key, hashes)
+        _TABLES[key] = table
+        if len(_TABLES) > MAX_TABLES:
+            _TABLES.popitem(last=False)
+    else:
+        _TABLES.move_to_end(key)
+    return table
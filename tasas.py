@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Barrido de la tasa de descuento.
+
+El EV de una actividad es lineal en su flujo esperado sin descontar:
+EV(r) = (Σ prob × npv) × (1 + r)^-horizonte. Con una tabla de factores de
+descuento por (tasa, horizonte) se evalúan todas las actividades para
+cientos de tasas en una sola operación matricial, y se detectan las tasas
+donde cambia una recomendación (HACER / NO HACER, concesión / propia).
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from tabla_actividades import ActivityTable, activity_table
+
+
+class DiscountFactorCache:
+    """
+    Factores de descuento (1 + r)^-h memorizados por (tasa, horizonte)
+    """
+
+    def __init__(self):
+        self._factors: Dict[Tuple[float, int], float] = {}
+
+    def __len__(self) -> int:
+        return len(self._factors)
+
+    def table(self, rates: Sequence[float], horizons: Sequence[int]) -> np.ndarray:
+        """Matriz (tasas x horizontes); solo se calculan los pares que faltan"""
+        rates = np.asarray(rates, dtype=np.float64)
+        horizons = np.asarray(horizons)
+        missing = [(r, h) for r in rates.tolist() for h in horizons.tolist() if (r, h) not in self._factors]
+        if missing:
+            r_missing = np.array([r for r, _ in missing])
+            h_missing = np.array([h for _, h in missing], dtype=np.float64)
+            for key, factor in zip(missing, (1 + r_missing) ** -h_missing):
+                self._factors[key] = float(factor)
+        return np.array([[self._factors[(r, h)] for h in horizons.tolist()] for r in rates.tolist()])
+
+
+DISCOUNT_FACTORS = DiscountFactorCache()
+
+
+def _as_table(activities) -> ActivityTable:
+    # El flujo sin descontar no depende de la tasa: sirve cualquier tabla ya compilada
+    return activities if isinstance(activities, ActivityTable) else activity_table(activities)
+
+
+def undiscounted_ev(activities) -> np.ndarray:
+    """Flujo esperado sin descontar (Σ prob × npv) por actividad"""
+    table = _as_table(activities)
+    return (table.probs * table.npvs).sum(axis=1)
+
+
+def ev_by_rate(activities, rates: Sequence[float],
+               cache: DiscountFactorCache = DISCOUNT_FACTORS) -> np.ndarray:
+    """EV de cada actividad para cada tasa: matriz (tasas x actividades)"""
+    table = _as_table(activities)
+    horizons = sorted({act.horizon_years for act in table.activities})
+    factors = cache.table(rates, horizons)
+    column = np.array([horizons.index(act.horizon_years) for act in table.activities], dtype=np.int64)
+    return factors[:, column] * undiscounted_ev(table)[None, :]
+
+
+def sign_changes(rates: np.ndarray, values: np.ndarray) -> List[Tuple[float, int, int]]:
+    """
+    Tasas (interpoladas linealmente) donde `values` cambia de signo
+    Retorna (tasa, signo antes, signo después)
+    """
+    signs = np.sign(values)
+    changes = []
+    for i in np.nonzero(signs[:-1] != signs[1:])[0]:
+        v0, v1 = values[i], values[i + 1]
+        rate = rates[i] if v1 == v0 else rates[i] + (rates[i + 1] - rates[i]) * v0 / (v0 - v1)
+        changes.append((float(rate), int(signs[i]), int(signs[i + 1])))
+    return changes
+
+
+@dataclass
+class RateSweep:
+    rates: np.ndarray
+    ev_concesion: np.ndarray  # tasas x actividades de concesión
+    ev_propio: np.ndarray     # tasas x actividades propias
+    names_concesion: List[str]
+    names_propio: List[str]
+
+    @property
+    def total_concesion(self) -> np.ndarray:
+        return self.ev_concesion.sum(axis=1)
+
+    @property
+    def total_propio(self) -> np.ndarray:
+        return self.ev_propio.sum(axis=1)
+
+    @property
+    def difference(self) -> np.ndarray:
+        """Ventaja de administración propia (igual que en analyze_main_decision)"""
+        return self.total_propio - self.total_concesion
+
+    def summary_rows(self) -> List[Dict]:
+        best_concesion = np.clip(self.ev_concesion, 0, None).sum(axis=1)
+        best_propio = np.clip(self.ev_propio, 0, None).sum(axis=1)
+        return [{
+            'Tasa': float(r),
+            'VPN_Concesion': float(c),
+            'VPN_Propio': float(p),
+            'Diferencia': float(d),
+            'Mejor_Estrategia': 'Administración Propia' if d > 0 else 'Concesión',
+            'Mejor_Combinacion_Concesion': float(bc),
+            'Mejor_Combinacion_Propio': float(bp),
+        } for r, c, p, d, bc, bp in zip(self.rates, self.total_concesion, self.total_propio,
+                                        self.difference, best_concesion, best_propio)]
+
+    def flip_rows(self) -> List[Dict]:
+        """Tasas donde cambia la estrategia recomendada o la recomendación de una actividad"""
+        def strategy(sign):
+            return 'Administración Propia' if sign > 0 else 'Concesión'
+
+        def decision(sign):
+            return 'HACER' if sign > 0 else 'NO HACER'
+
+        rows = []
+        for rate, before, after in sign_changes(self.rates, self.difference):
+            rows.append({'Tipo': 'Estrategia', 'Escenario': 'Concesión vs Propia', 'Actividad': '',
+                         'Tasa_Cambio': rate, 'Antes': strategy(before), 'Despues': strategy(after)})
+        for scenario, names, ev in (('Concesión', self.names_concesion, self.ev_concesion),
+                                    ('Administración Propia', self.names_propio, self.ev_propio)):
+            for j, name in enumerate(names):
+                for rate, before, after in sign_changes(self.rates, ev[:, j]):
+                    rows.append({'Tipo': 'Actividad', 'Escenario': scenario, 'Actividad': name,
+                                 'Tasa_Cambio': rate, 'Antes': decision(before), 'Despues': decision(after)})
+        return rows
+
+
+def sweep_discount_rates(activities_concesion, activities_propio,
+                         rates: Sequence[float]) -> RateSweep:
+    """Evalúa ambos escenarios sobre toda la grilla de tasas en una sola pasada vectorizada"""
+    rates = np.asarray(rates, dtype=np.float64)
+    table_c, table_p = _as_table(activities_concesion), _as_table(activities_propio)
+    return RateSweep(
+        rates,
+        ev_by_rate(table_c, rates),
+        ev_by_rate(table_p, rates),
+        list(table_c.names),
+        list(table_p.names),
+    )
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""Los módulos del análisis viven en la raíz del repositorio"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from tabla_actividades import Activity, ActivityOutcome
+
+
+@pytest.fixture
+def random_activities():
+    """Fábrica de actividades aleatorias: random_activities(rng, n, max_outcomes=3)"""
+    def make(rng: np.random.Generator, n: int, max_outcomes: int = 3):
+        activities = []
+        for i in range(n):
+            k = int(rng.integers(1, max_outcomes + 1))
+            probs = rng.dirichlet(np.ones(k))
+            outcomes = [ActivityOutcome(f'caso {j}', float(p), float(rng.normal(0, 50_000)))
+                        for j, p in enumerate(probs)]
+            activities.append(Activity(f'Actividad {i}', f'act_{i}', int(rng.integers(1, 6)), outcomes))
+        return activities
+    return make
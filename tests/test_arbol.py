@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from arbol import CHANCE, DECISION, DecisionTree, activity_tree, rollback
+from tabla_actividades import activity_table
+
+
+def _random_tree(rng) -> DecisionTree:
+    """Árbol con nodos compartidos: cada nodo nuevo apunta a nodos ya creados al azar"""
+    tree = DecisionTree()
+    nodes = [tree.terminal(float(rng.normal(0, 100)), f't{i}') for i in range(int(rng.integers(1, 5)))]
+    for i in range(int(rng.integers(1, 40))):
+        children = rng.choice(nodes, size=int(rng.integers(1, 5))).tolist()
+        values = rng.normal(0, 50, len(children)).round(1)
+        if rng.random() < 0.5:
+            probs = rng.dirichlet(np.ones(len(children)))
+            nodes.append(tree.chance([(float(p), float(v), c, f'r{j}')
+                                      for j, (p, v, c) in enumerate(zip(probs, values, children))], f'c{i}'))
+        else:
+            nodes.append(tree.decision([(float(v), c, f'o{j}') for j, (v, c) in enumerate(zip(values, children))],
+                                       f'd{i}'))
+    tree.root = nodes[-1]
+    return tree
+
+
+def _recursive_value(tree: DecisionTree, node: int, memo: dict) -> float:
+    if node not in memo:
+        start, count = tree.edge_start[node], tree.edge_count[node]
+        edges = range(start, start + count)
+        contrib = [tree.edge_value[e] + _recursive_value(tree, tree.edge_child[e], memo) for e in edges]
+        if tree.kinds[node] == CHANCE:
+            memo[node] = sum(tree.edge_prob[e] * c for e, c in zip(edges, contrib))
+        elif tree.kinds[node] == DECISION:
+            memo[node] = max(contrib)
+        else:
+            memo[node] = tree.payoffs[node]
+    return memo[node]
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_rollback_matches_recursive_evaluation(seed):
+    tree = _random_tree(np.random.default_rng(seed))
+    result = rollback(tree)
+    memo = {}
+    for node in range(len(tree)):
+        assert result.values[node] == pytest.approx(_recursive_value(tree, node, memo), abs=1e-9)
+        if tree.kinds[node] == DECISION:
+            e = int(result.best_edge[node])
+            start = tree.edge_start[node]
+            assert start <= e < start + tree.edge_count[node]
+            assert tree.edge_value[e] + memo[tree.edge_child[e]] == pytest.approx(memo[node], abs=1e-9)
+
+
+@pytest.mark.parametrize('module_name', ['parametros_concesion', 'parametros_administracion_propia'])
+def test_activity_tree_root_is_sum_of_positive_evs(module_name):
+    import importlib
+
+    from escenarios import compile_activities
+
+    P = importlib.import_module(module_name)
+    activities = compile_activities(P)
+    table = activity_table(activities, P.discount_rate)
+    tree = activity_tree(activities, P.discount_rate)
+    result = rollback(tree)
+    assert result.value == pytest.approx(np.clip(table.ev, 0, None).sum())
+    chosen = {row['decision']: row['opcion'] for row in result.policy()}
+    assert chosen == {name: 'SÍ' if ev > 0 else 'NO' for name, ev in zip(table.names, table.ev.tolist())}
+    assert tree.path_count() == int(np.prod(1 + table.n_outcomes))
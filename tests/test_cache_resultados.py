@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import copy
+import json
+import types
+
+import numpy as np
+import pytest
+
+import cache_resultados
+from cache_resultados import ResultCache, cache_key
+
+
+def test_fresh_record_save_round_trip(tmp_path):
+    out = tmp_path / 'tabla.csv'
+    out.write_text('x\n', encoding='utf-8')
+    cache = ResultCache(str(tmp_path))
+    key = cache_key('tabla', [1, 2, 3])
+    assert not cache.fresh('tabla', key, [str(out)])
+    cache.record('tabla', key, [str(out)])
+    cache.save()
+
+    reloaded = ResultCache(str(tmp_path))
+    assert reloaded.fresh('tabla', key, [str(out)])
+    assert not reloaded.fresh('tabla', cache_key('tabla', [1, 2, 4]), [str(out)])  # otra entrada
+    assert not reloaded.fresh('tabla', key, [str(out), str(tmp_path / 'otro.csv')])  # otros archivos
+    assert (reloaded.hits, reloaded.misses) == (1, 2)
+    assert not ResultCache(str(tmp_path), enabled=False).fresh('tabla', key, [str(out)])
+
+
+def test_missing_artifact_file_is_not_fresh(tmp_path):
+    out = tmp_path / 'figura.png'
+    out.write_bytes(b'png')
+    cache = ResultCache(str(tmp_path))
+    key = cache_key('figura')
+    cache.record('figura', key, [str(out)])
+    cache.save()
+    out.unlink()
+    assert not ResultCache(str(tmp_path)).fresh('figura', key, [str(out)])
+
+
+def test_code_version_change_invalidates_manifest(tmp_path, monkeypatch):
+    out = tmp_path / 'tabla.csv'
+    out.write_text('x\n', encoding='utf-8')
+    cache = ResultCache(str(tmp_path))
+    key = cache_key('tabla')
+    cache.record('tabla', key, [str(out)])
+    cache.save()
+
+    monkeypatch.setattr(cache_resultados, 'code_version', lambda: 'otra version')
+    reloaded = ResultCache(str(tmp_path))
+    assert not reloaded.fresh('tabla', key, [str(out)])  # ni siquiera con la clave antigua
+    assert cache_key('tabla') != key
+
+
+def _counting(calls):
+    def compute(sub):
+        calls.append([a.decision_key for a in sub.activities])
+        return sub.ev[:, None] * np.array([1.0, 2.0])
+    return compute
+
+
+def test_activity_values_recompute_only_changed_activity(tmp_path, random_activities):
+    activities = random_activities(np.random.default_rng(0), 5)
+    calls = []
+    cache = ResultCache(str(tmp_path))
+    first = cache.activity_values('ev', activities, 0.1, _counting(calls))
+    cache.save()
+    assert calls == [[a.decision_key for a in activities]]
+
+    changed = copy.deepcopy(activities)
+    changed[2].outcomes[0].npv += 1000.0
+    calls.clear()
+    cache = ResultCache(str(tmp_path))
+    values = cache.activity_values('ev', changed, 0.1, _counting(calls))
+    assert calls == [[changed[2].decision_key]]
+    assert np.array_equal(np.delete(values, 2, axis=0), np.delete(first, 2, axis=0))
+    assert not np.array_equal(values[2], first[2])
+
+
+def test_save_prunes_unused_activity_keys(tmp_path, random_activities):
+    activities = random_activities(np.random.default_rng(1), 4)
+    cache = ResultCache(str(tmp_path))
+    cache.activity_values('ev', activities, 0.1, _counting([]))
+    cache.save()
+    cache = ResultCache(str(tmp_path))
+    cache.activity_values('ev', activities[:2], 0.1, _counting([]))
+    cache.save()
+    with open(cache.path, encoding='utf-8') as f:
+        assert len(json.load(f)['activities']['ev']) == 2
+
+
+def test_activity_values_key_includes_variant(tmp_path, random_activities):
+    activities = random_activities(np.random.default_rng(2), 3)
+    cache = ResultCache(str(tmp_path))
+    narrow = cache.activity_values('w', activities, 0.1, lambda sub: np.zeros((len(sub), 2)), variant=(2,))
+    wide = cache.activity_values('w', activities, 0.1, lambda sub: np.ones((len(sub), 4)), variant=(4,))
+    assert narrow.shape == (3, 2) and wide.shape == (3, 4)
+
+
+def _scenario(activities):
+    return types.SimpleNamespace(activities=activities, discount_rate=0.06,
+                                 decision_order=[a['decision_key'] for a in activities])
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('grow', [True, False])
+def test_outcome_count_change_between_runs(tmp_path, monkeypatch, grow):
+    """
+    Una actividad gana (o pierde) un cuarto escenario entre corridas: cambia el
+    ancho de las filas del tornado paramétrico de todas las actividades
+    """
+    import main
+    import parametros_concesion as P
+
+    monkeypatch.chdir(tmp_path)
+    base = copy.deepcopy(P.activities)
+    wider = copy.deepcopy(P.activities)
+    wider[0]['outcomes'].append({'label': 'Extra', 'prob': 0.0, 'npv': 1.0})
+    first, second = (base, wider) if grow else (wider, base)
+
+    main.analyze_scenario(_scenario(first), 'caso', 'resultados', compute_only=True)
+    main.analyze_scenario(_scenario(second), 'caso', 'resultados', compute_only=True)
+    main.analyze_scenario(_scenario(second), 'caso', 'sin-cache', compute_only=True, use_cache=False)
+    assert _read('resultados-caso/tornado_parametrico.csv') == _read('sin-cache-caso/tornado_parametrico.csv')
+
+
+def test_streaming_run_records_and_reuses_combinations(tmp_path, monkeypatch):
+    import main
+    import parametros_concesion as P
+
+    monkeypatch.chdir(tmp_path)
+    scenario = _scenario(copy.deepcopy(P.activities))
+    first, _, _, _ = main.analyze_scenario(scenario, 'caso', 'resultados', streaming=True, compute_only=True)
+    again, _, _, _ = main.analyze_scenario(scenario, 'caso', 'resultados', streaming=True, compute_only=True)
+    assert first.equals(again)
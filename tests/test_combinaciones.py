@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+import itertools
+
+import numpy as np
+import pytest
+
+from combinaciones import evaluate_combinations, iter_evaluated_blocks
+
+
+def _old_loop(ev_vector):
+    """Evaluación anterior: itertools.product y suma en Python de las decisiones activas"""
+    rows = [(bits, sum(ev for bit, ev in zip(bits, ev_vector) if bit == 1))
+            for bits in itertools.product([0, 1], repeat=len(ev_vector))]
+    return np.array([bits for bits, _ in rows], dtype=np.int8).reshape(len(rows), len(ev_vector)), \
+        np.array([total for _, total in rows], dtype=np.float64)
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_block_engine_matches_old_loop_bit_for_bit(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(0, 11))
+    ev = rng.normal(0, 1e6, n)
+    ev[rng.random(n) < 0.2] = 0.0  # decisiones sin actividad (p. ej. concesionar_todo)
+    keys = [f'd{j}' for j in range(n)]
+    block_size = int(rng.integers(1, 70))
+
+    ref_bits, ref_ev = _old_loop(ev.tolist())
+    bits, ev_total = evaluate_combinations(keys, ev, block_size=block_size)
+    assert np.array_equal(bits, ref_bits)
+    assert np.array_equal(ev_total, ref_ev)  # mismos flotantes, no solo aproximados
+
+    streamed = list(iter_evaluated_blocks(keys, ev, block_size=block_size))
+    assert np.array_equal(np.concatenate([b for b, _ in streamed]), ref_bits)
+    assert np.array_equal(np.concatenate([t for _, t in streamed]), ref_ev)
+
+
+@pytest.mark.parametrize('seed', range(60))
+@pytest.mark.parametrize('worst', [False, True])
+def test_k_best_deviations_matches_full_enumeration(seed, worst):
+    from combinaciones import evaluate_bits, k_best_deviations
+
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(0, 12))
+    # Enteros pequeños: fuerza empates y EV 0, el caso difícil para el orden de la búsqueda
+    ev = rng.integers(-5, 6, n).astype(np.float64) if seed % 2 else rng.normal(0, 1e5, n)
+    k = int(rng.integers(1, 2 ** n + 3))
+
+    _, all_ev = evaluate_combinations([f'd{j}' for j in range(n)], ev)
+    expected = np.sort(all_ev)[::-1][:k] if not worst else np.sort(all_ev)[:k]
+    bits = k_best_deviations(ev, k, worst=worst)
+    found = evaluate_bits(bits, ev)
+    assert len(bits) == min(k, 2 ** n)
+    assert len({row.tobytes() for row in bits}) == len(bits)  # sin combinaciones repetidas
+    assert np.allclose(np.sort(found)[::-1] if not worst else np.sort(found), expected)
+
+
+def test_top_k_combinations_matches_sorted_enumeration():
+    import main
+    import parametros_concesion as P
+    from tabla_actividades import activity_table
+
+    activities = main.compile_activities(P)
+    table = activity_table(activities, P.discount_rate)
+    _, ev_total = evaluate_combinations(P.decision_order, [table.ev_of(key) for key in P.decision_order])
+    ev_sorted = np.sort(ev_total)[::-1]
+
+    top, worst = main.top_k_combinations(activities, 10, P.discount_rate, list(P.decision_order))
+    assert np.allclose(top['EV_total'], ev_sorted[:10])
+    assert np.allclose(worst['EV_total'], ev_sorted[-10:])
+
+
+@pytest.mark.parametrize('fanin', [2, 3, 64])
+@pytest.mark.parametrize('block_size', [1, 5, 32])
+def test_streamed_sorted_csv_matches_in_memory_sort(tmp_path, monkeypatch, fanin, block_size):
+    """
+    El merge externo (en varias etapas si hay más corridas que MAX_MERGE_FANIN)
+    deja el mismo archivo, byte a byte, que ordenar el DataFrame completo;
+    los empates quedan en orden de máscara
+    """
+    import combinaciones
+    from combinaciones import combinations_frame, stream_combinations_csv
+
+    monkeypatch.setattr(combinaciones, 'MAX_MERGE_FANIN', fanin)
+    keys = [f'd{j}' for j in range(8)]
+    ev = np.array([3.0, -1.5, 0.0, 1.5, 3.0, 0.0, -3.0, 1.5])  # muchos empates de EV_total
+    path = tmp_path / 'combinaciones_ev.csv'
+    stream_combinations_csv(str(path), keys, ev, block_size=block_size, sort=True)
+
+    bits, ev_total = evaluate_combinations(keys, ev)
+    expected = combinations_frame(keys, bits, ev_total).sort_values('EV_total', ascending=False, kind='stable')
+    assert path.read_bytes() == expected.to_csv(index=False).encode('utf-8')
+    assert [p.name for p in tmp_path.iterdir()] == ['combinaciones_ev.csv']  # sin corridas temporales
+
+
+@pytest.mark.parametrize('n_keys', [1, 10, 62, 63])
+def test_table_writer_round_trip_through_memmap(tmp_path, n_keys):
+    from combinaciones import CombinationTableWriter, masks_to_bits, open_combination_table
+
+    rng = np.random.default_rng(n_keys)
+    keys = [f'd{j}' for j in range(n_keys)]
+    top = 1 << n_keys
+    # Bloques de distinto tamaño, con las máscaras extremas (0 y 2^n - 1) incluidas
+    blocks = [np.array([0, top - 1], dtype=np.uint64)] + [
+        rng.integers(0, top, size, dtype=np.uint64, endpoint=False) for size in (1, 7, 64)]
+    evs = [rng.normal(0, 1e6, len(m)) for m in blocks]
+
+    writer = CombinationTableWriter(str(tmp_path), keys)
+    for masks, ev in zip(blocks, evs):
+        writer.append(masks, ev)
+    writer.close()
+
+    table = open_combination_table(str(tmp_path), keys)
+    masks, ev = np.concatenate(blocks), np.concatenate(evs)
+    assert isinstance(table.masks, np.memmap) and not table.is_sorted
+    assert len(table) == len(ev) and table.nbytes == 16 * len(ev)
+    assert np.array_equal(table.masks, masks) and np.array_equal(table.ev_total, ev)
+    decoded = table.decode()
+    assert np.array_equal(decoded[keys].to_numpy(), masks_to_bits(masks, n_keys))
+    assert np.array_equal(table.column(keys[0]), (masks >> np.uint64(n_keys - 1)).astype(np.int8))
+    assert np.array_equal(table.head(5)['EV_total'], np.sort(ev)[::-1][:5])
+    assert np.array_equal(table.tail(5)['EV_total'], np.sort(ev)[::-1][-5:])
+
+
+def test_table_rejects_too_many_keys(tmp_path):
+    from combinaciones import MAX_DECISION_KEYS, CombinationTable
+
+    keys = [f'd{j}' for j in range(MAX_DECISION_KEYS + 1)]
+    with pytest.raises(ValueError):
+        CombinationTable(keys, np.zeros(0, dtype=np.uint64), np.zeros(0))
+
+
+def _corrupt_table(directory, meta=None, truncate=None):
+    import json
+    from combinaciones import TABLE_EV_FILE, TABLE_META_FILE, CombinationTable
+
+    keys = ['a', 'b', 'c']
+    CombinationTable(keys, np.arange(8, dtype=np.uint64), np.arange(8, dtype=np.float64)).save(str(directory))
+    path = directory / TABLE_META_FILE
+    data = json.loads(path.read_text(encoding='utf-8'))
+    if meta is not None:
+        data = meta(data)
+    path.write_text(json.dumps(data), encoding='utf-8')
+    if truncate is not None:
+        ev = directory / TABLE_EV_FILE
+        ev.write_bytes(ev.read_bytes()[:truncate])
+    return keys
+
+
+@pytest.mark.parametrize('meta, truncate', [
+    (lambda m: {**m, 'count': 9}, None),
+    (lambda m: {**m, 'count': -1}, None),
+    (lambda m: {**m, 'count': '8'}, None),
+    (lambda m: {k: v for k, v in m.items() if k != 'sorted'}, None),
+    (lambda m: {**m, 'decision_order': 'abc'}, None),
+    (lambda m: [m], None),
+    (None, 60),
+])
+def test_open_table_rejects_corrupt_metadata(tmp_path, meta, truncate):
+    from combinaciones import open_combination_table
+
+    _corrupt_table(tmp_path, meta, truncate)
+    with pytest.raises(ValueError):
+        open_combination_table(str(tmp_path))
+
+
+def test_open_table_rejects_other_decision_order(tmp_path):
+    from combinaciones import TABLE_META_FILE, open_combination_table
+
+    keys = _corrupt_table(tmp_path)
+    assert len(open_combination_table(str(tmp_path), keys)) == 8
+    with pytest.raises(ValueError):
+        open_combination_table(str(tmp_path), ['a', 'c', 'b'])
+    (tmp_path / TABLE_META_FILE).write_text('{"count": 8,', encoding='utf-8')
+    with pytest.raises(ValueError):
+        open_combination_table(str(tmp_path), keys)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import itertools
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from distribucion import activity_atoms, portfolio_distribution
+
+RATE = 0.1
+
+
+def _brute_force(activities, rate=RATE):
+    """Distribución del VPN enumerando todas las combinaciones de escenarios"""
+    pmf = defaultdict(float)
+    atoms = [activity_atoms(act, rate) for act in activities]
+    for picks in itertools.product(*(range(len(v)) for v, _ in atoms)):
+        value = sum(v[i] for (v, _), i in zip(atoms, picks))
+        pmf[value] += float(np.prod([p[i] for (_, p), i in zip(atoms, picks)]))
+    values = np.array(sorted(pmf))
+    return values, np.array([pmf[v] for v in values])
+
+
+def _brute_var_cvar(values, probs, alpha):
+    """VaR y CVaR de la cola izquierda de masa 1 - alpha, átomo por átomo"""
+    tail = 1 - alpha
+    var = -values[np.argmax(np.cumsum(probs) >= tail - 1e-12)]
+    left, total = tail, 0.0
+    for v, p in zip(values, probs):
+        take = min(p, left)
+        total += take * v
+        left -= take
+    return var, -total / tail
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_exact_convolution_matches_brute_force(random_activities, seed):
+    rng = np.random.default_rng(seed)
+    activities = random_activities(rng, int(rng.integers(1, 7)), max_outcomes=4)
+    if seed % 5 == 0:
+        # Valores repetidos: átomos que se fusionan
+        for act in activities:
+            for o in act.outcomes:
+                o.npv = float(round(o.npv, -4))
+            act.horizon_years = 0
+    values, probs = _brute_force(activities)
+    dist = portfolio_distribution(activities, RATE)
+
+    assert dist.exact and dist.error_bound == 0.0
+    assert np.allclose(dist.values, values, rtol=1e-12, atol=1e-6)
+    assert np.allclose(dist.probs, probs, rtol=1e-9, atol=1e-15)
+    assert dist.mean == pytest.approx(float(values @ probs), rel=1e-9, abs=1e-6)
+    assert dist.prob_loss == pytest.approx(float(probs[values < 0].sum()), abs=1e-12)
+    for alpha in (0.5, 0.9, 0.95, 0.99):
+        var, cvar = _brute_var_cvar(values, probs, alpha)
+        assert dist.value_at_risk(alpha) == pytest.approx(var, rel=1e-9, abs=1e-6)
+        assert dist.conditional_value_at_risk(alpha) == pytest.approx(cvar, rel=1e-9, abs=1e-6)
+
+
+@pytest.mark.parametrize('grid_points', [1 << 8, 1 << 11, 1 << 15])
+@pytest.mark.parametrize('seed', range(10))
+def test_grid_fallback_stays_within_error_bound(random_activities, seed, grid_points):
+    rng = np.random.default_rng(100 + seed)
+    activities = random_activities(rng, 8, max_outcomes=4)
+    exact = portfolio_distribution(activities, RATE)
+    grid = portfolio_distribution(activities, RATE, max_atoms=1, grid_points=grid_points)
+
+    assert exact.exact and not grid.exact
+    lo, hi = exact.values[0], exact.values[-1]
+    assert grid.error_bound == pytest.approx(len(activities) * (hi - lo) / (grid_points - 1))
+    assert grid.mean == pytest.approx(exact.mean, abs=1e-9 * (hi - lo))
+    for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99):
+        assert abs(grid.quantile(q) - exact.quantile(q)) <= grid.error_bound
+    for alpha in (0.9, 0.95, 0.99):
+        assert abs(grid.value_at_risk(alpha) - exact.value_at_risk(alpha)) <= grid.error_bound
+        assert abs(grid.conditional_value_at_risk(alpha) - exact.conditional_value_at_risk(alpha)) <= grid.error_bound
+    assert grid.summary()['Cota_Error'] == grid.error_bound
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from escenarios import load_scenarios
+from tabla_actividades import activity_table
+
+
+def test_parameters_excel_round_trip_keeps_discount_rate(tmp_path, monkeypatch):
+    pytest.importorskip('openpyxl')
+    import main
+
+    monkeypatch.chdir(tmp_path)
+    excel_file = main.create_parameters_excel()
+    scenarios = {s.name: s for s in load_scenarios([str(tmp_path / excel_file)], use_cache=False)}
+
+    for name, module in (('Administración Propia', main.P_PROPIO), ('Concesión', main.P_CONCESION)):
+        scenario = scenarios[name]
+        assert scenario.discount_rate == module.discount_rate
+        loaded = activity_table(scenario.compiled, scenario.discount_rate).ev
+        expected = activity_table(main.compile_activities(module), module.discount_rate).ev
+        assert loaded.tolist() == pytest.approx(expected.tolist())
+
+
+def test_non_integer_horizon_is_a_validation_error(tmp_path):
+    import json
+
+    import parametros_concesion
+    from escenarios import ScenarioError, save_scenario
+
+    path = tmp_path / 'concesion.json'
+    save_scenario(parametros_concesion, str(path))
+    doc = json.loads(path.read_text(encoding='utf-8'))
+    doc['activities'][0]['horizon_years'] = 2.7
+    doc['activities'][1]['horizon_years'] = 0
+    path.write_text(json.dumps(doc), encoding='utf-8')
+
+    with pytest.raises(ScenarioError) as info:
+        load_scenarios([str(path)], use_cache=False)
+    messages = info.value.errors
+    assert any('entero' in m and '2.7' in m for m in messages)
+    assert any('> 0' in m for m in messages)  # todos los errores en el mismo lote
+
+
+def test_non_integer_horizon_in_csv_is_not_truncated(tmp_path):
+    from escenarios import ScenarioError
+
+    path = tmp_path / 'parque.csv'
+    path.write_text('actividad,label,prob,npv,horizon_years\n'
+                    'Kayak,bueno,0.5,100,2.7\nKayak,malo,0.5,-50,2.7\n', encoding='utf-8')
+    with pytest.raises(ScenarioError) as info:
+        load_scenarios([str(path)], use_cache=False)
+    assert any('entero' in m for m in info.value.errors)
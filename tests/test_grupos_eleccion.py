@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from grupos_eleccion import evaluate_parameters
+
+
+def test_parametros_choice_groups_are_evaluated():
+    import parametros
+
+    model, df = evaluate_parameters(parametros)
+    assert len(model) == 10
+    assert model.count == 3 ** 9 * 2 == len(df)
+    # El EV es aditivo por grupo: la mejor asignación toma en cada grupo la mejor opción o ninguna
+    assert df['EV_total'].iloc[0] == pytest.approx(np.maximum(model.values, 0).max(axis=1).sum())
+    assert df['EV_total'].is_monotonic_decreasing
+
+
+def _random_model(rng):
+    from grupos_eleccion import ChoiceModel
+
+    n_groups = int(rng.integers(0, 7))
+    options = []
+    for g in range(n_groups):
+        n_options = int(rng.integers(1, 4))
+        values = rng.integers(-5, 6, n_options).astype(float) if rng.random() < 0.3 else rng.normal(0, 1e4, n_options)
+        options.append([(f'm{j}', f'g{g}_m{j}', float(v)) for j, v in enumerate(values)])
+    return ChoiceModel([f'g{g}' for g in range(n_groups)], options)
+
+
+@pytest.mark.parametrize('seed', range(80))
+def test_mixed_radix_enumeration_matches_product(seed):
+    import itertools
+
+    from grupos_eleccion import evaluate_assignments
+
+    model = _random_model(np.random.default_rng(seed))
+    expected = np.array(list(itertools.product(*[range(int(r)) for r in model.radix])),
+                        dtype=np.int8).reshape(model.count, len(model))
+    choices, ev_total = evaluate_assignments(model, block_size=7)
+    assert model.count == len(expected)
+    assert np.array_equal(choices, expected)  # primer grupo = dígito más significativo
+    assert model.codes(choices) == list(range(len(expected)))
+    ev_expected = [sum(model.values[g, c] for g, c in enumerate(row)) for row in expected.tolist()]
+    assert np.allclose(ev_total, ev_expected)
+
+
+@pytest.mark.parametrize('seed', range(80))
+@pytest.mark.parametrize('worst', [False, True])
+def test_k_best_assignments_matches_enumeration(seed, worst):
+    from grupos_eleccion import evaluate_assignments, k_best_assignments
+
+    rng = np.random.default_rng(seed)
+    model = _random_model(rng)
+    k = int(rng.integers(1, model.count + 3))
+    _, all_ev = evaluate_assignments(model)
+    expected = np.sort(all_ev)[:k] if worst else np.sort(all_ev)[::-1][:k]
+
+    choices, ev_total = k_best_assignments(model, k, worst=worst)
+    assert len(choices) == min(k, model.count)
+    assert len(set(model.codes(choices))) == len(choices)
+    assert np.allclose(ev_total, model.evaluate(choices))
+    assert np.allclose(np.sort(ev_total) if worst else np.sort(ev_total)[::-1], expected)
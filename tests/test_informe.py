@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+from html.parser import HTMLParser
+
+import numpy as np
+import pytest
+
+from informe import RENDERERS, build_report, render_html, render_json, render_text, write_report
+from tabla_actividades import Activity, ActivityOutcome
+
+GOLDEN_TEXT = os.path.join(os.path.dirname(__file__), 'datos', 'resumen_ejecutivo.txt')
+VOID_TAGS = {'meta', 'br', 'hr', 'img', 'link', 'input'}
+
+
+@pytest.fixture
+def repo_report():
+    import main
+    return build_report(main.compile_activities(main.P_CONCESION), main.compile_activities(main.P_PROPIO),
+                        getattr(main.P_CONCESION, 'discount_rate', 0.12))
+
+
+@pytest.fixture
+def tricky_report():
+    """Nombres con caracteres especiales de HTML y de Markdown, EV positivos, negativos y cero"""
+    def acts(npvs):
+        names = ['<script>alert("x")</script>', 'Cabañas & "Lodge"', "Tours 'guiados' | noche", 'Kayak']
+        return [Activity(name, f'k{i}', 1, [ActivityOutcome('único', 1.0, npv)])
+                for i, (name, npv) in enumerate(zip(names, npvs))]
+    return build_report(acts([5e6, -2e6, 0.0, 1e6]), acts([3e6, 4e6, -1e6, 0.0]), 0.0)
+
+
+class _TreeChecker(HTMLParser):
+    """Verifica que cada etiqueta se cierre en orden y junta el texto de las celdas"""
+
+    def __init__(self):
+        super().__init__()
+        self.stack, self.cells, self.tables, self.rows = [], [], 0, []
+        self.scripts = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'script':
+            self.scripts += 1
+        if tag == 'table':
+            self.tables += 1
+            self.rows.append(0)
+        if tag == 'tr':
+            self.rows[-1] += 1
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        assert self.stack and self.stack[-1] == tag, f'</{tag}> cierra <{self.stack[-1] if self.stack else None}>'
+        self.stack.pop()
+
+    def handle_data(self, data):
+        if self.stack and self.stack[-1] == 'td':
+            self.cells.append(data)
+
+
+def _parse_html(text: str) -> _TreeChecker:
+    checker = _TreeChecker()
+    checker.feed(text)
+    checker.close()
+    assert checker.stack == []
+    return checker
+
+
+def test_text_matches_baseline_summary_byte_for_byte(repo_report, tmp_path):
+    with open(GOLDEN_TEXT, 'rb') as f:
+        golden = f.read()
+    assert render_text(repo_report).encode('utf-8') == golden
+    path, = write_report(repo_report, str(tmp_path / 'resumen_ejecutivo'), ['txt'])
+    assert open(path, 'rb').read() == golden
+
+
+@pytest.mark.parametrize('fixture', ['repo_report', 'tricky_report'])
+def test_json_structure(fixture, request):
+    report = request.getfixturevalue(fixture)
+    data = json.loads(render_json(report))
+
+    assert set(data) == {'discount_rate', 'recommendation', 'best_strategy', 'difference', 'advantage',
+                         'best_value', 'concesion', 'propio'}
+    assert data['recommendation'] == report.recommendation
+    for key, mode in (('concesion', report.concesion), ('propio', report.propio)):
+        block = data[key]
+        assert block['label'] == mode.label
+        assert [d['name'] for d in block['decisions']] == [d.name for d in mode.decisions]
+        assert block['total'] == pytest.approx(sum(d['npv'] for d in block['decisions']))
+        npv = {d['name']: d['npv'] for d in block['decisions']}
+        assert all(npv[n] > 0 for n in block['hacer']) and all(npv[n] <= 0 for n in block['no_hacer'])
+        assert sorted(block['hacer'] + block['no_hacer']) == sorted(npv)
+        for names in (block['hacer'], block['no_hacer']):
+            assert [npv[n] for n in names] == sorted((npv[n] for n in names), reverse=True)
+        assert all(d['recommendation'] == ('HACER' if d['npv'] > 0 else 'NO HACER') for d in block['decisions'])
+    assert data['difference'] == pytest.approx(data['propio']['total'] - data['concesion']['total'])
+    assert data['advantage'] == pytest.approx(abs(data['difference']))
+    assert data['best_value'] == pytest.approx(max(data['propio']['total'], data['concesion']['total']))
+    assert 'Concesión' in render_json(report)  # sin escapes \u
+
+
+@pytest.mark.parametrize('fixture', ['repo_report', 'tricky_report'])
+def test_html_structure(fixture, request):
+    report = request.getfixturevalue(fixture)
+    text = render_html(report)
+    assert text.startswith('<!DOCTYPE html>\n<html lang="es">')
+    checker = _parse_html(text)
+    # Decisión principal + una tabla por modalidad; una fila por actividad más el encabezado
+    assert checker.tables == 3
+    assert checker.rows == [3, len(report.propio.decisions) + 1, len(report.concesion.decisions) + 1]
+    for mode in (report.propio, report.concesion):
+        assert all(d.name in checker.cells for d in mode.decisions)
+
+
+def test_html_escapes_activity_names(tricky_report):
+    text = render_html(tricky_report)
+    checker = _parse_html(text)
+    assert checker.scripts == 0
+    assert '<script>' not in text
+    assert '&lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt;' in text
+    assert 'Cabañas &amp; &quot;Lodge&quot;' in text
+    assert 'Tours &#x27;guiados&#x27; | noche' in text
+    assert '<script>alert("x")</script>' in checker.cells  # el texto decodificado es el nombre original
+
+
+def test_every_format_is_written_once(repo_report, tmp_path):
+    paths = write_report(repo_report, str(tmp_path / 'resumen'))
+    assert [os.path.basename(p) for p in paths] == [f'resumen.{fmt}' for fmt in RENDERERS]
+    for path, fmt in zip(paths, RENDERERS):
+        with open(path, encoding='utf-8') as f:
+            assert f.read() == RENDERERS[fmt](repo_report)
+    with pytest.raises(ValueError):
+        write_report(repo_report, str(tmp_path / 'resumen'), ['pdf'])
+
+
+def test_zero_ev_is_not_recommended(tricky_report):
+    propio = tricky_report.propio
+    assert [d.name for d in propio.hacer] == ['Cabañas & "Lodge"', '<script>alert("x")</script>']
+    assert [d.npv for d in propio.no_hacer] == [0.0, -1e6]
+    assert np.isclose(tricky_report.difference, propio.total - tricky_report.concesion.total)
+
+
+def test_markdown_tables_keep_their_columns(tricky_report):
+    from informe import render_markdown
+
+    text = render_markdown(tricky_report)
+    tables = [block.splitlines() for block in text.split('\n\n') if block.startswith('|')]
+    assert [len(rows) for rows in tables] == [4, 6, 6]
+    for rows in tables:
+        assert len({row.count('|') for row in rows}) == 1  # un '|' en un nombre no agrega columnas
+    assert "| Tours 'guiados' / noche |" in text
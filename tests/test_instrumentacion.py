@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from instrumentacion import TRACER, count, span
+
+
+@pytest.fixture(autouse=True)
+def clean_tracer():
+    TRACER.reset()
+    yield
+    TRACER.reset()
+
+
+def _child_job():
+    with span('hijo'):
+        count('items', 3)
+    return TRACER.drain()
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='requiere fork')
+def test_forked_worker_returns_only_its_own_events():
+    # El padre ya registró eventos antes de crear el pool (el caso de los pools creados tarde)
+    with span('padre'):
+        count('items', 1)
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as pool:
+        trace = pool.submit(_child_job).result()
+    assert [e['name'] for e in trace['events']] == ['hijo']
+    assert trace['counters'] == {'items': 3}
+
+    TRACER.merge(trace)
+    assert {row['tramo']: row['llamadas'] for row in TRACER.summary()} == {'padre': 1, 'hijo': 1}
+    assert TRACER.counters == {'items': 4}
+
+
+def test_drain_in_same_process_round_trips():
+    with span('a'):
+        count('items', 2)
+    TRACER.merge(TRACER.drain())
+    assert [row['llamadas'] for row in TRACER.summary()] == [1]
+    assert TRACER.counters == {'items': 2}
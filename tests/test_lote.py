@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import json
+import math
+
+import pandas as pd
+import pytest
+
+import lote
+from lote import _read_manifest, _scan_directory, batch_runs, parks_summary, run_batch
+
+
+def _scenario_doc(n: int, npv: float = 1_000.0):
+    activities = [{'name': f'Actividad {i}', 'decision_key': f'act_{i}', 'horizon_years': 1 + i % 3,
+                   'outcomes': [{'label': 'Alta', 'prob': 0.5, 'npv': npv * (i + 1)},
+                                {'label': 'Baja', 'prob': 0.5, 'npv': -npv * (i % 2)}]}
+                  for i in range(n)]
+    return {'discount_rate': 0.1, 'activities': activities, 'decision_order': [a['decision_key'] for a in activities]}
+
+
+def _write(path, doc):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(doc), encoding='utf-8')
+    return path
+
+
+def test_directory_scan_root_files_and_subfolders(tmp_path):
+    _write(tmp_path / 'andino.json', {'escenarios': {'Concesión': _scenario_doc(2), 'Propio': _scenario_doc(2)}})
+    _write(tmp_path / 'cantillana' / 'concesion.json', _scenario_doc(2))
+    _write(tmp_path / 'cantillana' / 'propio.json', _scenario_doc(3))
+    (tmp_path / 'cantillana' / 'notas.txt').write_text('no es un escenario', encoding='utf-8')
+    (tmp_path / 'LEEME.md').write_text('-', encoding='utf-8')
+
+    entries = _scan_directory(str(tmp_path))
+    assert [(e['parque'], e.get('modalidad'), e['archivo']) for e in entries] == [
+        ('andino', None, str(tmp_path / 'andino.json')),
+        ('cantillana', 'concesion', str(tmp_path / 'cantillana' / 'concesion.json')),
+        ('cantillana', 'propio', str(tmp_path / 'cantillana' / 'propio.json')),
+    ]
+    runs = batch_runs(str(tmp_path))
+    assert [(park, mode, len(s.activities)) for park, mode, s in runs] == [
+        ('andino', 'Concesión', 2), ('andino', 'Propio', 2), ('cantillana', 'concesion', 2), ('cantillana', 'propio', 3)]
+
+
+@pytest.mark.parametrize('fmt', ['json', 'csv'])
+def test_manifest_resolves_relative_paths(tmp_path, fmt):
+    _write(tmp_path / 'datos' / 'a.json', {'escenarios': {'Concesión': _scenario_doc(2), 'Propio': _scenario_doc(3)}})
+    entries = [{'parque': 'Andino', 'archivo': 'datos/a.json', 'escenario': 'Propio', 'modalidad': 'propio'},
+               {'parque': 'Andino', 'archivo': 'datos/a.json', 'escenario': 'Concesión', 'modalidad': ''}]
+    manifest = tmp_path / 'sub' / f'manifiesto.{fmt}'
+    manifest.parent.mkdir()
+    for entry in entries:
+        entry['archivo'] = '../' + entry['archivo']
+    if fmt == 'json':
+        manifest.write_text(json.dumps({'corridas': entries}), encoding='utf-8')
+    else:
+        pd.DataFrame(entries).to_csv(manifest, index=False)
+
+    read = _read_manifest(str(manifest))
+    assert [e['archivo'] for e in read] == [str(manifest.parent / '../datos/a.json')] * 2
+    runs = batch_runs(str(manifest))
+    assert [(park, mode, len(s.activities)) for park, mode, s in runs] == [('Andino', 'propio', 3),
+                                                                           ('Andino', 'Concesión', 2)]
+
+
+@pytest.mark.parametrize('entries, message', [
+    ([{'parque': 'A'}], "necesita 'parque' y 'archivo'"),
+    ([{'parque': 'A', 'archivo': 'a.json', 'escenario': 'Otro'}], 'no encontrado'),
+    ([{'parque': 'Río Claro', 'archivo': 'a.json', 'modalidad': 'Propio'},
+      {'parque': 'rio claro', 'archivo': 'b.json', 'modalidad': 'propio'}], 'Corrida repetida'),
+])
+def test_manifest_errors(tmp_path, entries, message):
+    _write(tmp_path / 'a.json', _scenario_doc(2))
+    _write(tmp_path / 'b.json', _scenario_doc(2))
+    manifest = _write(tmp_path / 'manifiesto.json', entries)
+    with pytest.raises(ValueError, match=message):
+        batch_runs(str(manifest))
+
+
+def test_parks_summary_ranks_modes_and_skips_failed_runs():
+    runs = pd.DataFrame([
+        {'Parque': 'Andino', 'Modalidad': 'concesion', 'EV_Mejor': 10.0, 'Actividades_Mejor': 'a', 'Estado': 'ok'},
+        {'Parque': 'Andino', 'Modalidad': 'propio', 'EV_Mejor': 25.0, 'Actividades_Mejor': 'a, b', 'Estado': 'ok'},
+        {'Parque': 'Cantillana', 'Modalidad': 'concesion', 'EV_Mejor': 7.0, 'Actividades_Mejor': 'c', 'Estado': 'ok'},
+        {'Parque': 'Cantillana', 'Modalidad': 'propio', 'EV_Mejor': math.nan, 'Actividades_Mejor': '',
+         'Estado': 'error: boom'},
+    ])
+    parks = parks_summary(runs).set_index('Parque')
+    assert parks.loc['Andino', 'Mejor_Opcion'] == 'propio'
+    assert parks.loc['Andino', 'EV_Mejor'] == 25.0 and parks.loc['Andino', 'Diferencia_EV'] == 15.0
+    assert parks.loc['Andino', 'Actividades_Mejor'] == 'a, b'
+    assert parks.loc['Andino', 'EV_concesion'] == 10.0 and parks.loc['Andino', 'EV_propio'] == 25.0
+    assert parks.loc['Cantillana', 'Mejor_Opcion'] == 'concesion'
+    assert math.isnan(parks.loc['Cantillana', 'Diferencia_EV']) and math.isnan(parks.loc['Cantillana', 'EV_propio'])
+
+
+def test_run_batch_reports_combinations_actually_evaluated(tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, 'MAX_FULL_ENUMERATION', 4)
+    _write(tmp_path / 'parques' / 'chico.json', _scenario_doc(3))
+    _write(tmp_path / 'parques' / 'grande.json', _scenario_doc(6))
+
+    runs, parks = run_batch(str(tmp_path / 'parques'), str(tmp_path / 'salida'), max_workers=1)
+    runs = runs.set_index('Parque')
+    assert (runs['Estado'] == 'ok').all()
+    assert runs.loc['chico', 'Combinaciones_Evaluadas'] == 2 ** 3
+    # Sobre MAX_FULL_ENUMERATION solo se evalúan las mejores y peores, no las 2^6
+    assert runs.loc['grande', 'Combinaciones_Evaluadas'] == 2 * main.TOP_K
+    assert (tmp_path / 'salida' / f'{lote.RUNS_TABLE}.csv').exists() and len(parks) == 2
+
+    # Segunda corrida: las combinaciones se reutilizan desde la caché
+    again, _ = run_batch(str(tmp_path / 'parques'), str(tmp_path / 'salida'), max_workers=1)
+    assert again['Combinaciones_Evaluadas'].tolist() == [0, 0]
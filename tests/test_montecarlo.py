@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import math
+
+import numpy as np
+import pytest
+
+from montecarlo import simulate_portfolio
+
+RATE = 0.08
+
+
+def _analytic(activities, rate=RATE):
+    """Media y desviación estándar exactas del VPN (actividades independientes)"""
+    mean, var = 0.0, 0.0
+    for act in activities:
+        factor = (1 + rate) ** act.horizon_years
+        probs = np.array([o.prob for o in act.outcomes]) / sum(o.prob for o in act.outcomes)
+        values = np.array([o.npv / factor for o in act.outcomes])
+        m = float(probs @ values)
+        mean += m
+        var += float(probs @ (values - m) ** 2)
+    return mean, math.sqrt(var)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_mean_and_sem_match_analytic_distribution(random_activities, seed):
+    activities = random_activities(np.random.default_rng(seed), 6, max_outcomes=4)
+    mean, std = _analytic(activities)
+    result = simulate_portfolio(activities, RATE, n_trials=200_000, seed=seed, chunk_size=30_000)
+
+    assert result.trials == 200_000 and not result.stopped_early
+    assert abs(result.mean - mean) < 5 * std / math.sqrt(result.trials)
+    assert result.std == pytest.approx(std, rel=0.02)
+    assert result.sem == pytest.approx(std / math.sqrt(result.trials), rel=0.02)
+
+
+@pytest.mark.parametrize('stop_after', [None, 12_500, 20_500])
+def test_same_seed_is_reproducible_across_worker_counts(random_activities, stop_after):
+    activities = random_activities(np.random.default_rng(7), 5)
+    _, std = _analytic(activities)
+    target_sem = None if stop_after is None else std / math.sqrt(stop_after)
+    kwargs = dict(n_trials=50_000, seed=11, chunk_size=1_000, target_sem=target_sem)
+    single = simulate_portfolio(activities, RATE, workers=1, **kwargs)
+    for workers in (2, 3):
+        pooled = simulate_portfolio(activities, RATE, workers=workers, **kwargs)
+        assert np.array_equal(single.samples, pooled.samples)
+        assert single.stopped_early == pooled.stopped_early == (stop_after is not None)
+
+
+def test_early_stop_at_first_chunk_below_target(random_activities):
+    activities = random_activities(np.random.default_rng(3), 5)
+    _, std = _analytic(activities)
+    chunk = 1_000
+    target = std / math.sqrt(12_500)  # se alcanza alrededor del bloque 13 de 100
+    result = simulate_portfolio(activities, RATE, n_trials=100_000, seed=5, chunk_size=chunk, target_sem=target)
+
+    assert result.stopped_early
+    assert result.trials % chunk == 0 and result.trials < 100_000
+    assert result.sem <= target
+    # Un bloque antes todavía no se cumplía el objetivo
+    previous = result.samples[:result.trials - chunk]
+    assert previous.std(ddof=1) / math.sqrt(len(previous)) > target
+    # Es un prefijo de la simulación completa con la misma semilla
+    full = simulate_portfolio(activities, RATE, n_trials=100_000, seed=5, chunk_size=chunk)
+    assert np.array_equal(result.samples, full.samples[:result.trials])
+
+
+def test_target_never_reached_runs_all_trials(random_activities):
+    activities = random_activities(np.random.default_rng(4), 3)
+    result = simulate_portfolio(activities, RATE, n_trials=2_500, seed=1, chunk_size=1_000, target_sem=1e-9)
+    assert result.trials == 2_500 and not result.stopped_early
+
+
+@pytest.mark.parametrize('n_trials', [0, -1])
+def test_rejects_non_positive_trials(random_activities, n_trials):
+    activities = random_activities(np.random.default_rng(0), 2)
+    with pytest.raises(ValueError):
+        simulate_portfolio(activities, RATE, n_trials=n_trials)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from combinaciones import evaluate_combinations
+from optimizador import PortfolioConstraints, PortfolioProblem, brute_force_portfolios, optimize_portfolios
+
+
+def _random_problem(rng, random_activities) -> PortfolioProblem:
+    n = int(rng.integers(1, 13))
+    activities = random_activities(rng, n)
+    for a in activities:
+        a.cost = float(rng.integers(0, 100))
+        a.resources = {'guias': float(rng.integers(0, 5)), 'botes': float(rng.integers(0, 3))}
+    constraints = PortfolioConstraints()
+    if rng.random() < 0.7:
+        constraints.budget = float(rng.uniform(0, 50 * n))
+    if rng.random() < 0.5:
+        constraints.capacity = {'guias': float(rng.integers(0, 2 * n + 1)), 'botes': float(rng.integers(0, n + 1))}
+    if rng.random() < 0.5:
+        constraints.max_activities = int(rng.integers(0, n + 1))
+    if rng.random() < 0.3:
+        constraints.required = [activities[int(rng.integers(n))].decision_key]
+    return PortfolioProblem(activities, constraints, discount_rate=float(rng.uniform(0, 0.2)))
+
+
+@pytest.mark.parametrize('seed', range(150))
+def test_branch_and_bound_matches_brute_force(seed, random_activities):
+    rng = np.random.default_rng(seed)
+    problem = _random_problem(rng, random_activities)
+    k = int(rng.integers(1, 15))
+
+    bits, ev_total = optimize_portfolios(problem, k)
+    ref_bits, ref_ev = brute_force_portfolios(problem, k)
+    assert problem.feasible(bits).all()
+    assert np.array_equal(bits, ref_bits)
+    assert np.allclose(ev_total, ref_ev)
+
+
+def test_without_constraints_top_k_is_head_of_enumeration(random_activities):
+    rng = np.random.default_rng(7)
+    problem = PortfolioProblem(random_activities(rng, 10), PortfolioConstraints())
+    _, all_ev = evaluate_combinations(problem.keys, problem.ev)
+    _, ev_total = optimize_portfolios(problem, 10)
+    assert np.allclose(ev_total, np.sort(all_ev)[::-1][:10])
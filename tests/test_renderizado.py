@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+
+import pytest
+
+from instrumentacion import TRACER, count, span, traced
+from renderizado import FigureRenderer
+
+
+@traced()
+def plot_stub(values, outfile):
+    count('puntos_dibujados', len(values))
+    with open(outfile, 'w', encoding='utf-8') as f:
+        f.write(repr(values))
+
+
+def _render_trace(tmp_path, max_workers):
+    TRACER.reset()
+    with span('calculo'):
+        count('combinaciones_evaluadas', 1024)
+    renderer = FigureRenderer(max_workers=max_workers, use_cache=False)
+    for i in range(3):
+        renderer.submit(plot_stub, str(tmp_path / f'figura_{max_workers}_{i}.txt'), list(range(i + 1)))
+    assert renderer.wait() == 3
+    calls = {row['tramo']: row['llamadas'] for row in TRACER.summary()}
+    counters = dict(TRACER.counters)
+    TRACER.reset()
+    return calls, counters
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='requiere fork')
+def test_pool_trace_matches_inline_rendering(tmp_path):
+    inline = _render_trace(tmp_path, max_workers=0)
+    pooled = _render_trace(tmp_path, max_workers=1)
+    assert pooled == inline
+    assert inline[0]['calculo'] == 1 and inline[0]['plot_stub'] == 3
+    assert inline[1]['combinaciones_evaluadas'] == 1024
+    assert inline[1]['puntos_dibujados'] == 6
+
+
+def plot_values(values, outfile, title=''):
+    with open(outfile, 'w', encoding='utf-8') as f:
+        f.write(f'{title}{values!r}')
+
+
+def _render(tmp_path, values, use_cache=True, **kwargs):
+    renderer = FigureRenderer(max_workers=0, use_cache=use_cache)
+    renderer.submit(plot_values, str(tmp_path / 'figura.txt'), values, **kwargs)
+    return renderer
+
+
+def test_unchanged_figure_is_a_cache_hit(tmp_path):
+    import numpy as np
+    import pandas as pd
+
+    data = pd.DataFrame({'actividad': ['a', 'b'], 'ev': np.array([1.5, -2.0])})
+    first = _render(tmp_path, data)
+    assert (first.rendered, first.cache.hits, first.cache.misses) == (1, 0, 1)
+    # Mismos datos con otro índice (los gráficos dibujan por posición): se reutiliza
+    again = _render(tmp_path, data.set_axis([7, 3]))
+    assert (again.rendered, again.cache.hits, again.cache.misses) == (0, 1, 0)
+    assert 'reutilizadas' in again.cache.report()
+
+
+@pytest.mark.parametrize('change', [
+    dict(values=[1, 2, 4]),
+    dict(values=[1, 2, 3], title='otro'),
+    dict(values=(1, 2, 3)),
+    dict(values=[1.0, 2, 3]),
+])
+def test_data_change_invalidates_the_figure(tmp_path, change):
+    _render(tmp_path, [1, 2, 3])
+    changed = _render(tmp_path, **change)
+    assert (changed.rendered, changed.cache.hits) == (1, 0)
+
+
+def test_missing_file_or_disabled_cache_redraws(tmp_path):
+    _render(tmp_path, [1])
+    (tmp_path / 'figura.txt').unlink()
+    assert _render(tmp_path, [1]).rendered == 1
+    assert _render(tmp_path, [1], use_cache=False).rendered == 1
+    assert _render(tmp_path, [1]).rendered == 0
+
+
+def test_helper_source_change_invalidates_function_version(tmp_path, monkeypatch):
+    import importlib
+    import sys
+
+    from renderizado import FigureCache, PlotSpec, function_version
+
+    module = tmp_path / 'graficos_prueba.py'
+    template = ("def _color(v):\n    return {color!r}\n\n\n"
+                "def plot(values, outfile):\n    open(outfile, 'w').write(_color(values))\n\n\n"
+                "def other(values, outfile):\n    pass\n")
+    module.write_text(template.format(color='red'), encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    mod = importlib.import_module('graficos_prueba')
+    try:
+        before = function_version(mod.plot), function_version(mod.other)
+        key = FigureCache().key(PlotSpec(mod.plot, str(tmp_path / 'f.txt'), ([1],)))
+
+        # Cambia solo la función auxiliar: cambia la versión de plot (que la llama), no la de other
+        module.write_text(template.format(color='blue-violet'), encoding='utf-8')
+        mod = importlib.reload(mod)
+        after = function_version(mod.plot), function_version(mod.other)
+        assert after[0] != before[0] and after[1] == before[1]
+        assert FigureCache().key(PlotSpec(mod.plot, str(tmp_path / 'f.txt'), ([1],))) != key
+    finally:
+        sys.modules.pop('graficos_prueba', None)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import copy
+
+import numpy as np
+import pytest
+
+from sensibilidad import parametric_tornado, perturbed_evs
+
+
+def _expected_npv(activity, discount_rate):
+    return sum(o.prob * o.npv for o in activity.outcomes) / (1 + discount_rate) ** activity.horizon_years
+
+
+def _perturbed(activity, j, param, factor):
+    """Recalcula la actividad con el escenario j perturbado (probabilidades renormalizadas)"""
+    act = copy.deepcopy(activity)
+    total = sum(o.prob for o in act.outcomes)
+    if param == 'npv':
+        act.outcomes[j].npv *= factor
+    else:
+        act.outcomes[j].prob *= factor
+        scale = total / sum(o.prob for o in act.outcomes)
+        for o in act.outcomes:
+            o.prob *= scale
+    return act
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_batched_perturbations_match_recomputing_each_one(seed, random_activities):
+    rng = np.random.default_rng(seed)
+    activities = random_activities(rng, int(rng.integers(1, 8)), max_outcomes=4)
+    rate, percent = float(rng.uniform(0, 0.3)), float(rng.uniform(0.01, 0.5))
+
+    ev_base, ev_prob, ev_npv, valid = perturbed_evs(activities, rate, percent)
+    for i, act in enumerate(activities):
+        assert ev_base[i] == pytest.approx(_expected_npv(act, rate))
+        assert valid[i].sum() == len(act.outcomes)
+        for j in range(len(act.outcomes)):
+            for side, factor in enumerate((1 - percent, 1 + percent)):
+                assert ev_prob[i, j, side] == pytest.approx(_expected_npv(_perturbed(act, j, 'prob', factor), rate))
+                assert ev_npv[i, j, side] == pytest.approx(_expected_npv(_perturbed(act, j, 'npv', factor), rate))
+
+    # El tornado del mejor portafolio (suma de EV positivos) contra el recálculo completo
+    rows = parametric_tornado(activities, rate, percent)
+    names = [a.name for a in activities]
+    for row in rows:
+        i = names.index(row['Actividad'])
+        j = [o.label for o in activities[i].outcomes].index(row['Resultado'])
+        for key, factor in (('Valor_Bajo', 1 - percent), ('Valor_Alto', 1 + percent)):
+            changed = list(activities)
+            changed[i] = _perturbed(activities[i], j, row['Parametro'], factor)
+            assert row[key] == pytest.approx(sum(max(_expected_npv(a, rate), 0.0) for a in changed),
+                                             abs=1e-6)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import copy
+
+import numpy as np
+import pytest
+
+import parametros_administracion_propia
+import parametros_concesion
+import servicio
+from escenarios import ScenarioError, compile_activity
+from servicio import ModeState, WhatIfService
+from tabla_actividades import ActivityTable
+
+
+@pytest.fixture
+def service():
+    return WhatIfService({'concesion': parametros_concesion, 'propio': parametros_administracion_propia})
+
+
+@pytest.fixture
+def compiled(monkeypatch):
+    """Registra las actividades que se recompilan (una por EV recalculado)"""
+    calls = []
+
+    def counting(definition):
+        calls.append(definition['decision_key'])
+        return compile_activity(definition)
+    monkeypatch.setattr(servicio, 'compile_activity', counting)
+    return calls
+
+
+def _fresh_ev(state: ModeState) -> np.ndarray:
+    return ActivityTable([compile_activity(d) for d in state.definitions], state.discount_rate).ev
+
+
+def _snapshot(service):
+    return {name: (state, copy.deepcopy(state.definitions), state.ev.copy()) for name, state in service.modes.items()}
+
+
+def test_patch_recomputes_only_touched_activities(service, compiled):
+    base = service.modes['concesion']
+    patch = {'escenario': 'concesion', 'actividades': {'lodge': {'horizon_years': 4},
+                                                       'kayak': {'outcomes': {'Fracaso': {'npv': -1e6}}}}}
+    modes = service._patched(patch)
+
+    assert sorted(compiled) == ['kayak', 'lodge']
+    assert modes['propio'] is service.modes['propio']
+    state = modes['concesion']
+    assert np.array_equal(state.ev, _fresh_ev(state))
+    touched = [state.index['lodge'], state.index['kayak']]
+    untouched = np.setdiff1d(np.arange(len(state.keys)), touched)
+    assert np.array_equal(state.ev[untouched], base.ev[untouched])
+    assert not np.any(state.ev[touched] == base.ev[touched])
+
+
+def test_patch_without_scenario_touches_every_mode_with_the_activity(service, compiled):
+    result = service.what_if({'actividades': {'mtb': {'horizon_years': 5}}})
+    assert compiled == ['mtb', 'mtb']
+    assert {name: list(changes) for name, changes in result['cambios'].items()} == {'concesion': ['mtb'],
+                                                                                  'propio': ['mtb']}
+
+
+def test_normalizar_rescales_untouched_probabilities(service):
+    before = {o['label']: o['prob'] for o in service.modes['concesion'].definitions[1]['outcomes']}
+    key = service.modes['concesion'].keys[1]
+    label = next(iter(before))
+    patch = {'escenario': 'concesion', 'actividades': {key: {'outcomes': {label: {'prob': 0.4}}, 'normalizar': True}}}
+    state = service._patched(patch)['concesion']
+    after = {o['label']: o['prob'] for o in state.definitions[1]['outcomes']}
+
+    assert after[label] == 0.4
+    assert sum(after.values()) == pytest.approx(1.0)
+    rest = [other for other in before if other != label]
+    scale = 0.6 / sum(before[other] for other in rest)
+    for other in rest:
+        assert after[other] == pytest.approx(before[other] * scale)
+
+    # Sin normalizar la suma deja de ser 1 y el parche se rechaza
+    del patch['actividades'][key]['normalizar']
+    with pytest.raises(ScenarioError):
+        service._patched(patch)
+
+
+def test_rate_patch_recomputes_every_activity(service, compiled):
+    modes = service._patched({'escenario': 'propio', 'discount_rate': 0.15})
+    state = modes['propio']
+    assert sorted(compiled) == sorted(state.keys)
+    assert state.discount_rate == 0.15
+    assert np.array_equal(state.ev, _fresh_ev(state))
+    assert modes['concesion'] is service.modes['concesion']
+
+
+@pytest.mark.parametrize('patch', [
+    {'escenario': 'otro'},
+    {'actividades': {'no_existe': {'horizon_years': 2}}},
+    {'actividades': {'lodge': {'outcomes': {'No existe': {'prob': 0.1}}}}},
+    {'actividades': {'lodge': {'horizon_years': 0}}},
+    {'actividades': {'lodge': {'horizon_years': 1.5}}},
+    {'actividades': {'lodge': {'outcomes': [{'label': 'A', 'prob': 0.5, 'npv': 1.0}]}}},
+    {'actividades': {'lodge': {'outcomes': 'Fracaso'}}},
+    {'actividades': {'lodge': {'outcomes': {'Fracaso': 0.1}}}},
+    {'actividades': {'lodge': 3}},
+    {'actividades': ['lodge']},
+    {'discount_rate': 'alta'},
+    {'discount_rate': -2},
+    {'escenario': 'propio', 'actividades': {'lodge': {'horizon_years': 3},
+                                            'mtb': {'outcomes': [{'label': 'A', 'prob': -1, 'npv': 0}]}}},
+])
+def test_invalid_patch_raises_without_mutating_state(service, patch):
+    before = _snapshot(service)
+    for call in (service.what_if, service.apply):
+        with pytest.raises(ScenarioError):
+            call(copy.deepcopy(patch))
+    for name, (state, definitions, ev) in before.items():
+        assert service.modes[name] is state
+        assert state.definitions == definitions and np.array_equal(state.ev, ev)
+
+
+def test_what_if_apply_and_reset(service):
+    initial = service.results()
+    patch = {'escenario': 'concesion', 'actividades': {'lodge': {'horizon_years': 6}}}
+
+    preview = service.what_if(patch)
+    assert service.results() == initial
+    assert list(preview['cambios']) == ['concesion'] and list(preview['cambios']['concesion']) == ['lodge']
+
+    applied = service.apply(patch)
+    assert applied['cambios'] == preview['cambios']
+    assert service.results()['escenarios'] == preview['escenarios']
+    assert service.modes['concesion'].definitions[0]['horizon_years'] == 6
+    # Aplicar de nuevo el mismo parche no cambia nada
+    assert service.apply(patch)['cambios'] == {'concesion': {}}
+
+    assert service.reset() == initial
+    assert service.modes['concesion'].definitions[0]['horizon_years'] == parametros_concesion.activities[0]['horizon_years']
+
+
+def test_results_pick_best_mode_per_activity(service):
+    result = service.results()
+    for key, choice in result['por_actividad'].items():
+        evs = {name: state.ev[state.index[key]] for name, state in service.modes.items()}
+        best = max(evs, key=evs.get)
+        assert choice == (best if evs[best] > 0 else servicio.NONE_OPTION)
+    assert result['EV_combinado'] == pytest.approx(sum(
+        max(max(state.ev[state.index[key]] for state in service.modes.values()), 0.0)
+        for key in result['por_actividad']))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import copy
+
+import numpy as np
+
+import tabla_actividades
+from cache_resultados import ResultCache
+from tabla_actividades import ActivityTable, activities_hash, activity_table
+
+
+def _count_hashes(monkeypatch):
+    calls = []
+    original = tabla_actividades.activity_hash
+
+    def counting(activity):
+        calls.append(activity.decision_key)
+        return original(activity)
+    monkeypatch.setattr(tabla_actividades, 'activity_hash', counting)
+    return calls
+
+
+def test_same_content_shares_one_table(random_activities):
+    activities = random_activities(np.random.default_rng(0), 5)
+    table = activity_table(activities, 0.1)
+    assert activity_table(copy.deepcopy(activities), 0.1) is table
+    assert activity_table(table, 0.1) is table
+    assert table.content_hash == activities_hash(activities, 0.1)
+    assert activity_table(activities, 0.11) is not table
+
+
+def test_registry_is_bounded_lru(random_activities, monkeypatch):
+    monkeypatch.setattr(tabla_actividades, 'MAX_TABLES', 4)
+    monkeypatch.setattr(tabla_actividades, '_TABLES', type(tabla_actividades._TABLES)())
+    activities = random_activities(np.random.default_rng(1), 3)
+    first = activity_table(activities, 0.01)
+    for i in range(2, 12):
+        activity_table(activities, i / 100)
+        assert activity_table(activities, 0.01) is first  # la más usada no sale
+    assert len(tabla_actividades._TABLES) == 4
+
+
+def test_table_and_cache_do_not_rehash_outcomes(random_activities, monkeypatch, tmp_path):
+    activities = random_activities(np.random.default_rng(2), 6)
+    table = ActivityTable(activities, 0.1)
+    calls = _count_hashes(monkeypatch)
+    _ = table.content_hash
+    assert len(calls) == 6
+
+    # Otra tasa y la caché por actividad reutilizan los hashes ya calculados
+    other = activity_table(table, 0.2)
+    assert np.allclose(other.ev, ActivityTable(activities, 0.2).ev)
+    cache = ResultCache(str(tmp_path))
+    ev = cache.activity_values('ev', table, 0.1, lambda sub: sub.ev)
+    assert np.array_equal(ev, table.ev)
+    cache.activity_values('ev', table, 0.1, lambda sub: sub.ev)
+    assert len(calls) == 6
+
+
+def test_unregistered_table_hashes_lazily(random_activities, monkeypatch):
+    activities = random_activities(np.random.default_rng(3), 4)
+    calls = _count_hashes(monkeypatch)
+    table = ActivityTable(activities, 0.1)
+    assert calls == [] and len(table.ev) == 4
+    assert table.activity_hashes == [tabla_actividades.activity_hash(a) for a in activities]
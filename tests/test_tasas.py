@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from tabla_actividades import Activity, ActivityOutcome
+from tasas import DiscountFactorCache, ev_by_rate, sweep_discount_rates
+
+RATES = np.linspace(0.0, 0.3, 61)
+
+
+def _activity(name, horizon, undiscounted, rng):
+    """Actividad con dos escenarios cuyo flujo esperado sin descontar es `undiscounted`"""
+    p = float(rng.uniform(0.2, 0.8))
+    high = float(rng.uniform(1.0, 3.0)) * undiscounted
+    low = (undiscounted - p * high) / (1 - p)
+    return Activity(name, 'actividad', horizon, [ActivityOutcome('Alta', p, high), ActivityOutcome('Baja', 1 - p, low)])
+
+
+def _bisect(concesion, propio, lo, hi, iterations=200):
+    """Raíz de EV_propio - EV_concesión por bisección, evaluando ev_by_rate directamente"""
+    cache = DiscountFactorCache()
+
+    def difference(rate):
+        return float(ev_by_rate([propio], [rate], cache)[0, 0] - ev_by_rate([concesion], [rate], cache)[0, 0])
+    f_lo = difference(lo)
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        f_mid = difference(mid)
+        if np.sign(f_mid) == np.sign(f_lo):
+            lo, f_lo = mid, f_mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_interpolated_flip_rate_matches_bisection(seed):
+    rng = np.random.default_rng(seed)
+    h_c, h_p = rng.choice(np.arange(1, 11), 2, replace=False).tolist()
+    root = float(rng.uniform(0.01, 0.29))
+    u_c = float(rng.uniform(1e5, 1e7)) * (1 if seed % 2 else -1)
+    # EV_propio(r) = EV_concesión(r) exactamente en r = root
+    u_p = u_c * (1 + root) ** (h_p - h_c)
+    concesion, propio = _activity('Lodge', h_c, u_c, rng), _activity('Lodge', h_p, u_p, rng)
+
+    sweep = sweep_discount_rates([concesion], [propio], RATES)
+    rows = sweep.flip_rows()
+    strategy = [row for row in rows if row['Tipo'] == 'Estrategia']
+    assert len(strategy) == 1
+    # Una actividad sola nunca cambia de signo con la tasa
+    assert [row for row in rows if row['Tipo'] == 'Actividad'] == []
+
+    flip = strategy[0]['Tasa_Cambio']
+    i = int(np.searchsorted(RATES, flip))
+    bisected = _bisect(concesion, propio, RATES[i - 1], RATES[i])
+    assert bisected == pytest.approx(root, abs=1e-9)
+    # La interpolación lineal en un paso de 0.005 queda a menos de un 2% del paso de la raíz exacta
+    assert abs(flip - bisected) < 0.02 * (RATES[1] - RATES[0])
+    before, after = np.sign(sweep.difference[i - 1]), np.sign(sweep.difference[i])
+    names = {1: 'Administración Propia', -1: 'Concesión'}
+    assert (strategy[0]['Antes'], strategy[0]['Despues']) == (names[before], names[after])
+
+
+def test_ev_by_rate_matches_direct_discounting(random_activities):
+    activities = random_activities(np.random.default_rng(0), 8, max_outcomes=4)
+    cache = DiscountFactorCache()
+    ev = ev_by_rate(activities, RATES, cache)
+    expected = [[sum(o.prob * o.npv / (1 + r) ** a.horizon_years for o in a.outcomes) for a in activities]
+                for r in RATES]
+    assert np.allclose(ev, expected, rtol=1e-12, atol=1e-6)
+    horizons = {a.horizon_years for a in activities}
+    assert len(cache) == len(RATES) * len(horizons)
+    # Una segunda grilla solo agrega los pares (tasa, horizonte) nuevos
+    ev_by_rate(activities, np.append(RATES[:5], 0.5), cache)
+    assert len(cache) == (len(RATES) + 1) * len(horizons)